@@ -0,0 +1,51 @@
+"""add_lookup_indexes_and_live_assignment_unique
+
+Revision ID: 2855e6a7271c
+Revises: dca5ea2142d2
+Create Date: 2026-10-18 11:40:03.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2855e6a7271c'
+down_revision: Union[str, None] = 'dca5ea2142d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_task_assignees_task_id_user_id_deleted_at', 'task_assignees', ['task_id', 'user_id', 'deleted_at'], unique=False)
+    op.create_index('ix_task_events_task_id_created_at', 'task_events', ['task_id', 'created_at'], unique=False)
+    op.create_index('ix_notifications_user_id_is_read', 'notifications', ['user_id', 'is_read'], unique=False)
+
+    # Soft delete duplicate live assignments, keeping the oldest one, so that
+    # the unique index below can be built
+    op.execute(
+        "UPDATE task_assignees SET deleted_at = CURRENT_TIMESTAMP "
+        "WHERE deleted_at IS NULL AND id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM task_assignees "
+        "WHERE deleted_at IS NULL GROUP BY task_id, user_id) AS keep)"
+    )
+    op.create_index(
+        'uq_task_assignees_live_task_id_user_id',
+        'task_assignees',
+        [
+            sa.text('(CASE WHEN deleted_at IS NULL THEN task_id END)'),
+            sa.text('(CASE WHEN deleted_at IS NULL THEN user_id END)'),
+        ],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_task_assignees_live_task_id_user_id', table_name='task_assignees')
+    op.drop_index('ix_notifications_user_id_is_read', table_name='notifications')
+    op.drop_index('ix_task_events_task_id_created_at', table_name='task_events')
+    op.drop_index('ix_task_assignees_task_id_user_id_deleted_at', table_name='task_assignees')
@@ -0,0 +1,47 @@
+"""add notification read watermark
+
+Revision ID: 68c512abe57e
+Revises: 2855e6a7271c
+Create Date: 2026-10-18 06:12:26.713170
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '68c512abe57e'
+down_revision: Union[str, None] = '2855e6a7271c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('last_read_notification_id', sa.Integer(), nullable=True))
+    # Notifications were always marked read all at once, so the read ones of a
+    # user are the ones up to their newest read notification
+    op.execute(
+        "UPDATE users SET last_read_notification_id = ("
+        "SELECT MAX(notifications.id) FROM notifications "
+        "WHERE notifications.user_id = users.id AND notifications.is_read = 1)"
+    )
+    # Create the new index first: MySQL needs an index on the user_id foreign key
+    op.create_index('ix_notifications_user_id_id', 'notifications', ['user_id', 'id'], unique=False)
+    op.drop_index('ix_notifications_user_id_is_read', table_name='notifications')
+    op.drop_column('notifications', 'is_read')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('notifications', sa.Column('is_read', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE notifications SET is_read = 1 WHERE id <= ("
+        "SELECT COALESCE(users.last_read_notification_id, 0) FROM users "
+        "WHERE users.id = notifications.user_id)"
+    )
+    op.create_index('ix_notifications_user_id_is_read', 'notifications', ['user_id', 'is_read'], unique=False)
+    op.drop_index('ix_notifications_user_id_id', table_name='notifications')
+    op.drop_column('users', 'last_read_notification_id')
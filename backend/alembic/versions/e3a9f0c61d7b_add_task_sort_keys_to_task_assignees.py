@@ -0,0 +1,44 @@
+"""add task sort keys to task_assignees
+
+Revision ID: e3a9f0c61d7b
+Revises: b7d41c9e2a53
+Create Date: 2026-10-18 15:03:26.918274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9f0c61d7b'
+down_revision: Union[str, None] = 'b7d41c9e2a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('task_assignees', sa.Column('task_updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('task_assignees', sa.Column('task_due_date', sa.DateTime(timezone=True), nullable=True))
+
+    # Copy the sort keys of every task onto its assignments before they are required
+    op.execute(
+        "UPDATE task_assignees SET "
+        "task_updated_at = (SELECT updated_at FROM tasks WHERE tasks.id = task_assignees.task_id), "
+        "task_due_date = (SELECT due_date FROM tasks WHERE tasks.id = task_assignees.task_id)"
+    )
+    with op.batch_alter_table('task_assignees') as batch_op:
+        batch_op.alter_column('task_updated_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    op.create_index('ix_task_assignees_user_id_deleted_at_task_updated_at_task_id', 'task_assignees', ['user_id', 'deleted_at', 'task_updated_at', 'task_id'], unique=False)
+    op.create_index('ix_task_assignees_user_id_deleted_at_task_due_date_task_id', 'task_assignees', ['user_id', 'deleted_at', 'task_due_date', 'task_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_assignees_user_id_deleted_at_task_due_date_task_id', table_name='task_assignees')
+    op.drop_index('ix_task_assignees_user_id_deleted_at_task_updated_at_task_id', table_name='task_assignees')
+    op.drop_column('task_assignees', 'task_due_date')
+    op.drop_column('task_assignees', 'task_updated_at')
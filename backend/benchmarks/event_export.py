@@ -0,0 +1,115 @@
+"""Memory and throughput of the NDJSON task event export.
+
+Seeds one task with N events, starts uvicorn in a subprocess and downloads
+`GET /tasks/{task_id}/events/export`, plain and gzipped, while sampling the
+worker's memory. The worker's peak memory should not grow with N.
+
+Usage (from the backend directory):
+    python -m benchmarks.event_export --events 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .common import rss_mb
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.consts import TaskEventType
+from src.backend.models import Base, User, Task, TaskEvent
+
+HOST = "127.0.0.1"
+BATCH_SIZE = 10000
+
+
+def seed(database_url: str, n_events: int) -> int:
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        owner = User(username="benchowner", hashed_password="x")
+        task = Task(title="Export", description="benchmark", owner=owner)
+        db.add_all([owner, task])
+        db.commit()
+        task_id, owner_id = task.id, owner.id
+    with sync_engine.begin() as conn:
+        for start in range(0, n_events, BATCH_SIZE):
+            conn.execute(insert(TaskEvent), [{
+                "task_id": task_id,
+                "actor_id": owner_id,
+                "event_type": TaskEventType.TASK_STATUS_UPDATED,
+                "payload": {"old_status": "PENDING", "new_status": "IN_PROGRESS"},
+                "message": f"Task 'Export' status changed from PENDING to IN_PROGRESS by benchowner ({i}).",
+            } for i in range(start, min(start + BATCH_SIZE, n_events))])
+    sync_engine.dispose()
+    return task_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    task_id = seed(args.database_url, args.events)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.backend.main:app", "--host", HOST, "--port", str(args.port),
+         "--log-level", "warning"],
+        env={**os.environ, "DATABASE_URL": args.database_url},
+    )
+
+    async def download(client: httpx.AsyncClient, accept_encoding: str) -> dict:
+        headers = {
+            "Authorization": f"Bearer {create_access_token('benchowner')}",
+            "Accept-Encoding": accept_encoding,
+        }
+        peak_mb = baseline_mb = rss_mb(server.pid)
+        lines = wire_bytes = 0
+        start = time.perf_counter()
+        async with client.stream("GET", f"/tasks/{task_id}/events/export", headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                wire_bytes += len(chunk)
+                peak_mb = max(peak_mb, rss_mb(server.pid))
+        elapsed = time.perf_counter() - start
+        async with client.stream("GET", f"/tasks/{task_id}/events/export", headers=headers) as response:
+            async for _ in response.aiter_lines():
+                lines += 1
+        assert lines == args.events, lines
+        return {
+            "events_per_second": round(args.events / elapsed),
+            "wire_mb": round(wire_bytes / 1024 / 1024, 1),
+            "worker_rss_mb": {"before": round(baseline_mb, 1), "peak": round(peak_mb, 1)},
+        }
+
+    async def run() -> dict:
+        async with httpx.AsyncClient(base_url=f"http://{HOST}:{args.port}", timeout=None) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            return {
+                "events": args.events,
+                "plain": await download(client, "identity"),
+                "gzip": await download(client, "gzip"),
+            }
+
+    try:
+        print(json.dumps(asyncio.run(run()), indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
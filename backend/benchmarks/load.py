@@ -0,0 +1,217 @@
+"""Replay a mix of API traffic and report latency and throughput per route.
+
+Runs against a database filled by `benchmarks.seed`. A sample of tasks is
+read up front, with their owners and assignees; every request then picks
+a sampled task and acts as one of its participants, so reads and writes
+hit realistic rows. Workers call the ASGI app in-process, each sending its
+next request as soon as the previous one returns.
+
+The report is JSON with the commit it ran on, so runs can be compared
+across commits:
+    python -m benchmarks.seed --users 100000 --tasks 1000000
+    python -m benchmarks.load --duration 60 --concurrency 16 --output before.json
+
+Usage (from the backend directory):
+    python -m benchmarks.load --mix get_tasks=40 get_task=35 update_task_status=5 assign_users=5 get_notifications=15
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from .common import summarize, use_database
+
+import httpx
+from sqlalchemy import create_engine, func, select
+
+from src.backend.auth.utils import create_access_token
+from src.backend.consts import TaskStatus
+from src.backend.main import app
+from src.backend.models import User, Task, TaskAssignee
+
+DEFAULT_MIX = ["get_tasks=40", "get_task=35", "update_task_status=5", "assign_users=5", "get_notifications=15"]
+
+
+class Targets:
+    """Sampled tasks with their participants, and users to assign."""
+
+    def __init__(self, database_url: str, n_tasks: int, rng: random.Random):
+        sync_engine = create_engine(database_url)
+        with sync_engine.connect() as conn:
+            max_task_id = conn.scalar(select(func.max(Task.id))) or 0
+            max_user_id = conn.scalar(select(func.max(User.id))) or 0
+            task_ids = rng.sample(range(1, max_task_id + 1), min(n_tasks, max_task_id))
+            owners = conn.execute(
+                select(Task.id, User.username)
+                .join(User, User.id == Task.owner_id)
+                .where(Task.id.in_(task_ids), Task.deleted_at.is_(None))
+                .order_by(Task.id)
+            ).all()
+            assignees = conn.execute(
+                select(TaskAssignee.task_id, User.username)
+                .join(User, User.id == TaskAssignee.user_id)
+                .where(TaskAssignee.task_id.in_(task_ids), TaskAssignee.deleted_at.is_(None))
+                .order_by(TaskAssignee.id)
+            ).all()
+            self.user_ids = conn.scalars(
+                select(User.id).where(User.id.in_(rng.sample(range(1, max_user_id + 1), min(1000, max_user_id))))
+            ).all()
+        sync_engine.dispose()
+        if not owners:
+            raise SystemExit("No tasks found; fill the database with benchmarks.seed first")
+
+        self.owners = {task_id: owner for task_id, owner in owners}
+        self.participants = {task_id: [owner] for task_id, owner in owners}
+        for task_id, username in assignees:
+            if task_id in self.participants:
+                self.participants[task_id].append(username)
+        self.task_ids = list(self.owners)
+        self._headers = {}
+
+    def headers(self, username: str) -> dict:
+        if username not in self._headers:
+            token = create_access_token(username, timedelta(days=1))
+            self._headers[username] = {"Authorization": f"Bearer {token}"}
+        return self._headers[username]
+
+    def participant(self, rng: random.Random) -> tuple:
+        task_id = rng.choice(self.task_ids)
+        return task_id, self.headers(rng.choice(self.participants[task_id]))
+
+
+async def get_tasks(client: httpx.AsyncClient, rng: random.Random, targets: Targets) -> httpx.Response:
+    _, headers = targets.participant(rng)
+    return await client.get("/tasks", headers=headers)
+
+
+async def get_task(client: httpx.AsyncClient, rng: random.Random, targets: Targets) -> httpx.Response:
+    task_id, headers = targets.participant(rng)
+    return await client.get(f"/tasks/{task_id}", headers=headers)
+
+
+async def update_task_status(client: httpx.AsyncClient, rng: random.Random, targets: Targets) -> httpx.Response:
+    task_id, headers = targets.participant(rng)
+    return await client.patch(
+        f"/tasks/{task_id}/status", json={"status": rng.choice(list(TaskStatus))}, headers=headers
+    )
+
+
+async def assign_users(client: httpx.AsyncClient, rng: random.Random, targets: Targets) -> httpx.Response:
+    task_id = rng.choice(targets.task_ids)
+    return await client.post(
+        f"/tasks/{task_id}/assignees",
+        json={"user_ids": [rng.choice(targets.user_ids)]},
+        headers=targets.headers(targets.owners[task_id]),
+    )
+
+
+async def get_notifications(client: httpx.AsyncClient, rng: random.Random, targets: Targets) -> httpx.Response:
+    _, headers = targets.participant(rng)
+    return await client.get("/users/notifications", params={"limit": 20}, headers=headers)
+
+
+ROUTES = {route.__name__: route for route in (get_tasks, get_task, update_task_status, assign_users, get_notifications)}
+
+
+def parse_mix(mix: list) -> dict:
+    weights = {}
+    for item in mix:
+        route, _, weight = item.partition("=")
+        if route not in ROUTES:
+            raise SystemExit(f"Unknown route {route}; choose from {', '.join(ROUTES)}")
+        weights[route] = float(weight or 1)
+    return weights
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def replay(args: argparse.Namespace, targets: Targets, mix: dict, duration: float) -> dict:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    routes, weights = list(mix), list(mix.values())
+    # Errors come back as 500 responses instead of exceptions
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(worker_id: int):
+            rng = random.Random(f"{args.seed}-{worker_id}")
+            while time.perf_counter() < deadline:
+                route = rng.choices(routes, weights)[0]
+                start = time.perf_counter()
+                response = await ROUTES[route](client, rng, targets)
+                latencies[route].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors[route] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    report = {}
+    for route in routes:
+        if latencies[route]:
+            report[route] = {"requests": len(latencies[route]), "errors": errors[route],
+                             **summarize(latencies[route], elapsed)}
+    all_latencies = [latency for route_latencies in latencies.values() for latency in route_latencies]
+    report["total"] = {"requests": len(all_latencies), "errors": sum(errors.values()),
+                       **summarize(all_latencies, elapsed)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./load.db")
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX, help="route=weight pairs")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of traffic before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sample-tasks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    targets = Targets(args.database_url, args.sample_tasks, random.Random(args.seed))
+
+    async def run() -> dict:
+        async_engine = use_database(args.database_url, args.concurrency)
+        if args.warmup:
+            await replay(args, targets, mix, args.warmup)
+        routes = await replay(args, targets, mix, args.duration)
+        await async_engine.dispose()
+        return routes
+
+    report = {
+        "commit": current_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "database": args.database_url.split("://")[0],
+            "mix": mix,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "sample_tasks": len(targets.task_ids),
+            "seed": args.seed,
+        },
+        "routes": asyncio.run(run()),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
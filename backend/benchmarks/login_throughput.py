@@ -0,0 +1,88 @@
+"""Login throughput with bcrypt in the process pool versus the threadpool.
+
+Fires concurrent `POST /login` requests for seeded users, once with the
+dedicated hashing pool and once with `PASSWORD_HASH_WORKERS=0` semantics
+(threadpool fallback). While logins run, a second stream of `GET /users`
+requests measures how much the hashing load slows down unrelated traffic.
+
+Usage (from the backend directory):
+    python -m benchmarks.login_throughput --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+
+from .common import fire, use_database
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.backend.auth.hashing import password_hasher
+from src.backend.auth.utils import create_access_token, get_password_hash
+from src.backend.main import app
+from src.backend.models import Base, User
+
+PASSWORD = "benchmark-password"
+
+
+def seed(database_url: str, n_users: int):
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    hashed_password = get_password_hash(PASSWORD)
+    with Session(sync_engine) as db:
+        db.add_all([User(username=f"benchuser{i}", hashed_password=hashed_password) for i in range(n_users)])
+        db.commit()
+    sync_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    seed(args.database_url, args.users)
+    async_engine = use_database(args.database_url, args.concurrency)
+    headers = {"Authorization": f"Bearer {create_access_token('benchuser0')}"}
+    counter = iter(range(10 ** 9))
+
+    async def login(client):
+        username = f"benchuser{next(counter) % args.users}"
+        return await client.post("/login", data={"username": username, "password": PASSWORD})
+
+    async def list_users(client):
+        return await client.get("/users/", headers=headers)
+
+    async def bench(workers: int) -> dict:
+        password_hasher.shutdown()
+        password_hasher.max_workers = workers
+        password_hasher.max_queue = args.logins
+        # Warm up: start pool processes outside of the measurement
+        await fire(app, workers or 1, workers or 1, login)
+        logins, others = await asyncio.gather(
+            fire(app, args.logins, args.concurrency, login),
+            fire(app, args.logins, 4, list_users),
+        )
+        return {"login": logins, "concurrent GET /users": others}
+
+    async def run():
+        results = {
+            f"process pool ({args.workers} workers)": await bench(args.workers),
+            "threadpool": await bench(0),
+        }
+        password_hasher.shutdown()
+        await async_engine.dispose()
+        return results
+
+    for name, result in asyncio.run(run()).items():
+        print(name)
+        for route, numbers in result.items():
+            print(f"  {route}: {numbers}")
+
+
+if __name__ == "__main__":
+    main()
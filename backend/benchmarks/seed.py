@@ -0,0 +1,243 @@
+"""Generate a large, deterministic dataset for load tests.
+
+Creates users, tasks owned mostly by a minority of heavy users, assignees
+drawn from a long-tailed fan-out distribution, each task's event history
+(an assignment followed by a walk through statuses), and one notification
+per event for every participant except the actor. Every task write also
+appends task_changes rows for its participants; the changes of the last
+--changes-days days are kept, as after pruning. Each user has read all but a long-tailed number of their
+newest notifications. The same arguments always produce the same rows.
+Timestamps are spread over the months before --now.
+
+Rows are written with multi-row INSERTs, one transaction per chunk of
+tasks; the schema is recreated first. Login works for every user with the
+password "loadpassword".
+
+Usage (from the backend directory):
+    python -m benchmarks.seed --users 100000 --tasks 1000000 --events-per-task 4
+"""
+import argparse
+import json
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, create_engine, event, insert, update
+
+from src.backend.auth.utils import get_password_hash
+from src.backend.consts import TaskEventType, TaskStatus
+from src.backend.models import Base, User, Task, TaskAssignee, TaskChange, TaskEvent, Notification
+
+PASSWORD = "loadpassword"
+# Unread notifications of a user are drawn up to this many
+MAX_UNREAD = 200
+
+# (weight, fewest, most) assignees of a task
+FAN_OUT = [(35, 0, 0), (30, 1, 1), (15, 2, 2), (12, 3, 5), (7, 6, 20), (1, 21, 100)]
+DESCRIPTIONS = ["Follow up with the team", "Draft the proposal", "Review the changes", "Prepare the release"]
+NEXT_STATUSES = {
+    TaskStatus.PENDING: [TaskStatus.IN_PROGRESS],
+    TaskStatus.IN_PROGRESS: [TaskStatus.COMPLETED, TaskStatus.PENDING],
+    TaskStatus.COMPLETED: [TaskStatus.IN_PROGRESS],
+}
+
+
+def username(user_id: int) -> str:
+    return f"loaduser{user_id}"
+
+
+class Generator:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = args.now
+        self.event_id = 0
+        self.notification_id = 0
+        self.assignee_id = 0
+        self.changes_from = self.now - timedelta(days=args.changes_days)
+        # (created_at, user_id, task_id), given ids in time order once all tasks are generated
+        self.changes = []
+        # Newest notification ids per user, one more than can be unread
+        self.recent_notifications = {}
+
+    def ago(self, max_days: float) -> datetime:
+        return self.now - timedelta(days=self.rng.uniform(0, max_days))
+
+    def users(self, hashed_password: str) -> list:
+        return [{
+            "id": user_id,
+            "username": username(user_id),
+            "hashed_password": hashed_password,
+            "created_at": self.ago(365),
+            "updated_at": self.now,
+        } for user_id in range(1, self.args.users + 1)]
+
+    def task_written(self, task_id: int, user_ids: list, at: datetime):
+        if at >= self.changes_from:
+            self.changes.extend((at, user_id, task_id) for user_id in user_ids)
+
+    def owner(self) -> int:
+        # Skewed toward low ids: a few users own most tasks
+        return 1 + int(self.args.users * self.rng.random() ** self.args.owner_skew)
+
+    def fan_out(self) -> int:
+        _, fewest, most = self.rng.choices(FAN_OUT, weights=[weight for weight, _, _ in FAN_OUT])[0]
+        return min(self.rng.randint(fewest, most), self.args.users - 1)
+
+    def task(self, task_id: int, rows: dict):
+        owner_id = self.owner()
+        n_assignees = self.fan_out()
+        # One spare in case the owner is drawn
+        candidates = self.rng.sample(range(1, self.args.users + 1), n_assignees + 1)
+        assignee_ids = [user_id for user_id in candidates if user_id != owner_id][:n_assignees]
+        participants = [owner_id, *assignee_ids]
+        title = f"Task {task_id}"
+        created_at = self.ago(180)
+
+        # History: the assignment, then status changes by any participant
+        history = []
+        n_events = int(self.rng.expovariate(1 / self.args.events_per_task)) if self.args.events_per_task else 0
+        if assignee_ids and n_events:
+            names = [username(user_id) for user_id in assignee_ids[:3]]
+            if len(assignee_ids) > 3:
+                others = len(assignee_ids) - 3
+                names.append(f"{others} other{'s' if others > 1 else ''}")
+            assignees = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+            history.append((owner_id, TaskEventType.TASK_ASSIGNED, {"assignee_ids": assignee_ids},
+                            f"Task '{title}' has been assigned to {assignees} by {username(owner_id)}."))
+            n_events -= 1
+        task_status = TaskStatus.PENDING
+        for _ in range(n_events):
+            actor_id = self.rng.choice(participants)
+            new_status = self.rng.choice(NEXT_STATUSES[task_status])
+            history.append((actor_id, TaskEventType.TASK_STATUS_UPDATED,
+                            {"old_status": task_status, "new_status": new_status},
+                            f"Task '{title}' status changed from {task_status} to {new_status} by {username(actor_id)}."))
+            task_status = new_status
+
+        event_times = sorted(created_at + (self.now - created_at) * self.rng.random() for _ in history)
+        rows["tasks"].append({
+            "id": task_id,
+            "title": title,
+            "description": self.rng.choice(DESCRIPTIONS),
+            "due_date": self.now + timedelta(days=self.rng.uniform(-30, 60)) if self.rng.random() < 0.7 else None,
+            "status": task_status,
+            "owner_id": owner_id,
+            "created_at": created_at,
+            "updated_at": event_times[-1] if event_times else created_at,
+            "deleted_at": self.ago(30) if self.rng.random() < self.args.deleted_ratio else None,
+        })
+        self.task_written(task_id, participants, created_at)
+        for created in event_times:
+            self.task_written(task_id, participants, created)
+        if rows["tasks"][-1]["deleted_at"] is not None:
+            self.task_written(task_id, participants, rows["tasks"][-1]["deleted_at"])
+        task = rows["tasks"][-1]
+        for user_id in assignee_ids:
+            self.assignee_id += 1
+            rows["task_assignees"].append({
+                "id": self.assignee_id, "task_id": task_id, "user_id": user_id,
+                "created_at": created_at, "updated_at": created_at,
+                "task_updated_at": task["updated_at"], "task_due_date": task["due_date"],
+            })
+        for (actor_id, event_type, payload, message), created in zip(history, event_times):
+            self.event_id += 1
+            rows["task_events"].append({
+                "id": self.event_id, "task_id": task_id, "actor_id": actor_id, "event_type": event_type,
+                "payload": payload, "message": message, "created_at": created,
+            })
+            for user_id in participants:
+                if user_id != actor_id:
+                    self.notification_id += 1
+                    recent = self.recent_notifications.setdefault(user_id, deque(maxlen=MAX_UNREAD + 1))
+                    recent.append(self.notification_id)
+                    rows["notifications"].append({
+                        "id": self.notification_id, "user_id": user_id, "task_event_id": self.event_id,
+                        "message": message, "created_at": created,
+                    })
+
+    def task_changes(self, chunk_size: int):
+        """Chunks of task_changes rows, with ids in creation order like rows written live."""
+        self.changes.sort()
+        for start in range(0, len(self.changes), chunk_size):
+            yield [
+                {"id": change_id, "user_id": user_id, "task_id": task_id, "created_at": created_at}
+                for change_id, (created_at, user_id, task_id)
+                in enumerate(self.changes[start:start + chunk_size], start + 1)
+            ]
+
+    def read_watermarks(self) -> list:
+        """Read watermark of every user."""
+        watermarks = []
+        for user_id in range(1, self.args.users + 1):
+            recent = self.recent_notifications.get(user_id, ())
+            unread = min(int(self.rng.expovariate(1 / self.args.unread_per_user)), MAX_UNREAD)
+            watermarks.append({
+                "b_id": user_id,
+                # None when the user has not read any of their notifications
+                "last_read_notification_id": recent[-unread - 1] if unread < len(recent) else None,
+            })
+        return watermarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./load.db")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--events-per-task", type=float, default=4.0, help="mean length of a task's history")
+    parser.add_argument("--owner-skew", type=float, default=3.0, help="higher gives the heaviest owners more tasks")
+    parser.add_argument("--deleted-ratio", type=float, default=0.02)
+    parser.add_argument("--changes-days", type=float, default=30, help="days of task changes kept, as TASK_CHANGES_RETENTION_DAYS")
+    parser.add_argument("--unread-per-user", type=float, default=5.0, help="mean number of unread notifications")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--now", type=datetime.fromisoformat, default=datetime(2025, 1, 1, tzinfo=timezone.utc))
+    parser.add_argument("--chunk-size", type=int, default=10000, help="tasks written per transaction")
+    args = parser.parse_args()
+
+    sync_engine = create_engine(args.database_url)
+    if sync_engine.dialect.name == "sqlite":
+        @event.listens_for(sync_engine, "connect")
+        def fast_writes(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+            dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    generator = Generator(args)
+    tables = {"tasks": Task, "task_assignees": TaskAssignee, "task_events": TaskEvent, "notifications": Notification}
+    counts = dict.fromkeys(["users", *tables], 0)
+
+    start = time.perf_counter()
+    with sync_engine.begin() as conn:
+        users = generator.users(get_password_hash(PASSWORD))
+        conn.execute(insert(User), users)
+        counts["users"] = len(users)
+    for first_id in range(1, args.tasks + 1, args.chunk_size):
+        rows = {table: [] for table in tables}
+        for task_id in range(first_id, min(first_id + args.chunk_size, args.tasks + 1)):
+            generator.task(task_id, rows)
+        with sync_engine.begin() as conn:
+            for table, model in tables.items():
+                if rows[table]:
+                    conn.execute(insert(model), rows[table])
+                counts[table] += len(rows[table])
+    counts["task_changes"] = len(generator.changes)
+    for chunk in generator.task_changes(args.chunk_size * 10):
+        with sync_engine.begin() as conn:
+            conn.execute(insert(TaskChange), chunk)
+    with sync_engine.begin() as conn:
+        conn.execute(
+            update(User).where(User.id == bindparam("b_id")).values(
+                last_read_notification_id=bindparam("last_read_notification_id"),
+            ),
+            generator.read_watermarks(),
+        )
+    sync_engine.dispose()
+
+    print(json.dumps({**counts, "seconds": round(time.perf_counter() - start, 1)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Hold many idle notification streams open against one worker.
+
+Starts uvicorn in a subprocess, opens N `GET /users/notifications/stream`
+connections for one user and reports the worker's memory per connection.
+It then changes the status of a task the user is assigned to and measures
+how long it takes until every connection has received the notification.
+
+Every connection is a file descriptor on both sides: raise `ulimit -n`
+above N first.
+
+Usage (from the backend directory):
+    python -m benchmarks.sse_idle --connections 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .common import rss_mb, summarize
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.models import Base, User, Task, TaskAssignee
+
+HOST = "127.0.0.1"
+
+
+def seed(database_url: str) -> int:
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        owner = User(username="benchowner", hashed_password="x")
+        listener = User(username="benchlistener", hashed_password="x")
+        task = Task(title="Stream", description="benchmark", owner=owner)
+        db.add_all([owner, listener, task])
+        db.flush()
+        db.add(TaskAssignee(task_id=task.id, user_id=listener.id, task_updated_at=task.updated_at))
+        db.commit()
+        task_id = task.id
+    sync_engine.dispose()
+    return task_id
+
+
+async def open_stream(port: int, token: str) -> tuple:
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(
+        f"GET /users/notifications/stream HTTP/1.1\r\nHost: {HOST}\r\n"
+        f"Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    headers = await reader.readuntil(b"\r\n\r\n")
+    if not headers.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(headers.decode())
+    return reader, writer
+
+
+async def wait_for_notification(reader: asyncio.StreamReader, start: float) -> float:
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise RuntimeError("stream closed")
+        if line.startswith(b"event: notification"):
+            return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    task_id = seed(args.database_url)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.backend.main:app", "--host", HOST, "--port", str(args.port),
+         "--log-level", "warning", "--backlog", str(args.connections)],
+        # Connecting thousands of streams takes longer than the default
+        # principal cache TTL; keep the listener cached for the whole run
+        env={**os.environ, "NOTIFICATION_QUEUE_SIZE": "10", "AUTH_CACHE_TTL_SECONDS": "3600"},
+    )
+
+    async def run() -> dict:
+        base_url = f"http://{HOST}:{args.port}"
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            baseline_mb = rss_mb(server.pid)
+
+            token = create_access_token("benchlistener")
+            semaphore = asyncio.Semaphore(500)
+
+            async def connect():
+                async with semaphore:
+                    return await open_stream(args.port, token)
+
+            # The first stream loads the user into the principal cache
+            streams = [await connect()]
+            start = time.perf_counter()
+            streams += await asyncio.gather(*(connect() for _ in range(args.connections - 1)))
+            connect_seconds = time.perf_counter() - start
+            await asyncio.sleep(1)
+            connected_mb = rss_mb(server.pid)
+
+            start = time.perf_counter()
+            response = await client.patch(
+                f"/tasks/{task_id}/status",
+                json={"status": "IN_PROGRESS"},
+                headers={"Authorization": f"Bearer {create_access_token('benchowner')}"},
+            )
+            response.raise_for_status()
+            latencies = await asyncio.gather(*(wait_for_notification(reader, start) for reader, _ in streams))
+            fan_out_seconds = time.perf_counter() - start
+
+            for _, writer in streams:
+                writer.close()
+
+        return {
+            "connections": args.connections,
+            "connect_seconds": round(connect_seconds, 2),
+            "worker_rss_mb": {"idle": round(baseline_mb, 1), "connected": round(connected_mb, 1)},
+            "kb_per_connection": round((connected_mb - baseline_mb) * 1024 / args.connections, 1),
+            "fan_out_seconds": round(fan_out_seconds, 3),
+            "delivery": summarize(latencies, fan_out_seconds),
+        }
+
+    try:
+        print(json.dumps(asyncio.run(run()), indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
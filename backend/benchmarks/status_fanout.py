@@ -0,0 +1,92 @@
+"""Cost of a status change on a task with many assignees.
+
+Seeds one task with N assignees and repeatedly flips its status through
+`PATCH /tasks/{task_id}/status`. Every change writes an event whose
+notifications (one per participant) the outbox dispatcher creates later;
+the script reports request latency plus the commits and SQL statements each
+request needs, then how long the dispatcher takes to drain the outbox.
+
+Usage (from the backend directory):
+    python -m benchmarks.status_fanout --assignees 50 --requests 200
+"""
+import argparse
+import asyncio
+import time
+
+from .common import fire, use_database
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.consts import TaskStatus
+from src.backend.main import app
+from src.backend.models import Base, User, Task, TaskAssignee
+from src.backend.task.outbox import NotificationDispatcher
+
+
+def seed(database_url: str, n_assignees: int) -> int:
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        owner = User(username="benchowner", hashed_password="x")
+        assignees = [User(username=f"benchuser{i}", hashed_password="x") for i in range(n_assignees)]
+        task = Task(title="Fan-out", description="benchmark", owner=owner)
+        db.add_all([owner, task, *assignees])
+        db.flush()
+        db.add_all([TaskAssignee(task_id=task.id, user_id=user.id, task_updated_at=task.updated_at) for user in assignees])
+        db.commit()
+        task_id = task.id
+    sync_engine.dispose()
+    return task_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--assignees", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    task_id = seed(args.database_url, args.assignees)
+    # Requests run one at a time: they all update the same row
+    async_engine = use_database(args.database_url, 1)
+    headers = {"Authorization": f"Bearer {create_access_token('benchowner')}"}
+    statuses = iter([TaskStatus.IN_PROGRESS, TaskStatus.PENDING] * args.requests)
+    counts = {"commits": 0, "statements": 0}
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    def on_statement(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    event.listen(async_engine.sync_engine, "commit", on_commit)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", on_statement)
+
+    async def change_status(client):
+        return await client.patch(f"/tasks/{task_id}/status", json={"status": next(statuses)}, headers=headers)
+
+    async def run():
+        # Warm up the principal cache
+        await fire(app, 1, 1, change_status)
+        counts.update(commits=0, statements=0)
+        result = await fire(app, args.requests, 1, change_status)
+        result["commits_per_request"] = counts["commits"] / args.requests
+        result["statements_per_request"] = counts["statements"] / args.requests
+
+        dispatcher = NotificationDispatcher(async_sessionmaker(bind=async_engine), batch_size=100, interval=1)
+        start = time.perf_counter()
+        dispatched = await dispatcher.dispatch_pending()
+        result["dispatch_events_per_second"] = round(dispatched / (time.perf_counter() - start), 1)
+        await async_engine.dispose()
+        return result
+
+    result = asyncio.run(run())
+    print(f"status change with {args.assignees} assignees: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Throughput of the batch task endpoints against their single-item versions.
+
+Creates tasks and changes their status, first one task per request through
+`POST /tasks` and `PATCH /tasks/{task_id}/status`, then through
+`POST /tasks:batch` and `PATCH /tasks/status:batch` with growing batch
+sizes. Reports tasks per second for each; batch throughput should grow with
+the batch size.
+
+Usage (from the backend directory):
+    python -m benchmarks.task_batch --tasks 2000 --batch-sizes 10 100 500
+"""
+import argparse
+import asyncio
+import time
+
+from .common import use_database
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.consts import TaskStatus
+from src.backend.main import app
+from src.backend.models import Base, User
+
+
+def seed(database_url: str):
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(username="benchowner", hashed_password="x"))
+        db.commit()
+    sync_engine.dispose()
+
+
+def chunks(items: list, size: int) -> list:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    seed(args.database_url)
+    # Requests run one at a time, like an import job
+    async_engine = use_database(args.database_url, 1)
+    headers = {"Authorization": f"Bearer {create_access_token('benchowner')}"}
+    items = [{"title": f"Task {i}", "description": "benchmark"} for i in range(args.tasks)]
+
+    async def timed(send, requests: list) -> float:
+        start = time.perf_counter()
+        for request in requests:
+            (await send(request)).raise_for_status()
+        return round(args.tasks / (time.perf_counter() - start), 1)
+
+    async def run() -> dict:
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            # Warm up the principal cache
+            await client.get("/users/", headers=headers)
+
+            task_ids = []
+
+            async def create_one(item):
+                response = await client.post("/tasks", json=item, headers=headers)
+                task_ids.append(response.json()["id"])
+                return response
+
+            async def update_one(task_id):
+                return await client.patch(f"/tasks/{task_id}/status", json={"status": TaskStatus.IN_PROGRESS}, headers=headers)
+
+            results["single"] = {
+                "create_tasks_per_second": await timed(create_one, items),
+                "status_tasks_per_second": await timed(update_one, task_ids),
+            }
+
+            for batch_size in args.batch_sizes:
+                task_ids = []
+
+                async def create_batch(batch):
+                    response = await client.post("/tasks:batch", json={"items": batch}, headers=headers)
+                    task_ids.extend(result["task"]["id"] for result in response.json()["results"])
+                    return response
+
+                async def update_batch(batch):
+                    return await client.patch("/tasks/status:batch", json={"items": [
+                        {"task_id": task_id, "status": TaskStatus.IN_PROGRESS} for task_id in batch
+                    ]}, headers=headers)
+
+                results[f"batch of {batch_size}"] = {
+                    "create_tasks_per_second": await timed(create_batch, chunks(items, batch_size)),
+                    "status_tasks_per_second": await timed(update_batch, chunks(task_ids, batch_size)),
+                }
+        await async_engine.dispose()
+        return results
+
+    for name, result in asyncio.run(run()).items():
+        print(f"{name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Time of importing a large task file through `POST /tasks:import`.
+
+Generates a CSV file of N tasks, each assigned to two of a pool of users,
+and uploads it in one request with the body streamed in 64 KiB pieces.
+Reports the time the import takes, tasks per second, and how many
+statements and commits it needed for each chunk.
+
+Usage (from the backend directory):
+    python -m benchmarks.task_import --tasks 100000 --chunk-size 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from .common import use_database
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.main import app
+from src.backend.models import Base, User
+from src.backend.task import importer
+
+
+def seed(database_url: str, n_users: int):
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(username="benchowner", hashed_password="x"))
+        db.add_all([User(username=f"benchuser{i}", hashed_password="x") for i in range(n_users)])
+        db.commit()
+    sync_engine.dispose()
+
+
+def task_file(n_tasks: int, n_users: int) -> bytes:
+    lines = ["title,description,due_date,status,assignees\n"]
+    lines += [
+        f"Task {i},imported,2030-01-01T00:00:00+00:00,PENDING,benchuser{i % n_users};benchuser{(i + 1) % n_users}\n"
+        for i in range(n_tasks)
+    ]
+    return "".join(lines).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=importer.TASK_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    seed(args.database_url, args.users)
+    importer.TASK_IMPORT_CHUNK_SIZE = args.chunk_size
+    async_engine = use_database(args.database_url, 1)
+    body = task_file(args.tasks, args.users)
+    counts = {"commits": 0, "statements": 0}
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    def on_statement(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    event.listen(async_engine.sync_engine, "commit", on_commit)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", on_statement)
+
+    async def upload():
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    async def run() -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post("/tasks:import", content=upload(), headers={
+                "Authorization": f"Bearer {create_access_token('benchowner')}",
+                "Content-Type": "text/csv",
+            })
+            elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        await async_engine.dispose()
+        report = response.json()
+        return {
+            "tasks": args.tasks,
+            "file_mb": round(len(body) / 1024 / 1024, 1),
+            "imported": report["imported"],
+            "failed": report["failed"],
+            "seconds": round(elapsed, 2),
+            "tasks_per_second": round(report["imported"] / elapsed, 1),
+            "commits": counts["commits"],
+            "statements_per_chunk": round(counts["statements"] / max(counts["commits"], 1), 1),
+        }
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Cost of reading a large task list through `GET /tasks`.
+
+Seeds a user who owns half of N tasks and is assigned to the other half,
+then pages through the whole list with the largest page size, several
+times over. Reports tasks read per second and page latency; at this page
+size most of the time goes into building and serializing the response.
+
+Usage (from the backend directory):
+    python -m benchmarks.task_list --tasks 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from .common import summarize, use_database
+
+import httpx
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.main import app
+from src.backend.models import Base, User, Task, TaskAssignee
+from src.backend.task.pagination import MAX_PAGE_SIZE
+
+
+def seed(database_url: str, n_tasks: int):
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with Session(sync_engine) as db:
+        reader = User(username="benchreader", hashed_password="x")
+        other = User(username="benchother", hashed_password="x")
+        db.add_all([reader, other])
+        db.flush()
+        db.execute(insert(Task), [
+            {"title": f"Task {i}", "description": "benchmark", "owner_id": reader.id if i % 2 else other.id}
+            for i in range(n_tasks)
+        ])
+        assigned = db.execute(select(Task.id, Task.updated_at, Task.due_date).where(Task.owner_id == other.id))
+        db.execute(insert(TaskAssignee), [
+            {"task_id": task_id, "user_id": reader.id, "task_updated_at": updated_at, "task_due_date": due_date}
+            for task_id, updated_at, due_date in assigned
+        ])
+        db.commit()
+    sync_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {create_access_token('benchreader')}"}
+
+    async def read_all(client: httpx.AsyncClient, latencies: list) -> int:
+        read = 0
+        params = {"limit": MAX_PAGE_SIZE}
+        while True:
+            start = time.perf_counter()
+            response = await client.get("/tasks", params=params, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            page = response.json()
+            read += len(page["owned_tasks"]) + len(page["assigned_tasks"])
+            if page["next_cursor"] is None:
+                return read
+            params["cursor"] = page["next_cursor"]
+
+    async def run(n_tasks: int) -> dict:
+        async_engine = use_database(args.database_url, 1)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await read_all(client, [])  # warm up the principal cache and the connection
+            latencies = []
+            start = time.perf_counter()
+            read = sum([await read_all(client, latencies) for _ in range(args.rounds)])
+            elapsed = time.perf_counter() - start
+        await async_engine.dispose()
+        page = summarize(latencies, elapsed)
+        return {
+            "tasks": n_tasks,
+            "tasks_per_second": round(read / elapsed, 1),
+            "page_p50_ms": page["p50_ms"],
+            "page_p99_ms": page["p99_ms"],
+        }
+
+    results = []
+    for n_tasks in args.tasks:
+        seed(args.database_url, n_tasks)
+        results.append(asyncio.run(run(n_tasks)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
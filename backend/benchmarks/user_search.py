@@ -0,0 +1,77 @@
+"""`GET /users` search latency as the number of users grows.
+
+Seeds the database with N users for each size, then measures prefix and
+substring searches. Latency should stay roughly flat across sizes. The
+in-process index for substring search is built first, as the app does
+when it starts, and its build time is reported separately.
+
+Usage (from the backend directory):
+    python -m benchmarks.user_search --sizes 1000 100000 1000000
+"""
+import argparse
+import asyncio
+import time
+
+from .common import fire, use_database
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.auth.utils import create_access_token
+from src.backend.models import Base, User
+from src.backend.main import app
+from src.backend.user.search import user_search_index
+
+BATCH_SIZE = 10000
+
+
+def seed(database_url: str, n_users: int):
+    sync_engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        for start in range(0, n_users, BATCH_SIZE):
+            conn.execute(insert(User), [
+                {"username": f"benchuser{i:07d}", "hashed_password": "x"}
+                for i in range(start, min(start + BATCH_SIZE, n_users))
+            ])
+    sync_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {create_access_token('benchuser0000000')}"}
+    searches = {
+        "prefix": {"keyword": "benchuser00012", "match": "prefix", "limit": 20},
+        "substring": {"keyword": "r00012", "match": "substring", "limit": 20},
+    }
+
+    async def bench(n_users: int) -> dict:
+        async_engine = use_database(args.database_url, args.concurrency)
+        start = time.perf_counter()
+        async with AsyncSession(async_engine) as db:
+            await user_search_index.rebuild(db)
+        results = {"index build_ms": round((time.perf_counter() - start) * 1000, 2)}
+        for name, params in searches.items():
+            results[name] = await fire(
+                app, args.requests, args.concurrency,
+                lambda client, params=params: client.get("/users/", params=params, headers=headers),
+            )
+        await async_engine.dispose()
+        return results
+
+    for n_users in args.sizes:
+        seed(args.database_url, n_users)
+        print(f"{n_users} users")
+        for name, result in asyncio.run(bench(n_users)).items():
+            print(f"  {name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+import os
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..metrics import Counter
+from ..models import User
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: int
+    username: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(id=user.id, username=user.username)
+
+    def to_user(self) -> User:
+        # Detached instance with only id/username loaded; merge it into a
+        # session with load=False to use it without a query
+        user = User(id=self.id, username=self.username)
+        make_transient_to_detached(user)
+        return user
+
+
+class PrincipalCache:
+    """Bounded per-process LRU cache of token subject -> UserSnapshot with a TTL.
+
+    Entries are dropped when the user row is updated or deleted through the ORM
+    in this process; other workers rely on the TTL.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, UserSnapshot]] = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, username: str) -> Optional[UserSnapshot]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, username: str, snapshot: UserSnapshot):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_SIZE)
+
+Counter(
+    "principal_cache_lookups_total",
+    "Authenticated user cache lookups",
+    ["result"],
+    collect=lambda: {("hit",): principal_cache.hits, ("miss",): principal_cache.misses},
+)
+
+
+def _invalidate_usernames(target: User):
+    # Covers renames as well: drop both the old and the new username
+    history = inspect(target).attrs.username.history
+    for username in (*history.deleted, *history.unchanged, *history.added):
+        principal_cache.invalidate(username)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User):
+    # Also fired for users that are only dirty through a relationship backref
+    # (e.g. Task(owner=user)); those rows did not change
+    state = inspect(target)
+    if any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs):
+        _invalidate_usernames(target)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User):
+    _invalidate_usernames(target)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_write(orm_execute_state):
+    # Bulk UPDATE/DELETE statements bypass the mapper events above. Statements
+    # that leave the cached columns alone opt out with
+    # execution_options(invalidate_principal_cache=False).
+    if not orm_execute_state.execution_options.get("invalidate_principal_cache", True):
+        return
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is User for mapper in orm_execute_state.all_mappers
+    ):
+        principal_cache.clear()
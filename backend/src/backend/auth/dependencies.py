@@ -1,20 +1,29 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User
+from ..slow_queries import set_current_user_id
+from .cache import principal_cache, UserSnapshot
 import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
+# Comma-separated usernames allowed to use the /admin endpoints
+ADMIN_USERNAMES = frozenset(name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip())
 
-def get_user(db: Session, username: str):
-    return db.query(User).filter(User.username == username).one_or_none()
+async def get_user(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(
+        User.username == username,
+        User.deleted_at.is_(None)
+    ))
+    return result.scalar_one_or_none()
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     credentials_exception = HTTPException(
@@ -30,7 +39,20 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user(db, username=username)
+    snapshot = principal_cache.get(username)
+    if snapshot is not None:
+        set_current_user_id(snapshot.id)
+        # Attach the cached principal to this request's session without a query
+        return await db.merge(snapshot.to_user(), load=False)
+
+    user = await get_user(db, username=username)
     if user is None:
         raise credentials_exception
+    principal_cache.set(username, UserSnapshot.from_user(user))
+    set_current_user_id(user.id)
+    return user
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    if user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return user
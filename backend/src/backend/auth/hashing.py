@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+import time
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from ..metrics import Counter, Gauge, Histogram
+from .utils import get_password_hash, verify_and_update_password
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "1"))
+
+HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time from submitting a bcrypt call to its result, including waiting for a hashing worker",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0),
+)
+HASH_REJECTED = Counter("password_hash_rejected_total", "bcrypt calls turned away with a 503 because the queue was full")
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool so it neither blocks the event
+    loop nor starves the shared threadpool.
+
+    At most `max_workers + max_queue` calls are in flight; beyond that callers
+    get a 503 with Retry-After instead of piling up. `max_workers=0` falls back
+    to the threadpool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.in_flight - self.max_workers, 0)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+            )
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.max_workers <= 0:
+                return await run_in_threadpool(func, *args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            HASH_DURATION.observe((operation,), time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return whether the password matches, and a new hash when the stored
+        one was made with an outdated bcrypt cost."""
+        return await self._run("verify", verify_and_update_password, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+Gauge("password_hash_in_flight", "bcrypt calls running or waiting", collect=lambda: {(): password_hasher.in_flight})
+Gauge(
+    "password_hash_queue_depth",
+    "bcrypt calls waiting for a hashing worker",
+    collect=lambda: {(): password_hasher.queue_depth},
+)
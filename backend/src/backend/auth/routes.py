@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from ..database import get_db
 from ..models import User
 from .schemas import UserCreate, SignupOut, LoginOut
-from .utils import get_password_hash, verify_password, create_access_token
+from .utils import create_access_token
 from .dependencies import get_user
+from .hashing import password_hasher
+from ..user.search import user_search_index
 
 from datetime import timedelta
 
@@ -14,33 +17,41 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 router = APIRouter()
 
 @router.post("/signup", response_model=SignupOut)
-def signup(user_create: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user_create.username).first()
+async def signup(user_create: UserCreate, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).where(User.username == user_create.username))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed_password = get_password_hash(user_create.password)
+    hashed_password = await password_hasher.hash(user_create.password)
     new_user = User(
         username=user_create.username,
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    user_search_index.add(new_user.id, new_user.username)
     return SignupOut.model_validate(new_user)
 
 @router.post("/login", response_model=LoginOut)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = get_user(db, username=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await get_user(db, username=form_data.username)
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Rehash with the current bcrypt cost while we have the plain password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(user.username, access_token_expires)
     return LoginOut(
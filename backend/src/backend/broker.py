@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from importlib import import_module
+from typing import Callable, Iterable, Optional
+import asyncio
+import os
+
+# Messages a subscriber may have waiting before newer ones are dropped
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "100"))
+# "module:Class" of the BrokerBackend carrying messages between workers; LocalBackend when unset
+NOTIFICATION_BROKER_BACKEND = os.getenv("NOTIFICATION_BROKER_BACKEND", "")
+
+Deliver = Callable[[Iterable[int], dict], None]
+
+
+class Subscription:
+    """Bounded queue of messages for one connected client."""
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+        # Set when messages were dropped because the client read too slowly
+        self.lagged = False
+
+    def put(self, message: dict) -> bool:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+            return False
+        return True
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class BrokerBackend(ABC):
+    """Carries published messages to the brokers of every worker.
+
+    A backend calls `deliver(user_ids, message)` in each worker that
+    receives a message, including the one that published it.
+    """
+
+    def __init__(self, deliver: Deliver):
+        self.deliver = deliver
+
+    @abstractmethod
+    def publish(self, user_ids: Iterable[int], message: dict):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class LocalBackend(BrokerBackend):
+    """Delivers within this process only.
+
+    Stands in for a cross-worker transport (Redis pub/sub, Postgres
+    LISTEN/NOTIFY, ...): with several workers, clients only receive messages
+    published by the worker they are connected to.
+    """
+
+    def publish(self, user_ids: Iterable[int], message: dict):
+        self.deliver(user_ids, message)
+
+
+class Broker:
+    """In-process pub/sub of per-user messages."""
+
+    def __init__(self, queue_size: int, backend: Optional[Callable[[Deliver], BrokerBackend]] = None):
+        self.queue_size = queue_size
+        self.backend = (backend or LocalBackend)(self.deliver)
+        self._subscriptions: defaultdict[int, set] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, user_ids: Iterable[int], message: dict):
+        self.published += 1
+        self.backend.publish(list(user_ids), message)
+
+    def deliver(self, user_ids: Iterable[int], message: dict):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for user_id in user_ids:
+            for subscription in list(self._subscriptions.get(user_id, ())):
+                if subscription.loop is running_loop:
+                    self._put(subscription, message)
+                elif not subscription.loop.is_closed():
+                    # Published from another thread (threadpool, test client)
+                    subscription.loop.call_soon_threadsafe(self._put, subscription, message)
+
+    def _put(self, subscription: Subscription, message: dict):
+        if not subscription.put(message):
+            self.dropped += 1
+
+
+def load_backend(path: str) -> Callable[[Deliver], BrokerBackend]:
+    module_name, _, class_name = path.partition(":")
+    return getattr(import_module(module_name), class_name)
+
+
+notification_broker = Broker(
+    NOTIFICATION_QUEUE_SIZE,
+    load_backend(NOTIFICATION_BROKER_BACKEND) if NOTIFICATION_BROKER_BACKEND else None,
+)
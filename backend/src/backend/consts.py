@@ -7,4 +7,16 @@ class TaskStatus(enum.StrEnum):
 
 class TaskEventType(enum.StrEnum):
     TASK_ASSIGNED = 'TASK_ASSIGNED'
-    TASK_STATUS_UPDATED = 'TASK_STATUS_UPDATED'
\ No newline at end of file
+    TASK_STATUS_UPDATED = 'TASK_STATUS_UPDATED'
+
+class TaskRole(enum.StrEnum):
+    OWNED = 'owned'
+    ASSIGNED = 'assigned'
+
+class TaskSortKey(enum.StrEnum):
+    UPDATED_AT = 'updated_at'
+    DUE_DATE = 'due_date'
+
+class UserMatch(enum.StrEnum):
+    PREFIX = 'prefix'
+    SUBSTRING = 'substring'
@@ -1,16 +1,164 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import time
+
+from .metrics import Gauge
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers used in place of the sync DBAPI named in DATABASE_URL.
+# Alembic keeps using DATABASE_URL as-is.
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+# Optional read replica for read-only routes, in the same form as DATABASE_URL
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Replace connections older than this, below MySQL's wait_timeout; -1 keeps them
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "-1"))
+# Test connections with a round trip on every checkout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true")
+
+# Set in the info of replica sessions
+READ_REPLICA = "read_replica"
+# Set in the info of MySQL connections whose auto_increment_increment was checked
+AUTO_INCREMENT_CHECKED = "auto_increment_checked"
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE_SECONDS}
+    url = make_url(url)
+    # In-memory SQLite uses a single shared connection without a sized pool
+    if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT_SECONDS)
+    return options
+
+def _case_sensitive_like(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA case_sensitive_like = ON")
+    cursor.close()
+
+def use_case_sensitive_like(engine):
+    """Make LIKE on SQLite follow the BINARY order of its columns, as on MySQL
+    it follows their collation, so a prefix LIKE can use an index."""
+    if engine.dialect.name == "sqlite":
+        event.listen(getattr(engine, "sync_engine", engine), "connect", _case_sensitive_like)
+
+engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+use_case_sensitive_like(engine)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+replica_engine = None
+ReplicaSessionLocal = None
+if DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(to_async_url(DATABASE_REPLICA_URL), **engine_options(DATABASE_REPLICA_URL))
+    use_case_sensitive_like(replica_engine)
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, autoflush=False, expire_on_commit=False, info={READ_REPLICA: True}
+    )
+
+def _pool_gauge(read):
+    def collect():
+        engines = {"primary": engine, "replica": replica_engine}
+        # Pools without a fixed size (NullPool, StaticPool) keep no counts
+        return {
+            (name,): read(async_engine.pool)
+            for name, async_engine in engines.items()
+            if async_engine is not None and isinstance(async_engine.pool, QueuePool)
+        }
+    return collect
 
-def get_db():
-    db = SessionLocal()
-    try:
+Gauge("db_pool_size", "Connections the pool keeps open", ["database"], collect=_pool_gauge(lambda pool: pool.size()))
+Gauge(
+    "db_pool_checked_out",
+    "Connections in use",
+    ["database"],
+    collect=_pool_gauge(lambda pool: pool.checkedout()),
+)
+Gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size",
+    ["database"],
+    collect=_pool_gauge(lambda pool: max(pool.overflow(), 0)),
+)
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+async def get_replica_db():
+    """Session on the read replica, or None without one. Use `replica.get_read_db` in routes."""
+    if ReplicaSessionLocal is None:
+        yield None
+        return
+    async with ReplicaSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-        
+
+async def insert_returning_ids(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """Insert `rows` with multi-row INSERTs and return their ids in the order of `rows`.
+
+    The ORM inserts objects one statement at a time when it needs their
+    primary keys; this keeps it to one statement per batch of rows, plus a
+    check of the ids on MySQL.
+    """
+    if db.get_bind().dialect.insert_executemany_returning:
+        # RETURNING order is unspecified, but ids are assigned in row order
+        ids = (await db.execute(insert(model).returning(model.id), rows)).scalars().all()
+        return sorted(ids)
+    # MySQL has no RETURNING. InnoDB reserves consecutive ids for the rows of
+    # a multi-row INSERT and reports the first one, as long as ids step by 1
+    connection = await db.connection()
+    if AUTO_INCREMENT_CHECKED not in connection.info:
+        increment = (await connection.exec_driver_sql("SELECT @@auto_increment_increment")).scalar_one()
+        if increment != 1:
+            raise RuntimeError(f"insert_returning_ids needs auto_increment_increment = 1, not {increment}")
+        connection.info[AUTO_INCREMENT_CHECKED] = True
+    result = await db.execute(insert(model).values(rows))
+    first_id, last_id = result.lastrowid, result.lastrowid + len(rows) - 1
+    # Rows of other transactions in the range are not visible to this one
+    count = (await db.execute(
+        select(func.count()).select_from(model).where(model.id.between(first_id, last_id))
+    )).scalar_one()
+    if count != len(rows):
+        raise RuntimeError(f"Ids of the {len(rows)} rows inserted into {model.__tablename__} are not {first_id}..{last_id}")
+    return list(range(first_id, last_id + 1))
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+
+# Set per request by the middleware in main.py; statements run outside of a
+# request are not counted
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if current_query_stats.get() is not None:
+        context._query_start_time = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += time.perf_counter() - context._query_start_time
@@ -1,10 +1,104 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import os
+import time
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from .auth import routes as auth_routes
+from .auth.dependencies import get_admin_user
+from .auth.hashing import password_hasher
+from .broker import notification_broker
+from .database import QueryStats, current_query_stats, get_db
+from .metrics import CONTENT_TYPE, Counter, Histogram, exposition, snapshot_writer
+from .replica import record_write
+from .slow_queries import RequestContext, current_request, slow_query_log
 from .user import routes as user_routes
 from .task import routes as task_routes
+from .task.acl import task_acl_cache
+from .task.outbox import NOTIFICATION_DISPATCHER_ENABLED, notification_dispatcher
+from .user.search import user_search_index
+
+# Expose per-request query counts and DB time as response headers
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() in ("1", "true")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per route",
+    ["method", "route"],
+)
+REQUESTS = Counter("http_requests_total", "Requests per route and status code", ["method", "route", "status"])
+DB_QUERIES = Counter("db_queries_total", "SQL statements run by requests, per route", ["method", "route"])
+DB_QUERY_DURATION = Counter(
+    "db_query_duration_seconds_total", "Time spent in SQL statements by requests, per route", ["method", "route"]
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshot_writer.start()
+    await notification_broker.backend.start()
+    await task_acl_cache.backend.start()
+    user_search_index.start()
+    if NOTIFICATION_DISPATCHER_ENABLED:
+        notification_dispatcher.start()
+    yield
+    await notification_dispatcher.stop()
+    await user_search_index.stop()
+    await notification_broker.backend.stop()
+    await task_acl_cache.backend.stop()
+    password_hasher.shutdown()
+    await snapshot_writer.stop()
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+@app.middleware("http")
+async def record_request_stats(request: Request, call_next):
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    context = RequestContext(request.method, request.scope)
+    request_token = current_request.set(context)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        current_query_stats.reset(token)
+        current_request.reset(request_token)
+        # The route template, not the path, keeps the number of series bounded
+        route = request.scope.get("route")
+        labels = (request.method, route.path if route is not None else "unmatched")
+        REQUEST_DURATION.observe(labels, time.perf_counter() - start)
+        REQUESTS.inc((*labels, str(status_code)))
+        if stats.count:
+            DB_QUERIES.inc(labels, stats.count)
+            DB_QUERY_DURATION.inc(labels, stats.duration)
+    record_write(request, response, context.user_id)
+    if QUERY_STATS_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+    return response
 
 app.include_router(auth_routes.router)
 app.include_router(user_routes.router)
 app.include_router(task_routes.router)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """All metrics in the Prometheus text format, added up across workers when METRICS_DIR is set."""
+    return PlainTextResponse(exposition(), media_type=CONTENT_TYPE)
+
+@app.get("/metrics/outbox", dependencies=[Depends(get_admin_user)])
+async def outbox_metrics(db: AsyncSession = Depends(get_db)):
+    """Notification outbox backlog and the delay of its dispatcher in this worker."""
+    return await notification_dispatcher.stats(db)
+
+@app.get("/metrics/task_acl_cache", dependencies=[Depends(get_admin_user)])
+async def task_acl_cache_metrics():
+    """Hit rate of the task participant cache in this worker."""
+    return task_acl_cache.stats()
+
+@app.get("/admin/slow_queries", dependencies=[Depends(get_admin_user)])
+async def slow_queries():
+    """Slowest and most recent statements over SLOW_QUERY_THRESHOLD_MS in this worker."""
+    return slow_query_log.stats()
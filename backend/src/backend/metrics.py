@@ -0,0 +1,249 @@
+"""Metrics in the Prometheus text format, served by `GET /metrics`.
+
+Recording a value is a dict lookup and an addition, done on the event loop
+thread without locks. Values that already live elsewhere (pool usage,
+queue depths, cache hits) are read by a `collect` callback when the
+metrics are exported, which costs nothing on the request path.
+
+Each worker process keeps its own values. With several workers, point
+METRICS_DIR at a directory they share: every worker writes its values to
+its own file there every METRICS_FLUSH_SECONDS and when it stops, and
+`GET /metrics`, answered by any worker, adds up the files of all workers.
+Counters and histograms of workers that exited stay in the totals, so
+they do not drop when a worker restarts; gauges only count live workers.
+Values of other workers are up to METRICS_FLUSH_SECONDS old. Clear the
+directory when the whole server restarts.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# Directory shared by all workers; unset with a single worker
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+Labels = Tuple[str, ...]
+Collect = Callable[[], Dict[Labels, float]]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), collect: Optional[Collect] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.values: Dict[Labels, object] = {}
+        registry.register(self)
+
+    def describe(self) -> dict:
+        return {"type": self.type, "help": self.help, "labelnames": list(self.labelnames)}
+
+    def samples(self) -> Dict[Labels, object]:
+        return dict(self.collect()) if self.collect is not None else dict(self.values)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, labels: Labels, value: float):
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def describe(self) -> dict:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+    def observe(self, labels: Labels, value: float):
+        sample = self.values.get(labels)
+        if sample is None:
+            # Count per bucket (the last one is +Inf) and the sum of values
+            sample = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        sample[0][bisect_left(self.buckets, value)] += 1
+        sample[1] += value
+
+    def samples(self) -> Dict[Labels, object]:
+        return {labels: [list(counts), total] for labels, (counts, total) in self.values.items()}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> dict:
+        """Values of every metric in this process, as JSON-serializable data."""
+        snapshot = {}
+        for name, metric in self.metrics.items():
+            try:
+                samples = metric.samples()
+            except Exception:
+                logger.exception("Collecting metric %s failed", name)
+                continue
+            snapshot[name] = {**metric.describe(), "samples": [[list(labels), value] for labels, value in samples.items()]}
+        return snapshot
+
+
+registry = Registry()
+
+
+def merge(snapshots: Iterable[Tuple[dict, bool]]) -> dict:
+    """Add up (snapshot, is_live) pairs of several processes; gauges only from live ones."""
+    merged = {}
+    for snapshot, is_live in snapshots:
+        for name, metric in snapshot.items():
+            if metric["type"] == "gauge" and not is_live:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if metric["type"] == "histogram":
+                    counts, total = samples.get(key, [[0] * len(value[0]), 0.0])
+                    samples[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+                else:
+                    samples[key] = samples.get(key, 0) + value
+    for metric in merged.values():
+        metric["samples"] = [[list(labels), value] for labels, value in metric["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot: dict) -> str:
+    lines: List[str] = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in sorted(metric["samples"]):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += count
+                bucket_labels = _format_labels([*labelnames, "le"], [*labels, _format_value(bound)])
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(directory: str):
+    """Replace this process's file in `directory` with its current values."""
+    path = _snapshot_path(directory, os.getpid())
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(registry.snapshot(), file)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_snapshots(directory: str) -> List[Tuple[dict, bool]]:
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        pid = int(filename[len("metrics-"):-len(".json")])
+        try:
+            with open(os.path.join(directory, filename)) as file:
+                snapshots.append((json.load(file), _is_alive(pid)))
+        except (OSError, ValueError):
+            logger.warning("Skipping unreadable metrics file %s", filename)
+    return snapshots
+
+
+def exposition() -> str:
+    """All metrics in the text format, added up across workers when METRICS_DIR is set."""
+    if not METRICS_DIR:
+        return render(merge([(registry.snapshot(), True)]))
+    write_snapshot(METRICS_DIR)
+    return render(merge(read_snapshots(METRICS_DIR)))
+
+
+class SnapshotWriter:
+    """Writes this worker's values to METRICS_DIR in the background."""
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                write_snapshot(self.directory)
+            except OSError:
+                logger.exception("Writing metrics to %s failed", self.directory)
+
+    def start(self):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Keep the final counts of this worker in the totals
+            write_snapshot(self.directory)
+
+
+snapshot_writer = SnapshotWriter(METRICS_DIR, METRICS_FLUSH_SECONDS)
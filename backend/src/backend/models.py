@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, Index, text
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime, timezone
 
@@ -15,6 +15,9 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Notifications up to this id have been read
+    last_read_notification_id = Column(Integer, nullable=True)
+    # Bumped whenever a task the user takes part in changes; versions the GET /tasks ETag
 
     tasks = relationship("Task", back_populates="owner", foreign_keys="Task.owner_id")
     assigned_tasks = relationship("TaskAssignee", back_populates="user", foreign_keys="TaskAssignee.user_id")
@@ -32,11 +35,19 @@ class Task(Base):
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Bumped by every change to the task or its assignees; versions the GET /tasks/{task_id} ETag
+    version = Column(Integer, default=1, server_default=text("1"), nullable=False)
 
     owner = relationship("User", back_populates="tasks", foreign_keys=[owner_id])
     assignees = relationship("TaskAssignee", back_populates="task", foreign_keys="TaskAssignee.task_id")
     events = relationship("TaskEvent", back_populates="task", foreign_keys="TaskEvent.task_id")
 
+    # Keyset pagination of GET /tasks
+    __table_args__ = (
+        Index("ix_tasks_owner_id_deleted_at_updated_at_id", "owner_id", "deleted_at", "updated_at", "id"),
+        Index("ix_tasks_owner_id_deleted_at_due_date_id", "owner_id", "deleted_at", "due_date", "id"),
+    )
+
 class TaskAssignee(Base):
     __tablename__ = "task_assignees"
     id = Column(Integer, primary_key=True)
@@ -45,10 +56,45 @@ class TaskAssignee(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # The task's GET /tasks sort keys, kept in step by record_task_changes
+    task_updated_at = Column(DateTime(timezone=True), nullable=False)
+    task_due_date = Column(DateTime(timezone=True), nullable=True)
 
     task = relationship("Task", back_populates="assignees", foreign_keys=[task_id])
     user = relationship("User", back_populates="assigned_tasks", foreign_keys=[user_id])
 
+    __table_args__ = (
+        Index("ix_task_assignees_user_id_deleted_at_task_id", "user_id", "deleted_at", "task_id"),
+        Index("ix_task_assignees_task_id_user_id_deleted_at", "task_id", "user_id", "deleted_at"),
+        # Keyset pagination of a user's assigned tasks in GET /tasks
+        Index("ix_task_assignees_user_id_deleted_at_task_updated_at_task_id", "user_id", "deleted_at", "task_updated_at", "task_id"),
+        Index("ix_task_assignees_user_id_deleted_at_task_due_date_task_id", "user_id", "deleted_at", "task_due_date", "task_id"),
+        # A user can only have one live assignment per task. Functional key
+        # parts stand in for a partial index, which MySQL does not support:
+        # soft-deleted rows index as (NULL, NULL) and never collide.
+        Index(
+            "uq_task_assignees_live_task_id_user_id",
+            text("(CASE WHEN deleted_at IS NULL THEN task_id END)"),
+            text("(CASE WHEN deleted_at IS NULL THEN user_id END)"),
+            unique=True,
+        ),
+    )
+
+class TaskChange(Base):
+    """A task changed for this user: created, updated, deleted, or the user was (un)assigned."""
+    __tablename__ = "task_changes"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        # GET /tasks/changes reads one user's changes in id order, and GET /tasks versions by them
+        Index("ix_task_changes_user_id_id", "user_id", "id"),
+        Index("ix_task_changes_task_id", "task_id"),
+        Index("ix_task_changes_created_at", "created_at"),
+    )
+
 class TaskEvent(Base):
     __tablename__ = "task_events"
     id = Column(Integer, primary_key=True)
@@ -63,14 +109,32 @@ class TaskEvent(Base):
     actor = relationship("User", back_populates="task_events", foreign_keys=[actor_id])
     notifications = relationship("Notification", back_populates="task_event", foreign_keys="Notification.task_event_id")
 
+    __table_args__ = (
+        Index("ix_task_events_task_id_created_at", "task_id", "created_at"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     task_event_id = Column(Integer, ForeignKey("task_events.id"), nullable=False)
     message = Column(String(255), nullable=False)
-    is_read = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
     user = relationship("User", back_populates="notifications", foreign_keys=[user_id])
-    task_event = relationship("TaskEvent", back_populates="notifications", foreign_keys=[task_event_id])
\ No newline at end of file
+    task_event = relationship("TaskEvent", back_populates="notifications", foreign_keys=[task_event_id])
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        # The outbox dispatcher delivers at least once; duplicates are ignored
+        Index("uq_notifications_task_event_id_user_id", "task_event_id", "user_id", unique=True),
+    )
+
+class NotificationOutbox(Base):
+    """Task events whose notifications have not been created yet."""
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True)
+    task_event_id = Column(Integer, ForeignKey("task_events.id"), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    task_event = relationship("TaskEvent", foreign_keys=[task_event_id])
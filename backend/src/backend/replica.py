@@ -0,0 +1,99 @@
+"""Routing of read-only routes to the read replica.
+
+Routes that only read take their session from `get_read_db`. With
+DATABASE_REPLICA_URL set, it is a session on the replica, except for
+users who changed something in the last DB_REPLICA_STICKY_SECONDS: they
+read from the primary, so they see their own writes despite replication
+lag. A successful POST/PUT/PATCH/DELETE marks its user in the worker that
+handled it, and sets a cookie that carries the mark to the other workers
+for clients that keep cookies.
+
+Without a replica, `get_read_db` returns the request's primary session.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import math
+import os
+import time
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .auth.dependencies import get_current_user
+from .database import ReplicaSessionLocal, get_db, get_replica_db
+from .models import User
+
+READ_REPLICA_ENABLED = ReplicaSessionLocal is not None
+# Keep it above the replication lag
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+STICKY_COOKIE = "read_primary_until"
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RecentWriters:
+    """Users who wrote in this worker in the last `window` seconds."""
+
+    def __init__(self, window: float):
+        self.window = window
+        # user id -> deadline, oldest first since the window is fixed
+        self._deadlines: OrderedDict[int, float] = OrderedDict()
+        self._lock = Lock()
+
+    def add(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            self._deadlines[user_id] = now + self.window
+            self._deadlines.move_to_end(user_id)
+            while self._deadlines and next(iter(self._deadlines.values())) <= now:
+                self._deadlines.popitem(last=False)
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            deadline = self._deadlines.get(user_id)
+        return deadline is not None and deadline > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._deadlines.clear()
+
+
+recent_writers = RecentWriters(DB_REPLICA_STICKY_SECONDS)
+
+
+def record_write(request: Request, response: Response, user_id: Optional[int]):
+    """Send `user_id`'s reads to the primary for a while if `request` changed something."""
+    if not READ_REPLICA_ENABLED or user_id is None:
+        return
+    if request.method in READ_METHODS or response.status_code >= 400:
+        return
+    recent_writers.add(user_id)
+    response.set_cookie(
+        STICKY_COOKIE,
+        f"{time.time() + DB_REPLICA_STICKY_SECONDS:.3f}",
+        max_age=math.ceil(DB_REPLICA_STICKY_SECONDS),
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def _wrote_recently(request: Request, user_id: int) -> bool:
+    if user_id in recent_writers:
+        return True
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    replica_db: Optional[AsyncSession] = Depends(get_replica_db),
+    current_user: User = Depends(get_current_user),
+) -> AsyncSession:
+    # Sessions connect on their first statement, so the unused one costs nothing
+    if not READ_REPLICA_ENABLED or replica_db is None or _wrote_recently(request, current_user.id):
+        return db
+    return replica_db
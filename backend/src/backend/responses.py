@@ -0,0 +1,23 @@
+"""Responses serialized in one pass.
+
+When a handler returns a model, FastAPI validates it against
+`response_model` again, turns it into a dict and encodes that with the
+stdlib json module. A returned Response is sent as it is, so handlers on
+the hot paths build their body once and wrap it in `FastJSONResponse`;
+`response_model=` stays on the route for the OpenAPI schema.
+"""
+from typing import Any
+
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON encoded by pydantic-core.
+
+    Takes models, or dicts and lists of plain values, datetimes and enums,
+    and writes them exactly as the models' own serializer would.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
@@ -0,0 +1,197 @@
+"""Opt-in log of slow SQL statements, attributed to the request that ran them.
+
+With SLOW_QUERY_LOG_ENABLED, every statement taking at least
+SLOW_QUERY_THRESHOLD_MS is logged with the route and authenticated user of
+the request, the shapes of its parameters (types, never values) and the
+frames of this application that led to it. The slowest and the most
+recent SLOW_QUERY_TOP_N of them are kept per worker for
+`GET /admin/slow_queries`.
+
+The timing listeners are only registered while the log is enabled.
+Statements run outside of a request (the outbox dispatcher, imports) are
+recorded without a route.
+"""
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, List, Optional
+import heapq
+import itertools
+import logging
+import os
+import sys
+import time
+import traceback
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "false").lower() in ("1", "true")
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "50"))
+SLOW_QUERY_STACK_DEPTH = int(os.getenv("SLOW_QUERY_STACK_DEPTH", "8"))
+
+MAX_STATEMENT_LENGTH = 2000
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class RequestContext:
+    method: str
+    # The router adds the matched route to the scope after the middleware runs
+    scope: dict
+    user_id: Optional[int] = None
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.method} {route.path if route is not None else 'unmatched'}"
+
+
+# Set per request by the middleware in main.py
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
+
+
+def set_current_user_id(user_id: int):
+    """Attribute the statements of the current request to `user_id`."""
+    context = current_request.get()
+    if context is not None:
+        context.user_id = user_id
+
+
+def _value_shape(value: Any) -> str:
+    return "None" if value is None else type(value).__name__
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Types of `parameters` as passed to the DBAPI cursor, with runs of one type collapsed."""
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        # "int x 500" for the values of a long IN list
+        shapes = []
+        for name, run in itertools.groupby(map(_value_shape, parameters)):
+            count = sum(1 for _ in run)
+            shapes.append(name if count == 1 else f"{name} x {count}")
+        return shapes
+    return _value_shape(parameters)
+
+
+def app_stack(limit: int) -> List[str]:
+    """The innermost `limit` frames of this application that led to the current statement."""
+    current = greenlet.getcurrent()
+    # The async engine runs statements in a child greenlet whose own stack
+    # starts at SQLAlchemy; the calling coroutines are in the parent's
+    frame = current.parent.gr_frame if current.parent is not None else sys._getframe()
+    frames = [
+        f"{os.path.relpath(summary.filename, APP_DIR)}:{summary.lineno} in {summary.name}"
+        for summary in traceback.extract_stack(frame)
+        if summary.filename.startswith(APP_DIR) and summary.filename != __file__
+    ]
+    return frames[-limit:]
+
+
+@dataclass
+class SlowQuery:
+    duration_ms: float
+    statement: str
+    parameters: Any
+    route: Optional[str]
+    user_id: Optional[int]
+    stack: List[str] = field(default_factory=list)
+    recorded_at: str = ""
+
+
+class SlowQueryLog:
+    """Per-process record of statements slower than `threshold_ms`."""
+
+    def __init__(self, threshold_ms: float, top_n: int, stack_depth: int):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self.stack_depth = stack_depth
+        self.enabled = False
+        self.recorded = 0
+        self._slowest: List[tuple] = []  # min-heap of (duration_ms, seq, SlowQuery)
+        self._recent: deque = deque(maxlen=top_n)
+        self._seq = itertools.count()
+        self._lock = Lock()
+
+    def enable(self):
+        if not self.enabled:
+            event.listen(Engine, "before_cursor_execute", self._start_timer)
+            event.listen(Engine, "after_cursor_execute", self._record)
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            event.remove(Engine, "before_cursor_execute", self._start_timer)
+            event.remove(Engine, "after_cursor_execute", self._record)
+            self.enabled = False
+
+    def _start_timer(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start_time = time.perf_counter()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start_time", None)
+        if start is None:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+        request = current_request.get()
+        entry = SlowQuery(
+            duration_ms=round(duration_ms, 2),
+            statement=statement.strip()[:MAX_STATEMENT_LENGTH],
+            parameters=parameter_shape(parameters, executemany),
+            route=request.route if request is not None else None,
+            user_id=request.user_id if request is not None else None,
+            stack=app_stack(self.stack_depth),
+            recorded_at=datetime.now(timezone.utc).isoformat(),
+        )
+        logger.warning(
+            "Slow query (%.1f ms) on %s by user %s: %s parameters=%s%s",
+            entry.duration_ms, entry.route or "no route", entry.user_id, entry.statement,
+            entry.parameters, "".join(f"\n  {frame}" for frame in entry.stack),
+        )
+        self.add(entry)
+
+    def add(self, entry: SlowQuery):
+        with self._lock:
+            self.recorded += 1
+            self._recent.append(entry)
+            item = (entry.duration_ms, next(self._seq), entry)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, item)
+            elif self.top_n > 0:
+                heapq.heappushpop(self._slowest, item)
+
+    def clear(self):
+        with self._lock:
+            self.recorded = 0
+            self._slowest.clear()
+            self._recent.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+            recent = list(reversed(self._recent))
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "recorded": self.recorded,
+            "slowest": [asdict(entry) for entry in slowest],
+            "recent": [asdict(entry) for entry in recent],
+        }
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_TOP_N, SLOW_QUERY_STACK_DEPTH)
+if SLOW_QUERY_LOG_ENABLED:
+    slow_query_log.enable()
@@ -0,0 +1,207 @@
+"""Per-process cache of who takes part in a task.
+
+Participant-gated routes check the caller against the cached owner and
+live assignees of a task, so the task itself is read by primary key
+without a membership subquery. Entries are filled when a task is loaded with its
+assignees and expire after TASK_ACL_CACHE_TTL_SECONDS.
+
+Routes that change who takes part in a task (assigning, removing an
+assignee, deleting the task) mark it with `invalidate_task_acl`; the
+entries are dropped once the transaction commits. The invalidation goes
+through a TaskAclBackend: the default only reaches this process, so other
+workers rely on the TTL unless TASK_ACL_INVALIDATION_BACKEND names a
+cross-worker one.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, FrozenSet, Iterable, Optional
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..broker import load_backend
+from ..consts import TaskRole
+from ..database import READ_REPLICA
+from ..metrics import Counter
+
+# Switch off to always check participation in the database
+TASK_ACL_CACHE_ENABLED = os.getenv("TASK_ACL_CACHE_ENABLED", "true").lower() in ("1", "true")
+TASK_ACL_CACHE_TTL_SECONDS = float(os.getenv("TASK_ACL_CACHE_TTL_SECONDS", "30"))
+TASK_ACL_CACHE_MAX_SIZE = int(os.getenv("TASK_ACL_CACHE_MAX_SIZE", "10000"))
+# "module:Class" of the TaskAclBackend carrying invalidations between workers; LocalTaskAclBackend when unset
+TASK_ACL_INVALIDATION_BACKEND = os.getenv("TASK_ACL_INVALIDATION_BACKEND", "")
+
+ACL_CHANGED_TASK_IDS = "acl_changed_task_ids"
+# Generation of the cache when the session's transaction began
+ACL_GENERATION = "task_acl_generation"
+
+Discard = Callable[[Iterable[int]], None]
+
+
+@dataclass(frozen=True)
+class TaskAcl:
+    owner_id: int
+    assignee_ids: FrozenSet[int]
+
+    def role(self, user_id: int) -> Optional[TaskRole]:
+        if user_id == self.owner_id:
+            return TaskRole.OWNED
+        if user_id in self.assignee_ids:
+            return TaskRole.ASSIGNED
+        return None
+
+
+class TaskAclBackend(ABC):
+    """Carries invalidated task ids to the caches of every worker.
+
+    A backend calls `discard(task_ids)` in each worker that receives an
+    invalidation, including the one that published it.
+    """
+
+    def __init__(self, discard: Discard):
+        self.discard = discard
+
+    @abstractmethod
+    def publish(self, task_ids: Iterable[int]):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class LocalTaskAclBackend(TaskAclBackend):
+    """Invalidates within this process only."""
+
+    def publish(self, task_ids: Iterable[int]):
+        self.discard(task_ids)
+
+
+class TaskAclCache:
+    """Bounded per-process LRU cache of task id -> TaskAcl with a TTL."""
+
+    def __init__(
+        self,
+        enabled: bool,
+        ttl: float,
+        max_size: int,
+        backend: Optional[Callable[[Discard], TaskAclBackend]] = None,
+    ):
+        self.enabled = enabled and ttl > 0 and max_size > 0
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = (backend or LocalTaskAclBackend)(self.discard)
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation. An entry read from the database
+        # before an invalidation may be stale and is not stored.
+        self.generation = 0
+        self._entries: OrderedDict[int, tuple[float, TaskAcl]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, task_id: int) -> Optional[TaskAcl]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[task_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(task_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, task_id: int, acl: TaskAcl, generation: int):
+        """Store `acl`, read from the database when the cache was at `generation`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[task_id] = (time.monotonic() + self.ttl, acl)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, task_ids: Iterable[int]):
+        """Drop `task_ids` in every worker the backend reaches."""
+        self.backend.publish(list(task_ids))
+
+    def discard(self, task_ids: Iterable[int]):
+        with self._lock:
+            self.generation += 1
+            for task_id in task_ids:
+                self._entries.pop(task_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+task_acl_cache = TaskAclCache(
+    TASK_ACL_CACHE_ENABLED,
+    TASK_ACL_CACHE_TTL_SECONDS,
+    TASK_ACL_CACHE_MAX_SIZE,
+    load_backend(TASK_ACL_INVALIDATION_BACKEND) if TASK_ACL_INVALIDATION_BACKEND else None,
+)
+
+Counter(
+    "task_acl_cache_lookups_total",
+    "Task participant cache lookups",
+    ["result"],
+    collect=lambda: {("hit",): task_acl_cache.hits, ("miss",): task_acl_cache.misses},
+)
+
+
+def store_task_acl(db: AsyncSession, task_id: int, acl: TaskAcl):
+    """Cache `acl`, read through `db`, unless `db` is on the read replica.
+
+    Replica rows can predate an invalidation the primary already committed.
+    """
+    generation = db.info.get(ACL_GENERATION)
+    if not db.info.get(READ_REPLICA) and generation is not None:
+        task_acl_cache.set(task_id, acl, generation)
+
+
+def invalidate_task_acl(db: AsyncSession, task_ids: Iterable[int]):
+    """Drop the cached participants of `task_ids` once `db` commits."""
+    db.info.setdefault(ACL_CHANGED_TASK_IDS, set()).update(task_ids)
+
+
+@event.listens_for(Session, "after_begin")
+def _after_begin(session: Session, transaction, connection):
+    # Before the transaction's first statement: under REPEATABLE READ all its
+    # reads see the snapshot of that statement, which misses later invalidations
+    session.info[ACL_GENERATION] = task_acl_cache.generation
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    task_ids = session.info.pop(ACL_CHANGED_TASK_IDS, None)
+    if task_ids:
+        task_acl_cache.invalidate(task_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(ACL_CHANGED_TASK_IDS, None)
@@ -0,0 +1,156 @@
+"""Change log behind `GET /tasks/changes`.
+
+Every task write appends one `task_changes` row per user whose view of the
+task changed: its participants, plus users who were just removed from it.
+A client keeps a local copy of its tasks and asks for the changes after its
+cursor, an indexed range of the (user_id, id) index.
+
+Ids are assigned when a row is inserted but become visible when the
+transaction commits, so a row may appear behind a higher id that was
+already read. Rows younger than TASK_CHANGES_SETTLE_SECONDS are therefore
+only sent once they have settled, and a cursor never moves past them.
+
+Rows older than TASK_CHANGES_RETENTION_DAYS can be pruned with:
+    python -m src.backend.task.changes
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Tuple
+import asyncio
+import binascii
+import json
+import os
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Integer, delete, insert, literal, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import SessionLocal
+from ..models import Task, TaskAssignee, TaskChange, User
+
+TASK_CHANGES_RETENTION_DAYS = float(os.getenv("TASK_CHANGES_RETENTION_DAYS", "30"))
+# Longest expected time between writing a change and committing it
+TASK_CHANGES_SETTLE_SECONDS = float(os.getenv("TASK_CHANGES_SETTLE_SECONDS", "5"))
+
+
+# A cursor is the id and creation time of the last change the client has
+# seen. Changes after it were created at most TASK_CHANGES_SETTLE_SECONDS
+# before it, which tells whether pruning may have removed some of them.
+ChangesCursor = Tuple[int, datetime]
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def encode_changes_cursor(cursor: ChangesCursor) -> str:
+    change_id, created_at = cursor
+    data = {"id": change_id, "created_at": created_at.isoformat()}
+    return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_changes_cursor(cursor: str, now: datetime) -> ChangesCursor:
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+        change_id = int(data["id"])
+        created_at = _aware(datetime.fromisoformat(data["created_at"]))
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    oldest_kept = now - timedelta(days=TASK_CHANGES_RETENTION_DAYS)
+    if created_at - timedelta(seconds=TASK_CHANGES_SETTLE_SECONDS) < oldest_kept:
+        # Changes after the cursor may have been pruned
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor expired, fetch GET /tasks again"
+        )
+    return change_id, created_at
+
+
+def next_cursor(rows: list, since: ChangesCursor) -> ChangesCursor:
+    """Cursor after `rows`, which are all settled: no lower id can still commit."""
+    if not rows:
+        return since
+    return rows[-1].id, _aware(rows[-1].created_at)
+
+
+async def get_start_cursor(user: User, db: AsyncSession, now: datetime) -> ChangesCursor:
+    """Cursor after the user's settled changes, to sync from before a full GET /tasks."""
+    cutoff = now - timedelta(seconds=TASK_CHANGES_SETTLE_SECONDS)
+    # Walks the user's changes backwards from the newest
+    row = (await db.execute(
+        select(TaskChange.id, TaskChange.created_at)
+        .where(TaskChange.user_id == user.id, TaskChange.created_at <= cutoff)
+        .order_by(TaskChange.id.desc())
+        .limit(1)
+    )).first()
+    return (row.id, _aware(row.created_at)) if row else (0, cutoff)
+
+
+async def get_changes(user: User, since: ChangesCursor, now: datetime, limit: int, db: AsyncSession) -> List:
+    """The user's settled changes after `since`, in id order."""
+    cutoff = now - timedelta(seconds=TASK_CHANGES_SETTLE_SECONDS)
+    return (await db.execute(
+        select(TaskChange.id, TaskChange.task_id, TaskChange.created_at)
+        .where(TaskChange.user_id == user.id, TaskChange.id > since[0], TaskChange.created_at <= cutoff)
+        .order_by(TaskChange.id)
+        .limit(limit)
+    )).all()
+
+
+async def record_task_changes(
+    db: AsyncSession, task_ids: Iterable[int], removed_user_ids: Iterable[int] = (), created: bool = False
+):
+    """Log a change of `task_ids` for their participants and for users just removed from them.
+
+    Call it after writing the task and its new assignees. The rows also move
+    the GET /tasks ETag of the same users, and the task's sort keys are
+    copied onto its live assignments, unless the tasks were just `created`
+    with the keys already on their assignments.
+    """
+    task_ids = list(task_ids)
+    removed_user_ids = list(removed_user_ids)
+    created_at = literal(datetime.now(timezone.utc), DateTime(timezone=True))
+    affected = [
+        select(Task.owner_id, Task.id, created_at).where(Task.id.in_(task_ids)),
+        select(TaskAssignee.user_id, TaskAssignee.task_id, created_at).where(
+            TaskAssignee.task_id.in_(task_ids),
+            TaskAssignee.deleted_at.is_(None)
+        ),
+    ]
+    affected += [
+        select(literal(user_id, Integer), Task.id, created_at).where(Task.id.in_(task_ids))
+        for user_id in removed_user_ids
+    ]
+    await db.execute(insert(TaskChange).from_select(["user_id", "task_id", "created_at"], union(*affected)))
+    if created:
+        return
+    # Assigned-task pages of GET /tasks are read by the copies on the assignments
+    await db.execute(
+        update(TaskAssignee)
+        .where(TaskAssignee.task_id.in_(task_ids), TaskAssignee.deleted_at.is_(None))
+        .values(
+            task_updated_at=select(Task.updated_at).where(Task.id == TaskAssignee.task_id).scalar_subquery(),
+            task_due_date=select(Task.due_date).where(Task.id == TaskAssignee.task_id).scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def prune_task_changes(db: AsyncSession, before: datetime) -> int:
+    result = await db.execute(delete(TaskChange).where(TaskChange.created_at < before))
+    await db.commit()
+    return result.rowcount
+
+
+async def _prune():
+    async with SessionLocal() as db:
+        before = datetime.now(timezone.utc) - timedelta(days=TASK_CHANGES_RETENTION_DAYS)
+        print(f"Pruned {await prune_task_changes(db, before)} task changes")
+
+
+if __name__ == "__main__":
+    asyncio.run(_prune())
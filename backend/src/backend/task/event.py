@@ -1,80 +1,84 @@
 from abc import ABC, abstractmethod
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..consts import TaskEventType
-from ..models import Task, User, TaskEvent as TaskEventModel, Notification
+from ..database import insert_returning_ids
+from ..models import Task, User, TaskEvent as TaskEventModel, NotificationOutbox
+from .outbox import OUTBOX_WRITTEN
 
 class TaskEvent(ABC):
+    event_type: TaskEventType
+
     def __init__(self, task: Task, actor: User):
         self.id: Optional[int] = None
         self.task = task
         self.actor = actor
     
+    async def save(self, db: AsyncSession):
+        """Write the event and its outbox row in the session's transaction.
+
+        Nothing is committed: the caller commits them together with the task
+        change that caused the event.
+        """
+        await self.save_all(db, [self])
+
+    @staticmethod
+    async def save_all(db: AsyncSession, events: List["TaskEvent"]):
+        """Write several events and their outbox rows with one INSERT each."""
+        ids = await insert_returning_ids(db, TaskEventModel, [{
+            "task_id": event.task.id,
+            "actor_id": event.actor.id,
+            "event_type": event.event_type,
+            "payload": event._create_payload(),
+            "message": event._create_message(),
+        } for event in events])
+        for event, event_id in zip(events, ids):
+            event.id = event_id
+        # Notifications are created by the outbox dispatcher after commit
+        await db.execute(insert(NotificationOutbox).values([{"task_event_id": event_id} for event_id in ids]))
+        db.info[OUTBOX_WRITTEN] = True
+
     @abstractmethod
-    def save(self, db: Session) -> bool:
+    def _create_payload(self) -> dict:
         pass
 
     @abstractmethod
     def _create_message(self) -> str:
         pass
-    
-    def notificate(self, db: Session):
-        participant_ids = {self.task.owner.id}
-        if self.task.assignees:
-            participant_ids.update([assignee.user_id for assignee in self.task.assignees])
-        
-        for participant_id in participant_ids:
-            if participant_id != self.actor.id:  # Avoid notifying the actor
-                if self.id is not None:
-                    notification = Notification(
-                        user_id=participant_id,
-                        task_event_id=self.id,
-                        message=self._create_message(),
-                    )
-                    db.add(notification)
-        db.commit()
 
 class TaskAssignmentEvent(TaskEvent):
-    def __init__(self, task: Task, actor: User, assignee: User):
+    """One event for all users assigned by a single request."""
+
+    event_type = TaskEventType.TASK_ASSIGNED
+    # Usernames spelled out in the message, so its length does not grow with the batch
+    MAX_NAMED_ASSIGNEES = 3
+
+    def __init__(self, task: Task, actor: User, assignees: List[User]):
         super().__init__(task, actor)
-        self.assignee = assignee
+        self.assignees = assignees
 
-    def save(self, db: Session):
-        event = TaskEventModel(
-            task_id=self.task.id,
-            actor_id=self.actor.id,
-            event_type=TaskEventType.TASK_ASSIGNED,
-            payload={"assignee_id": self.assignee.id},
-            message=self._create_message(),
-        )
-        db.add(event)
-        db.commit()
-        db.refresh(event)
-        self.id = event.id
-        self.notificate(db)
+    def _create_payload(self) -> dict:
+        return {"assignee_ids": [assignee.id for assignee in self.assignees]}
     
     def _create_message(self) -> str:
-        return f"Task '{self.task.title}' has been assigned to {self.assignee.username} by {self.actor.username}."
+        names = [assignee.username for assignee in self.assignees[:self.MAX_NAMED_ASSIGNEES]]
+        others = len(self.assignees) - len(names)
+        if others:
+            names.append(f"{others} other{'s' if others > 1 else ''}")
+        assignees = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+        return f"Task '{self.task.title}' has been assigned to {assignees} by {self.actor.username}."
 
 class TaskStatusUpdatedEvent(TaskEvent):
+    event_type = TaskEventType.TASK_STATUS_UPDATED
+
     def __init__(self, task: Task, actor: User, old_status: str, new_status: str):
         super().__init__(task, actor)
         self.old_status = old_status
         self.new_status = new_status
 
-    def save(self, db: Session):
-        event = TaskEventModel(
-            task_id=self.task.id,
-            actor_id=self.actor.id,
-            event_type=TaskEventType.TASK_STATUS_UPDATED,
-            payload={"old_status": self.old_status, "new_status": self.new_status},
-            message=self._create_message(),
-        )
-        db.add(event)
-        db.commit()
-        db.refresh(event)
-        self.id = event.id
-        self.notificate(db)
+    def _create_payload(self) -> dict:
+        return {"old_status": self.old_status, "new_status": self.new_status}
     
     def _create_message(self) -> str:
-        return f"Task '{self.task.title}' status changed from {self.old_status} to {self.new_status} by {self.actor.username}."
\ No newline at end of file
+        return f"Task '{self.task.title}' status changed from {self.old_status} to {self.new_status} by {self.actor.username}."
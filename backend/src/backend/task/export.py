@@ -0,0 +1,97 @@
+"""NDJSON export of task events.
+
+Events are read through a server-side cursor in batches of
+TASK_EVENT_EXPORT_BATCH_SIZE rows and written out as they arrive, so memory
+stays flat however many events match. Lines are in event id order: a client
+whose download broke off resumes with `after_id` set to the last id it read.
+"""
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import json
+import os
+import zlib
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import TaskEvent
+
+# Rows fetched from the database cursor at a time
+TASK_EVENT_EXPORT_BATCH_SIZE = int(os.getenv("TASK_EVENT_EXPORT_BATCH_SIZE", "1000"))
+
+
+def task_events_query(
+    after_id: Optional[int],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+) -> Select:
+    query = select(
+        TaskEvent.id,
+        TaskEvent.task_id,
+        TaskEvent.actor_id,
+        TaskEvent.event_type,
+        TaskEvent.payload,
+        TaskEvent.message,
+        TaskEvent.created_at,
+    ).order_by(TaskEvent.id)
+    if after_id is not None:
+        query = query.where(TaskEvent.id > after_id)
+    if created_from is not None:
+        query = query.where(TaskEvent.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(TaskEvent.created_at < created_to)
+    return query
+
+
+def format_event(row) -> str:
+    return json.dumps({
+        "id": row.id,
+        "task_id": row.task_id,
+        "actor_id": row.actor_id,
+        "event_type": row.event_type,
+        "payload": row.payload,
+        "message": row.message,
+        "created_at": row.created_at.isoformat(),
+    }) + "\n"
+
+
+async def export_task_events(db: AsyncSession, query: Select, compress: bool) -> AsyncIterator[bytes]:
+    """Stream the rows of `query` as NDJSON, gzipped when `compress` is set.
+
+    Owns `db` for the duration of the stream and closes it at the end.
+    """
+    gzip = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    try:
+        result = await db.stream(query.execution_options(yield_per=TASK_EVENT_EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            chunk = "".join(format_event(row) for row in rows).encode()
+            if gzip is not None:
+                chunk = gzip.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+        if gzip is not None:
+            yield gzip.flush()
+    finally:
+        await db.close()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def export_response(db: AsyncSession, query: Select, accept_encoding: Optional[str]) -> StreamingResponse:
+    compress = accepts_gzip(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_task_events(db, query, compress),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
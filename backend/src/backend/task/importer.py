@@ -0,0 +1,264 @@
+"""Bulk import of tasks from CSV or NDJSON files.
+
+The file is parsed as it is read. Rows are validated with `TaskImportRow`
+and written in chunks of TASK_IMPORT_CHUNK_SIZE rows: one lookup of the
+chunk's assignee usernames (per ASSIGNEE_LOOKUP_BATCH_SIZE of them), one
+multi-row INSERT each for tasks and assignees, then a commit. Each chunk is its own transaction. Rows that fail
+validation or name unknown assignees are reported by line and skipped
+without aborting the import. An import that breaks off part-way keeps the
+chunks already committed.
+
+Imported tasks keep their `status`. Imported assignments write no task
+events and notify no one: a migration would otherwise flood assignees with
+notifications about old work.
+
+CSV files start with a header naming the columns: title, description,
+due_date, status and assignees, which holds usernames separated by ";".
+NDJSON lines are objects with the same keys, and assignees is a list.
+
+Import a file as a given owner with:
+    python -m src.backend.task.importer tasks.csv --owner alice
+"""
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import os
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import String, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import SessionLocal, insert_returning_ids
+from ..models import Task, TaskAssignee, User
+from .changes import record_task_changes
+from .schemas import TaskImportError, TaskImportOut, TaskImportRow
+
+# Rows written per transaction
+TASK_IMPORT_CHUNK_SIZE = int(os.getenv("TASK_IMPORT_CHUNK_SIZE", "1000"))
+# Failed rows listed in the report; all of them are counted
+TASK_IMPORT_MAX_ERRORS = int(os.getenv("TASK_IMPORT_MAX_ERRORS", "1000"))
+# Usernames looked up per statement, one SELECT each; SQLite allows 500 in a UNION ALL
+ASSIGNEE_LOOKUP_BATCH_SIZE = 500
+
+# Empty CSV cells of these columns are left out, so they take their defaults
+OPTIONAL_CSV_COLUMNS = ("due_date", "status", "assignees")
+ASSIGNEE_SEPARATOR = ";"
+
+# A parsed row: the line it starts on, and its fields or why it could not be parsed
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+Parser = Callable[[AsyncIterator[bytes]], AsyncIterator[ParsedRow]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 `chunks` and split them into lines, keeping the line breaks."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    header = None
+    record = ""
+    line_number = start = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not record:
+            start = line_number
+        record += line
+        # A quoted field may span lines (RFC 4180): the record ends at a
+        # line break outside of quotes, where the quotes seen are balanced
+        if record.count('"') % 2:
+            continue
+        fields = next(csv.reader([record]), [])
+        record = ""
+        if not fields:
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        if len(fields) != len(header):
+            yield start, None, f"Expected {len(header)} fields, got {len(fields)}"
+            continue
+        row = {
+            name: value for name, value in zip(header, fields)
+            if value or name not in OPTIONAL_CSV_COLUMNS
+        }
+        if "assignees" in row:
+            row["assignees"] = [
+                username.strip() for username in row["assignees"].split(ASSIGNEE_SEPARATOR) if username.strip()
+            ]
+        yield start, row, None
+    if record:
+        yield start, None, "Unterminated quoted field"
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+
+IMPORT_FORMATS: Dict[str, Parser] = {"csv": parse_csv, "ndjson": parse_ndjson}
+IMPORT_MEDIA_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson"}
+
+
+def get_import_parser(content_type: Optional[str]) -> Parser:
+    media_type = (content_type or "").partition(";")[0].strip().lower()
+    if media_type not in IMPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Send {' or '.join(IMPORT_MEDIA_TYPES)}"
+        )
+    return IMPORT_FORMATS[IMPORT_MEDIA_TYPES[media_type]]
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def _fail(report: TaskImportOut, line: int, detail: str):
+    report.failed += 1
+    if len(report.errors) < TASK_IMPORT_MAX_ERRORS:
+        report.errors.append(TaskImportError(line=line, detail=detail))
+
+
+async def _find_assignees(db: AsyncSession, usernames: set) -> Dict[str, int]:
+    """Id of the live user each username names, as the database compares usernames.
+
+    The usernames are echoed back with the ids they match, so the result
+    follows the column's collation: "Alice" can name "alice" on MySQL but
+    not on SQLite.
+    """
+    user_ids = {}
+    usernames = sorted(usernames)
+    for start in range(0, len(usernames), ASSIGNEE_LOOKUP_BATCH_SIZE):
+        lookups = [
+            select(literal(username, String).label("requested"), User.id).where(
+                User.username == username, User.deleted_at.is_(None)
+            )
+            for username in usernames[start:start + ASSIGNEE_LOOKUP_BATCH_SIZE]
+        ]
+        rows = (await db.execute(union_all(*lookups))).all()
+        user_ids.update({requested: user_id for requested, user_id in rows})
+    return user_ids
+
+
+async def _import_chunk(db: AsyncSession, owner_id: int, chunk: List[ParsedRow], report: TaskImportOut):
+    items = []
+    for line, data, error in chunk:
+        if error is None:
+            try:
+                items.append((line, TaskImportRow.model_validate(data)))
+                continue
+            except ValidationError as exc:
+                error = _describe(exc)
+        _fail(report, line, error)
+
+    user_ids = await _find_assignees(db, {username for _, item in items for username in item.assignees})
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    assignee_ids = []
+    for line, item in items:
+        unknown = [username for username in item.assignees if username not in user_ids]
+        if unknown:
+            _fail(report, line, f"Users {', '.join(unknown)} not found")
+            continue
+        rows.append({
+            "title": item.title,
+            "description": item.description,
+            "due_date": item.due_date,
+            "status": item.status,
+            "owner_id": owner_id,
+            "created_at": now,
+            "updated_at": now,
+        })
+        assignee_ids.append({user_ids[username] for username in item.assignees})
+    if not rows:
+        return
+
+    task_ids = await insert_returning_ids(db, Task, rows)
+    assignees = [
+        {"task_id": task_id, "user_id": user_id, "task_updated_at": now, "task_due_date": row["due_date"]}
+        for task_id, row, ids in zip(task_ids, rows, assignee_ids)
+        for user_id in sorted(ids)
+    ]
+    if assignees:
+        await db.execute(insert(TaskAssignee), assignees)
+    await record_task_changes(db, task_ids, created=True)
+    await db.commit()
+    report.imported += len(rows)
+
+
+async def import_tasks(
+    db: AsyncSession,
+    owner_id: int,
+    rows: AsyncIterator[ParsedRow],
+    chunk_size: Optional[int] = None,
+) -> TaskImportOut:
+    """Create a task owned by `owner_id` for every valid row; commits once per chunk."""
+    chunk_size = chunk_size or TASK_IMPORT_CHUNK_SIZE
+    report = TaskImportOut()
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            await _import_chunk(db, owner_id, chunk, report)
+            chunk = []
+    if chunk:
+        await _import_chunk(db, owner_id, chunk, report)
+    return report
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+
+async def _import_file(path: str, owner: str, import_format: str, chunk_size: Optional[int]):
+    async with SessionLocal() as db:
+        owner_id = (await db.execute(
+            select(User.id).where(User.username == owner, User.deleted_at.is_(None))
+        )).scalar()
+        if owner_id is None:
+            raise SystemExit(f"User {owner} not found")
+        report = await import_tasks(db, owner_id, IMPORT_FORMATS[import_format](_read_file(path)), chunk_size)
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import tasks from a CSV or NDJSON file.")
+    parser.add_argument("path")
+    parser.add_argument("--owner", required=True, help="username of the owner of the imported tasks")
+    parser.add_argument("--format", choices=list(IMPORT_FORMATS), help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int)
+    args = parser.parse_args()
+    import_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    asyncio.run(_import_file(args.path, args.owner, import_format, args.chunk_size))
@@ -0,0 +1,238 @@
+"""Turns task events into notifications outside of the request path.
+
+Requests write a task event plus a `notification_outbox` row in the same
+transaction. The dispatcher drains the outbox in batches: it creates the
+notifications of each event, deletes the outbox rows and commits, then
+pushes the notifications to connected clients. A batch that fails is
+retried as a whole, so delivery is at least once; the unique
+(task_event_id, user_id) index makes retries idempotent.
+
+Run it inside the web app (default) or as its own process:
+    python -m src.backend.task.outbox
+"""
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from ..broker import notification_broker
+from ..database import SessionLocal
+from ..metrics import Counter, Gauge, Histogram
+from ..models import Task, TaskAssignee, TaskEvent, Notification, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# Run the dispatcher as a background task of each web worker
+NOTIFICATION_DISPATCHER_ENABLED = os.getenv("NOTIFICATION_DISPATCHER_ENABLED", "true").lower() in ("1", "true")
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.getenv("NOTIFICATION_DISPATCH_BATCH_SIZE", "100"))
+# Poll interval for events written by other processes; commits in this process wake the dispatcher at once
+NOTIFICATION_DISPATCH_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_DISPATCH_INTERVAL_SECONDS", "1"))
+
+NOTIFICATION_FAN_OUT = Histogram(
+    "notification_fan_out",
+    "Notifications created per task event",
+    ["event_type"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+DISPATCH_FAILURES = Counter("notification_dispatch_failures_total", "Dispatcher batches that failed and were retried")
+
+OUTBOX_WRITTEN = "outbox_written"
+PENDING_NOTIFICATIONS = "pending_notifications"
+
+
+def insert_new_notifications(dialect_name: str, notifications: list):
+    """INSERT of `notifications` that skips the (task_event_id, user_id) pairs already notified.
+
+    Only that conflict is skipped; any other error still fails the batch.
+    """
+    if dialect_name == "mysql":
+        # INSERT IGNORE would also turn other errors into warnings
+        statement = mysql.insert(Notification).values(notifications)
+        return statement.on_duplicate_key_update(id=Notification.id)
+    return (
+        sqlite.insert(Notification)
+        .values(notifications)
+        .on_conflict_do_nothing(index_elements=["task_event_id", "user_id"])
+    )
+
+
+def _age_seconds(created_at: datetime, now: datetime) -> float:
+    # SQLite returns naive datetimes
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max((now - created_at).total_seconds(), 0.0)
+
+
+class NotificationDispatcher:
+    def __init__(self, session_factory: async_sessionmaker, batch_size: int, interval: float):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dispatched_events = 0
+        self.created_notifications = 0
+        self.failures = 0
+        # Seconds between writing an event and creating its notifications
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def dispatch_batch(self) -> int:
+        """Dispatch up to batch_size outbox rows; returns how many were dispatched."""
+        async with self.session_factory() as db:
+            batch = (await db.execute(
+                select(
+                    NotificationOutbox.id,
+                    NotificationOutbox.created_at,
+                    TaskEvent.id.label("task_event_id"),
+                    TaskEvent.task_id,
+                    TaskEvent.actor_id,
+                    TaskEvent.event_type,
+                    TaskEvent.message,
+                    Task.owner_id,
+                )
+                .join(TaskEvent, TaskEvent.id == NotificationOutbox.task_event_id)
+                .join(Task, Task.id == TaskEvent.task_id)
+                .order_by(NotificationOutbox.id)
+                .limit(self.batch_size)
+                # Concurrent dispatchers take different batches
+                .with_for_update(of=NotificationOutbox, skip_locked=True)
+            )).all()
+            if not batch:
+                return 0
+
+            assignees = (await db.execute(select(TaskAssignee.task_id, TaskAssignee.user_id).where(
+                TaskAssignee.task_id.in_({row.task_id for row in batch}),
+                TaskAssignee.deleted_at.is_(None),
+            ))).all()
+            participant_ids = {}
+            for row in batch:
+                participant_ids[row.task_id] = {row.owner_id}
+            for assignee in assignees:
+                participant_ids[assignee.task_id].add(assignee.user_id)
+
+            notifications = []
+            fan_outs = []
+            for row in batch:
+                recipient_ids = participant_ids[row.task_id] - {row.actor_id}  # Avoid notifying the actor
+                fan_outs.append((row.event_type, len(recipient_ids)))
+                notifications.extend(
+                    {"user_id": user_id, "task_event_id": row.task_event_id, "message": row.message}
+                    for user_id in sorted(recipient_ids)
+                )
+                # Pushed to connected clients once the transaction commits
+                db.info.setdefault(PENDING_NOTIFICATIONS, []).append((recipient_ids, {
+                    "task_id": row.task_id,
+                    "task_event_id": row.task_event_id,
+                    "event_type": row.event_type,
+                    "message": row.message,
+                }))
+
+            if notifications:
+                # One multi-row INSERT; rows created by an earlier attempt are skipped
+                await db.execute(insert_new_notifications(db.get_bind().dialect.name, notifications))
+            await db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_([row.id for row in batch])))
+            await db.commit()
+
+        for event_type, fan_out in fan_outs:
+            NOTIFICATION_FAN_OUT.observe((event_type,), fan_out)
+        now = datetime.now(timezone.utc)
+        self.last_lag_seconds = max(_age_seconds(row.created_at, now) for row in batch)
+        self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+        self.dispatched_events += len(batch)
+        self.created_notifications += len(notifications)
+        return len(batch)
+
+    async def dispatch_pending(self) -> int:
+        """Dispatch until the outbox is empty."""
+        dispatched = 0
+        while True:
+            count = await self.dispatch_batch()
+            dispatched += count
+            if count < self.batch_size:
+                return dispatched
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.dispatch_pending()
+            except Exception:
+                self.failures += 1
+                DISPATCH_FAILURES.inc()
+                logger.exception("Dispatching notifications failed, retrying in %s seconds", self.interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self):
+        """Dispatch without waiting for the next poll; callable from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    async def stats(self, db: AsyncSession) -> dict:
+        pending, oldest = (await db.execute(
+            select(func.count(), func.min(NotificationOutbox.created_at))
+        )).one()
+        return {
+            "pending_events": pending,
+            "oldest_pending_age_seconds": _age_seconds(oldest, datetime.now(timezone.utc)) if oldest else 0.0,
+            "dispatched_events": self.dispatched_events,
+            "created_notifications": self.created_notifications,
+            "failures": self.failures,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+
+notification_dispatcher = NotificationDispatcher(
+    SessionLocal, NOTIFICATION_DISPATCH_BATCH_SIZE, NOTIFICATION_DISPATCH_INTERVAL_SECONDS
+)
+
+Gauge(
+    "notification_dispatch_lag_seconds",
+    "Age of the oldest event in the dispatcher's last batch",
+    collect=lambda: {(): notification_dispatcher.last_lag_seconds},
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    if session.info.pop(OUTBOX_WRITTEN, False):
+        notification_dispatcher.wake()
+    for recipient_ids, message in session.info.pop(PENDING_NOTIFICATIONS, []):
+        notification_broker.publish(recipient_ids, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(OUTBOX_WRITTEN, None)
+    session.info.pop(PENDING_NOTIFICATIONS, None)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(notification_dispatcher.run())
@@ -0,0 +1,96 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+import binascii
+import json
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import InstrumentedAttribute
+
+from ..consts import TaskSortKey
+from ..models import Task, TaskAssignee
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Keyset pagination over (updated_at DESC, id DESC) or (due_date ASC NULLS LAST, id ASC).
+# A cursor is the sort value and id of the last task of the previous page.
+
+
+class SortColumns(NamedTuple):
+    """Columns a page of tasks is read by."""
+    updated_at: InstrumentedAttribute
+    due_date: InstrumentedAttribute
+    task_id: InstrumentedAttribute
+
+
+TASK_SORT_COLUMNS = SortColumns(Task.updated_at, Task.due_date, Task.id)
+# Copies of the task's sort keys on its assignments, so a user's assigned
+# tasks are read along a task_assignees index as well
+ASSIGNMENT_SORT_COLUMNS = SortColumns(TaskAssignee.task_updated_at, TaskAssignee.task_due_date, TaskAssignee.task_id)
+
+
+def encode_cursor(sort: TaskSortKey, task: Task) -> str:
+    value = getattr(task, sort)
+    data = {"sort": sort, "value": value.isoformat() if value else None, "id": task.id}
+    return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: TaskSortKey) -> Tuple[Optional[datetime], int]:
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+        if data["sort"] != sort:
+            raise ValueError("cursor was issued for another sort order")
+        value = datetime.fromisoformat(data["value"]) if data["value"] is not None else None
+        return value, int(data["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_order(sort: TaskSortKey) -> list:
+    """Order of a page assembled from the keyset ranges."""
+    if sort == TaskSortKey.UPDATED_AT:
+        return [Task.updated_at.desc(), Task.id.desc()]
+    return [Task.due_date.is_(None), Task.due_date, Task.id]
+
+
+def keyset_ranges(
+    sort: TaskSortKey,
+    cursor: Optional[Tuple[Optional[datetime], int]],
+    columns: SortColumns = TASK_SORT_COLUMNS,
+) -> List[Tuple[list, list]]:
+    """(filters, order) of the index-ordered ranges that hold the tasks after the cursor, in page order.
+
+    Tasks without a due date come last in due_date order. They are a range
+    of their own, read in id order: a single condition that also matched
+    them would have to be sorted instead of read along the index.
+    """
+    if sort == TaskSortKey.UPDATED_AT:
+        filters = []
+        if cursor is not None:
+            value, task_id = cursor
+            filters.append(or_(
+                columns.updated_at < value,
+                and_(columns.updated_at == value, columns.task_id < task_id),
+            ))
+        return [(filters, [columns.updated_at.desc(), columns.task_id.desc()])]
+
+    value, task_id = cursor if cursor is not None else (None, None)
+    ranges = []
+    if cursor is None:
+        ranges.append(([columns.due_date.is_not(None)], [columns.due_date, columns.task_id]))
+    elif value is not None:
+        ranges.append(([or_(
+            columns.due_date > value,
+            and_(columns.due_date == value, columns.task_id > task_id),
+        )], [columns.due_date, columns.task_id]))
+    undated = [columns.due_date.is_(None)]
+    if cursor is not None and value is None:
+        # Already inside the trailing tasks without a due date
+        undated.append(columns.task_id > task_id)
+    ranges.append((undated, [columns.task_id]))
+    return ranges
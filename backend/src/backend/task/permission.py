@@ -1,13 +1,34 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
 
+from ..consts import TaskRole
 from ..database import get_db
 from ..models import Task, TaskAssignee, User
 from ..auth.dependencies import get_current_user
+from .acl import TaskAcl, store_task_acl, task_acl_cache
 
 
-def get_task_or_404(task_id: int, db: Session) -> Task:
-    task = db.query(Task).filter(Task.id == task_id, Task.deleted_at.is_(None)).first()
+@dataclass
+class TaskAccess:
+    task: Task
+    # Live assignees in assignment order
+    assignees: List[User]
+    # How the caller takes part in the task; None when they do not
+    role: Optional[TaskRole]
+
+
+async def get_task_or_404(task_id: int, db: AsyncSession) -> Task:
+    # The owner is part of every task response, so load it up front
+    result = await db.execute(
+        select(Task)
+        .options(joinedload(Task.owner, innerjoin=True))
+        .where(Task.id == task_id, Task.deleted_at.is_(None))
+    )
+    task = result.scalars().first()
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -16,6 +37,32 @@ def get_task_or_404(task_id: int, db: Session) -> Task:
     return task
 
 
+async def load_task_access(task_id: int, user: User, db: AsyncSession) -> TaskAccess:
+    """Load a live task with its owner and live assignees, and the role of `user`, in one statement.
+
+    Also caches the participants of the task.
+    """
+    assignee = aliased(User)
+    rows = (await db.execute(
+        select(Task, assignee)
+        .options(joinedload(Task.owner, innerjoin=True))
+        .outerjoin(TaskAssignee, and_(TaskAssignee.task_id == Task.id, TaskAssignee.deleted_at.is_(None)))
+        .outerjoin(assignee, assignee.id == TaskAssignee.user_id)
+        .where(Task.id == task_id, Task.deleted_at.is_(None))
+        .order_by(TaskAssignee.id)
+    )).all()
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    task = rows[0][0]
+    assignees = [user for _, user in rows if user is not None]
+    acl = TaskAcl(owner_id=task.owner_id, assignee_ids=frozenset(assignee.id for assignee in assignees))
+    store_task_acl(db, task.id, acl)
+    return TaskAccess(task=task, assignees=assignees, role=acl.role(user.id))
+
+
 def verify_task_owner(task: Task, user: User):
     if task.owner_id != user.id:
         raise HTTPException(
@@ -24,36 +71,80 @@ def verify_task_owner(task: Task, user: User):
         )
 
 
-def verify_task_participant(task: Task, user: User, db: Session):
-    if task.owner_id == user.id:
-        return
-    assignee = db.query(TaskAssignee).filter(
-        TaskAssignee.task_id == task.id,
+async def get_tasks_with_participant_flags(
+        task_ids: Iterable[int],
+        user: User,
+        db: AsyncSession
+    ) -> Dict[int, Tuple[Task, bool]]:
+    """Load live tasks by id with whether `user` participates in each, in one query.
+
+    Ids of missing or deleted tasks are absent from the result.
+    """
+    is_assigned = select(TaskAssignee.id).where(
+        TaskAssignee.task_id == Task.id,
         TaskAssignee.user_id == user.id,
         TaskAssignee.deleted_at.is_(None)
-    ).first()
-    if not assignee:
+    ).exists()
+    rows = (await db.execute(
+        select(Task, or_(Task.owner_id == user.id, is_assigned).label("is_participant"))
+        .options(joinedload(Task.owner, innerjoin=True))
+        .where(Task.id.in_(set(task_ids)), Task.deleted_at.is_(None))
+    )).all()
+    return {task.id: (task, is_participant) for task, is_participant in rows}
+
+
+async def get_task_with_perticipant_check(
+        task_id: int,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+    ):
+    acl = task_acl_cache.get(task_id)
+    if acl is None:
+        # Task, owner and participants in one statement; caches the participants
+        access = await load_task_access(task_id, current_user, db)
+        task, role = access.task, access.role
+    else:
+        # The task is read by primary key before the role is checked, so a
+        # missing or deleted task is a 404 for everyone, as on a cache miss
+        task = await get_task_or_404(task_id, db)
+        role = acl.role(current_user.id)
+    if role is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to perform this action"
         )
+    return task
 
 
-def get_task_with_perticipant_check(
+async def get_task_access_with_participant_check(
         task_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
-    ):
-    task = get_task_or_404(task_id, db)
-    verify_task_participant(task, current_user, db)
-    return task
+    ) -> TaskAccess:
+    access = await load_task_access(task_id, current_user, db)
+    if access.role is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to perform this action"
+        )
+    return access
 
 
-def get_task_with_owner_check(
+async def get_task_with_owner_check(
         task_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
     ):
-    task = get_task_or_404(task_id, db)
+    task = await get_task_or_404(task_id, db)
     verify_task_owner(task, current_user)
     return task
+
+
+async def get_task_access_with_owner_check(
+        task_id: int,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+    ) -> TaskAccess:
+    access = await load_task_access(task_id, current_user, db)
+    verify_task_owner(access.task, current_user)
+    return access
@@ -1,80 +1,276 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
+from typing import Optional
 
 from ..auth.dependencies import get_current_user
-from ..database import get_db
-from ..models import User, Task, TaskAssignee
-from .permission import get_task_with_perticipant_check, get_task_with_owner_check
+from ..consts import TaskRole, TaskSortKey, TaskStatus
+from ..database import get_db, insert_returning_ids
+from ..replica import get_read_db
+from ..models import User, Task, TaskAssignee, TaskEvent
+from ..responses import FastJSONResponse
+from .permission import (
+    TaskAccess, get_task_access_with_owner_check, get_task_access_with_participant_check,
+    get_task_with_owner_check, get_task_with_perticipant_check, get_tasks_with_participant_flags,
+)
+from .acl import invalidate_task_acl
+from .changes import (
+    decode_changes_cursor, encode_changes_cursor, get_changes, get_start_cursor, next_cursor, record_task_changes,
+)
 from .event import TaskAssignmentEvent, TaskStatusUpdatedEvent
+from .export import export_response, task_events_query
+from .importer import get_import_parser, import_tasks
+from .pagination import (
+    ASSIGNMENT_SORT_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    decode_cursor, encode_cursor, keyset_order, keyset_ranges,
+)
+from .rows import select_task_rows, task_out
 from .schemas import *
+from .version import (
+    CACHE_CONTROL, etag_matches, get_task_list_version, get_task_version, task_etag, task_list_etag,
+)
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 @router.post("", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     task_create: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     new_task = Task(
         title=task_create.title,
         description=task_create.description,
         due_date=task_create.due_date,
-        owner_id=current_user.id
+        owner=current_user
     )
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
-    return TaskOut.model_validate(new_task)
+    await db.flush()
+    await record_task_changes(db, [new_task.id], created=True)
+    await db.commit()
+    return FastJSONResponse(TaskOut.model_validate(new_task), status_code=status.HTTP_201_CREATED)
+
+@router.post(":batch", response_model=TaskBatchOut, status_code=status.HTTP_201_CREATED)
+async def create_tasks(
+    batch: TaskBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    now = datetime.now(timezone.utc)
+    rows = [{
+        "title": item.title,
+        "description": item.description,
+        "due_date": item.due_date,
+        "status": TaskStatus.PENDING,
+        "owner_id": current_user.id,
+        "created_at": now,
+        "updated_at": now,
+    } for item in batch.items]
+    task_ids = await insert_returning_ids(db, Task, rows)
+    await record_task_changes(db, task_ids, created=True)
+    await db.commit()
+
+    owner = UserOut.model_validate(current_user)
+    return FastJSONResponse(TaskBatchOut(results=[
+        TaskBatchItemResult(
+            status_code=status.HTTP_201_CREATED,
+            task=TaskOut(id=task_id, owner=owner, **row),
+        )
+        for task_id, row in zip(task_ids, rows)
+    ]), status_code=status.HTTP_201_CREATED)
+
+@router.post(":import", response_model=TaskImportOut)
+async def import_user_tasks(
+    request: Request,
+    content_type: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create tasks from a CSV (`text/csv`) or NDJSON (`application/x-ndjson`) request body.
+
+    Rows that fail are listed in the report; the others are imported.
+    """
+    parse = get_import_parser(content_type)
+    return FastJSONResponse(await import_tasks(db, current_user.id, parse(request.stream())))
 
 @router.get("", response_model=TasksGetOut)
-def get_tasks(
-    db: Session = Depends(get_db),
+async def get_tasks(
+    request: Request,
+    role: Optional[TaskRole] = Query(None),
+    task_status: Optional[TaskStatus] = Query(None, alias="status"),
+    due_from: Optional[datetime] = Query(None),
+    due_to: Optional[datetime] = Query(None),
+    sort: TaskSortKey = Query(TaskSortKey.UPDATED_AT),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get tasks where user is the owner
-    owned_tasks = db.query(Task).filter(
-        Task.owner_id == current_user.id,
-        Task.deleted_at.is_(None)
-    ).all()
-    
-    # Get tasks where user is assigned
-    assigned_task_ids = db.query(TaskAssignee.task_id).filter(
+    # Read before the tasks: a change in between makes the ETag stale, never the page
+    etag = task_list_etag(current_user.id, await get_task_list_version(current_user, db), request.url.query)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    filters = [Task.deleted_at.is_(None)]
+    if task_status is not None:
+        filters.append(Task.status == task_status)
+    if due_from is not None:
+        filters.append(Task.due_date >= due_from)
+    if due_to is not None:
+        filters.append(Task.due_date <= due_to)
+    keyset = decode_cursor(cursor, sort) if cursor is not None else None
+
+    # Each role and keyset range contributes its own page of ids (an index
+    # range scan); the union of the pages always contains the next limit + 1 tasks
+    pages = []
+    if role in (None, TaskRole.OWNED):
+        # Tasks where user is the owner
+        for range_filters, range_order in keyset_ranges(sort, keyset):
+            pages.append(
+                select(Task.id.label("task_id"))
+                .where(Task.owner_id == current_user.id, *filters, *range_filters)
+                .order_by(*range_order)
+                .limit(limit + 1)
+                .subquery()
+            )
+    if role in (None, TaskRole.ASSIGNED):
+        # Tasks where user is assigned, read along the sort keys copied onto the assignments
+        for range_filters, range_order in keyset_ranges(sort, keyset, ASSIGNMENT_SORT_COLUMNS):
+            pages.append(
+                select(TaskAssignee.task_id)
+                .join(Task, Task.id == TaskAssignee.task_id)
+                .where(
+                    TaskAssignee.user_id == current_user.id,
+                    TaskAssignee.deleted_at.is_(None),
+                    *filters,
+                    *range_filters
+                )
+                .order_by(*range_order)
+                .limit(limit + 1)
+                .subquery()
+            )
+    page_ids = union(*(select(page.c.task_id) for page in pages)).subquery()
+
+    is_assigned = select(TaskAssignee.id).where(
+        TaskAssignee.task_id == Task.id,
         TaskAssignee.user_id == current_user.id,
         TaskAssignee.deleted_at.is_(None)
-    ).all()
-    
-    assigned_task_ids = [task_id for (task_id,) in assigned_task_ids]
-    
-    assigned_tasks = []
-    if assigned_task_ids:
-        assigned_tasks = [TaskOut.model_validate(task) for task in db.query(Task).filter(
-            Task.id.in_(assigned_task_ids),
+    ).exists()
+    # Columns only, serialized once: the shape of TasksGetOut without building models
+    rows = (await db.execute(
+        select_task_rows((Task.owner_id == current_user.id).label("is_owned"), is_assigned.label("is_assigned"))
+        .join(page_ids, page_ids.c.task_id == Task.id)
+        .order_by(*keyset_order(sort))
+        .limit(limit + 1)
+    )).all()
+
+    page = rows[:limit]
+    # A task the user owns and is assigned to is only listed under the role asked for
+    return FastJSONResponse({
+        "owned_tasks": [task_out(row) for row in page if row.is_owned] if role != TaskRole.ASSIGNED else [],
+        "assigned_tasks": [task_out(row) for row in page if row.is_assigned] if role != TaskRole.OWNED else [],
+        "next_cursor": encode_cursor(sort, page[-1]) if len(rows) > limit else None,
+    }, headers=headers)
+
+@router.get("/changes", response_model=TaskChangesOut)
+async def get_task_changes(
+    since: Optional[str] = Query(None, description="next_cursor of the previous call"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    now = datetime.now(timezone.utc)
+    if since is None:
+        # Sync starts here; changes made before the client's next GET /tasks are sent again
+        return FastJSONResponse(TaskChangesOut(
+            next_cursor=encode_changes_cursor(await get_start_cursor(current_user, db, now))
+        ))
+
+    cursor = decode_changes_cursor(since, now)
+    changes = await get_changes(current_user, cursor, now, limit + 1, db)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Current state of the changed tasks; the log only says which ones changed
+    task_ids = list(dict.fromkeys(change.task_id for change in changes))
+    tasks = await get_tasks_with_participant_flags(task_ids, current_user, db) if task_ids else {}
+    changed_tasks, removed_task_ids = [], []
+    for task_id in task_ids:
+        task, is_participant = tasks.get(task_id, (None, False))
+        if is_participant:
+            changed_tasks.append(TaskOut.model_validate(task))
+        else:
+            removed_task_ids.append(task_id)
+
+    return FastJSONResponse(TaskChangesOut(
+        tasks=changed_tasks,
+        removed_task_ids=removed_task_ids,
+        next_cursor=encode_changes_cursor(next_cursor(changes, cursor)),
+        has_more=has_more,
+    ))
+
+@router.get("/events/export", response_class=StreamingResponse)
+async def export_user_task_events(
+    after_id: Optional[int] = Query(None, description="Id of the last event already exported"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Events of every task the user owns or is assigned to
+    task_ids = union(
+        select(Task.id).where(Task.owner_id == current_user.id, Task.deleted_at.is_(None)),
+        select(TaskAssignee.task_id)
+        .join(Task, Task.id == TaskAssignee.task_id)
+        .where(
+            TaskAssignee.user_id == current_user.id,
+            TaskAssignee.deleted_at.is_(None),
             Task.deleted_at.is_(None)
-        ).all()]
-    
-    return TasksGetOut(
-        owned_tasks=[TaskOut.model_validate(task) for task in owned_tasks],
-        assigned_tasks=assigned_tasks
+        ),
     )
-    
+    query = task_events_query(after_id, created_from, created_to).where(TaskEvent.task_id.in_(task_ids))
+    return export_response(db, query, accept_encoding)
 
-@router.get("/{task_id}", response_model=TaskDetailOut)
-def get_task(
+@router.get("/{task_id}/events/export", response_class=StreamingResponse)
+async def export_events_of_task(
+    after_id: Optional[int] = Query(None, description="Id of the last event already exported"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    accept_encoding: Optional[str] = Header(None),
     task: Task = Depends(get_task_with_perticipant_check),
-    db: Session = Depends(get_db),
-):  
-    # Get assignees
-    assignees = db.query(User).join(
-        TaskAssignee, User.id == TaskAssignee.user_id
-    ).filter(
-        TaskAssignee.task_id == task.id,
-        TaskAssignee.deleted_at.is_(None)
-    ).all()
-    
+    db: AsyncSession = Depends(get_db),
+):
+    query = task_events_query(after_id, created_from, created_to).where(TaskEvent.task_id == task.id)
+    return export_response(db, query, accept_encoding)
+
+@router.get("/{task_id}", response_model=TaskDetailOut)
+async def get_task(
+    task_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    if if_none_match is not None:
+        # One lookup answers an unchanged task; anything else takes the full path
+        version = await get_task_version(task_id, current_user, db)
+        if version is not None and etag_matches(if_none_match, task_etag(task_id, version)):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": task_etag(task_id, version), "Cache-Control": CACHE_CONTROL},
+            )
+    # Task, owner and assignees in one statement
+    access = await get_task_access_with_participant_check(task_id, db, current_user)
+    task, assignees = access.task, access.assignees
+    headers = {"ETag": task_etag(task.id, task.version), "Cache-Control": CACHE_CONTROL}
+
     # Create response with assignees
-    return TaskDetailOut(
+    return FastJSONResponse(TaskDetailOut(
         id=task.id,
         title=task.title,
         description=task.description,
@@ -84,14 +280,14 @@ def get_task(
         created_at=task.created_at,
         updated_at=task.updated_at,
         assignees=[UserOut.model_validate(user) for user in assignees]
-    )
+    ), headers=headers)
 
 @router.put("/{task_id}", response_model=TaskOut)
-def update_task(
+async def update_task(
     task_update: TaskUpdate,
     task: Task = Depends(get_task_with_owner_check),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # Update fields if provided
     if task_update.title is not None:
@@ -109,67 +305,126 @@ def update_task(
         task.status = task_update.status
     
     task.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(task)
+    task.version = Task.version + 1
+    await record_task_changes(db, [task.id])
 
     # Create task status updated event
     if task_status_updated:
-        TaskStatusUpdatedEvent(
+        await TaskStatusUpdatedEvent(
             task,
             current_user,
             old_status,
             task.status
         ).save(db)
+    await db.commit()
     
-    return task
+    return FastJSONResponse(TaskOut.model_validate(task))
 
 @router.patch("/{task_id}/status", response_model=TaskOut)
-def update_task_status(
+async def update_task_status(
     task_status_update: TaskStatusUpdate,
     task: Task = Depends(get_task_with_perticipant_check),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):    
     old_status = task.status
     task_status_updated = old_status != task_status_update.status
     if not task_status_updated:
-        return TaskOut.model_validate(task)
+        return FastJSONResponse(TaskOut.model_validate(task))
     # Update status
     task.status = task_status_update.status
     task.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(task)
+    task.version = Task.version + 1
+    await record_task_changes(db, [task.id])
 
     # Create task status updated event
-    TaskStatusUpdatedEvent(
+    await TaskStatusUpdatedEvent(
         task,
         current_user,
         old_status,
         task.status
     ).save(db)
+    await db.commit()
     
-    return TaskOut.model_validate(task)
+    return FastJSONResponse(TaskOut.model_validate(task))
+
+@router.patch("/status:batch", response_model=TaskBatchOut)
+async def update_task_statuses(
+    batch: TaskStatusBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    tasks = await get_tasks_with_participant_flags([item.task_id for item in batch.items], current_user, db)
+
+    results = []
+    events = []
+    changed_ids = {task_status: [] for task_status in TaskStatus}
+    seen_ids = set()
+    for item in batch.items:
+        task, is_participant = tasks.get(item.task_id, (None, False))
+        if item.task_id in seen_ids:
+            results.append(TaskBatchItemResult(
+                status_code=status.HTTP_409_CONFLICT, detail="Task appears more than once in the batch"
+            ))
+            continue
+        seen_ids.add(item.task_id)
+        if task is None:
+            results.append(TaskBatchItemResult(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"))
+            continue
+        if not is_participant:
+            results.append(TaskBatchItemResult(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action"
+            ))
+            continue
+        if task.status != item.status:
+            events.append(TaskStatusUpdatedEvent(task, current_user, task.status, item.status))
+            changed_ids[item.status].append(task.id)
+        results.append(task)
+
+    if events:
+        # One UPDATE per target status; tasks in the session are updated too
+        now = datetime.now(timezone.utc)
+        for task_status, task_ids in changed_ids.items():
+            if task_ids:
+                await db.execute(
+                    update(Task)
+                    .where(Task.id.in_(task_ids))
+                    .values(status=task_status, updated_at=now, version=Task.version + 1)
+                )
+        await record_task_changes(db, [event.task.id for event in events])
+        await TaskStatusUpdatedEvent.save_all(db, events)
+        await db.commit()
+
+    return FastJSONResponse(TaskBatchOut(results=[
+        TaskBatchItemResult(status_code=status.HTTP_200_OK, task=TaskOut.model_validate(result))
+        if isinstance(result, Task) else result
+        for result in results
+    ]))
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task: Task = Depends(get_task_with_owner_check),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # Soft delete
     task.deleted_at = datetime.now(timezone.utc)
-    db.commit()
+    task.version = Task.version + 1
+    await record_task_changes(db, [task.id])
+    invalidate_task_acl(db, [task.id])
+    await db.commit()
     
     return None
 
 @router.post("/{task_id}/assignees", response_model=TaskDetailOut)
-def assign_users_to_task(
+async def assign_users_to_task(
     assignee_data: TaskAssigneeCreate,
-    task: Task = Depends(get_task_with_owner_check),
-    db: Session = Depends(get_db),
+    access: TaskAccess = Depends(get_task_access_with_owner_check),
+    db: AsyncSession = Depends(get_db),
 ):    
+    task = access.task
     # Verify all users exist
     user_ids = assignee_data.user_ids
-    users = db.query(User).filter(User.id.in_(user_ids)).all()
+    users = (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars().all()
     found_user_ids = [user.id for user in users]
     
     if len(found_user_ids) != len(user_ids):
@@ -179,44 +434,43 @@ def assign_users_to_task(
             detail=f"Users with ids {missing_ids} not found"
         )
     
-    # Get existing assignees to avoid duplicates
-    existing_assignees = db.query(TaskAssignee).filter(
-        TaskAssignee.task_id == task.id,
-        TaskAssignee.deleted_at.is_(None)
-    ).all()
-    existing_user_ids = [assignee.user_id for assignee in existing_assignees]
-    
-    new_assignee_ids = set(user_ids) - set(existing_user_ids)
-    # Add new assignees
-    for user_id in new_assignee_ids:
-        new_assignee = TaskAssignee(
-            task_id=task.id,
-            user_id=user_id
-        )
-        db.add(new_assignee)
-    
-    db.commit()
+    # Existing assignees came with the task; skip them to avoid duplicates
+    existing_assignee_users = access.assignees
+    existing_user_ids = {user.id for user in existing_assignee_users}
 
-    new_assignees = db.query(User).filter(
-        User.id.in_(new_assignee_ids)
-    ).all()
+    new_assignees = [user for user in users if user.id not in existing_user_ids]
+    try:
+        # Add new assignees in one multi-row INSERT
+        if new_assignees:
+            await db.execute(insert(TaskAssignee).values([
+                {"task_id": task.id, "user_id": user.id, "task_updated_at": task.updated_at, "task_due_date": task.due_date}
+                for user in new_assignees
+            ]))
+    except IntegrityError:
+        # Another request assigned one of these users in the meantime
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Users are already assigned to this task"
+        )
 
-    # Create task assignment event
-    for assignee in new_assignees:
-        TaskAssignmentEvent(
+    # One task assignment event for all new assignees
+    if new_assignees:
+        task.updated_at = datetime.now(timezone.utc)
+        task.version = Task.version + 1
+        await record_task_changes(db, [task.id])
+        invalidate_task_acl(db, [task.id])
+        await TaskAssignmentEvent(
             task,
             task.owner,
-            assignee
+            new_assignees
         ).save(db)
-    
-    # Get updated assignees for response
-    existing_assignee_users = db.query(User).filter(
-        User.id.in_(existing_user_ids)
-    ).all()
-    assignees = list(new_assignees) + list(existing_assignee_users)
+    await db.commit()
+
+    assignees = new_assignees + list(existing_assignee_users)
     
     # Create response with assignees
-    return TaskDetailOut(
+    return FastJSONResponse(TaskDetailOut(
         id=task.id,
         title=task.title,
         description=task.description,
@@ -226,20 +480,20 @@ def assign_users_to_task(
         created_at=task.created_at,
         updated_at=task.updated_at,
         assignees=[UserOut.model_validate(user) for user in assignees]
-    )
+    ))
 
 @router.delete("/{task_id}/assignees/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_assignee_from_task(
+async def remove_assignee_from_task(
     user_id: int,
     task: Task = Depends(get_task_with_owner_check),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # Find the assignee
-    assignee = db.query(TaskAssignee).filter(
+    assignee = (await db.execute(select(TaskAssignee).where(
         TaskAssignee.task_id == task.id,
         TaskAssignee.user_id == user_id,
         TaskAssignee.deleted_at.is_(None)
-    ).first()
+    ))).scalars().first()
     
     if not assignee:
         raise HTTPException(
@@ -249,6 +503,10 @@ def remove_assignee_from_task(
     
     # Soft delete the assignment
     assignee.deleted_at = datetime.now(timezone.utc)
-    db.commit()
+    task.updated_at = assignee.deleted_at
+    task.version = Task.version + 1
+    await record_task_changes(db, [task.id], [user_id])
+    invalidate_task_acl(db, [task.id])
+    await db.commit()
     
     return None
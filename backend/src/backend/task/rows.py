@@ -0,0 +1,39 @@
+"""Column-only reads of tasks for list responses.
+
+Selecting columns skips building ORM objects and tracking them in the
+session. `task_out` turns such a row into the dict `TaskOut` would
+serialize to, with the same keys in the same order.
+"""
+from sqlalchemy import Select, select
+
+from ..models import Task, User
+
+TASK_OUT_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.due_date,
+    Task.status,
+    Task.created_at,
+    Task.updated_at,
+    Task.owner_id,
+    User.username.label("owner_username"),
+)
+
+
+def select_task_rows(*columns) -> Select:
+    """Columns of TaskOut, plus `columns`, with the owner joined in."""
+    return select(*TASK_OUT_COLUMNS, *columns).join(User, User.id == Task.owner_id)
+
+
+def task_out(row) -> dict:
+    return {
+        "title": row.title,
+        "description": row.description,
+        "due_date": row.due_date,
+        "status": row.status,
+        "id": row.id,
+        "owner": {"id": row.owner_id, "username": row.owner_username},
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
@@ -42,9 +42,55 @@ class TaskOut(TaskBase):
 class TasksGetOut(BaseModel):
     owned_tasks: List[TaskOut] = []
     assigned_tasks: List[TaskOut] = []
+    next_cursor: Optional[str] = None
+
+class TaskChangesOut(BaseModel):
+    # Current state of tasks created or changed since the cursor
+    tasks: List[TaskOut] = []
+    # Tasks deleted since the cursor, or the user no longer takes part in
+    removed_task_ids: List[int] = []
+    next_cursor: str
+    has_more: bool = False
 
 class TaskDetailOut(TaskOut):
     assignees: List[UserOut] = []
 
 class TaskAssigneeCreate(BaseModel):
     user_ids: List[int]
+
+# Items accepted by one batch request
+MAX_BATCH_SIZE = 500
+
+class TaskBatchCreate(BaseModel):
+    items: List[TaskCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TaskStatusBatchItem(TaskStatusUpdate):
+    task_id: int
+
+class TaskStatusBatchUpdate(BaseModel):
+    items: List[TaskStatusBatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TaskBatchItemResult(BaseModel):
+    # HTTP status the single-item endpoint would have returned
+    status_code: int
+    task: Optional[TaskOut] = None
+    detail: Optional[str] = None
+
+class TaskBatchOut(BaseModel):
+    # One result per item, in request order
+    results: List[TaskBatchItemResult]
+
+class TaskImportRow(TaskCreate):
+    # Usernames of the users to assign
+    assignees: List[str] = []
+
+class TaskImportError(BaseModel):
+    # Line of the file the row starts on
+    line: int
+    detail: str
+
+class TaskImportOut(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    # The first TASK_IMPORT_MAX_ERRORS failed rows
+    errors: List[TaskImportError] = []
@@ -0,0 +1,73 @@
+"""Versions behind the ETags of the task endpoints.
+
+`Task.version` changes with the task and its assignees, so it versions
+`GET /tasks/{task_id}`. Every write to a task the user takes part in
+appends to their change log (see `changes`), so the newest id and the
+number of rows of the log, one range of the (user_id, id) index, version
+`GET /tasks` without writing to `users`. A client that sends the ETag
+back in `If-None-Match` gets a 304 after one indexed lookup.
+"""
+from typing import Optional
+import hashlib
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Task, TaskAssignee, TaskChange, User
+from .acl import TaskAcl, store_task_acl, task_acl_cache
+
+# Clients revalidate every time; the response is private to the user
+CACHE_CONTROL = "private, no-cache"
+
+
+def task_etag(task_id: int, version: int) -> str:
+    return f'"{task_id}.{version}"'
+
+
+def task_list_etag(user_id: int, version: str, query: str) -> str:
+    # Each set of query parameters is its own representation
+    digest = hashlib.sha1(query.encode()).hexdigest()[:16]
+    return f'"{user_id}.{version}.{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of If-None-Match against `etag` (RFC 9110 13.1.2)."""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def get_task_version(task_id: int, user: User, db: AsyncSession) -> Optional[int]:
+    """Version of a live task `user` takes part in; None when it is missing or not theirs."""
+    acl = task_acl_cache.get(task_id)
+    if acl is not None:
+        if acl.role(user.id) is None:
+            return None
+        return (await db.execute(select(Task.version).where(
+            Task.id == task_id,
+            Task.deleted_at.is_(None),
+        ))).scalar_one_or_none()
+    # Version and participants in one statement; caches the participants for the next poll
+    rows = (await db.execute(
+        select(Task.version, Task.owner_id, TaskAssignee.user_id)
+        .outerjoin(TaskAssignee, and_(TaskAssignee.task_id == Task.id, TaskAssignee.deleted_at.is_(None)))
+        .where(Task.id == task_id, Task.deleted_at.is_(None))
+    )).all()
+    if not rows:
+        return None
+    acl = TaskAcl(
+        owner_id=rows[0].owner_id,
+        assignee_ids=frozenset(row.user_id for row in rows if row.user_id is not None),
+    )
+    store_task_acl(db, task_id, acl)
+    return rows[0].version if acl.role(user.id) is not None else None
+
+
+async def get_task_list_version(user: User, db: AsyncSession) -> str:
+    # The newest id alone would miss a lower id committing late; the count does not
+    last_id, count = (await db.execute(
+        select(func.max(TaskChange.id), func.count()).where(TaskChange.user_id == user.id)
+    )).one()
+    return f"{last_id or 0}.{count}"
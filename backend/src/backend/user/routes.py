@@ -1,40 +1,154 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import get_current_user
+from ..broker import notification_broker
+from ..consts import UserMatch
 from ..database import get_db
+from ..replica import get_read_db
 from ..models import User, Notification
-from .schemas import UserOut
+from .schemas import UserOut, NotificationOut, NotificationFeedOut, NotificationAck, UnreadCountOut
+from .search import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, search_users_by_substring, username_prefix
+from .stream import NOTIFICATION_STREAM_KEEPALIVE_SECONDS, notification_events
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[UserOut])
 async def list_users(
+    response: Response,
     keyword: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    match: UserMatch = Query(UserMatch.SUBSTRING),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_read_db),
     _: User = Depends(get_current_user)
 ):
-    users = db.query(User).all()
-    if keyword:
-        users = [user for user in users if keyword in user.username]
+    # Users are ordered by username; the cursor is the last username of the previous page
+    if keyword and match == UserMatch.SUBSTRING:
+        users = await search_users_by_substring(db, keyword, cursor, limit + 1)
+    else:
+        query = select(User.id, User.username).where(User.deleted_at.is_(None))
+        if keyword:
+            query = query.where(username_prefix(keyword))
+        if cursor is not None:
+            query = query.where(User.username > cursor)
+        users = (await db.execute(query.order_by(User.username).limit(limit + 1))).all()
+
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = users[-1].username
     return [UserOut.model_validate(user) for user in users]
 
+def last_read_notification_id(user: User):
+    """The user's read watermark as a scalar subquery; 0 when nothing was read yet."""
+    return func.coalesce(
+        select(User.last_read_notification_id).where(User.id == user.id).scalar_subquery(),
+        0,
+    )
+
+async def acknowledge_notifications(db: AsyncSession, user: User, up_to_id: int):
+    """Move the read watermark to the user's last notification with id <= up_to_id.
+
+    The watermark never moves backwards.
+    """
+    last_id = select(func.max(Notification.id)).where(
+        Notification.user_id == user.id,
+        Notification.id <= up_to_id,
+    ).scalar_subquery()
+    await db.execute(
+        update(User)
+        .where(User.id == user.id, func.coalesce(User.last_read_notification_id, 0) < last_id)
+        .values(last_read_notification_id=last_id)
+        .execution_options(invalidate_principal_cache=False)
+    )
+
 @router.get("/notifications", response_model=List[str])
 async def get_notifications(
-    db: Session = Depends(get_db),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read.is_(False),
-    ).all()
+    # Oldest unread notifications first
+    notifications = (await db.execute(
+        select(Notification.id, Notification.message).where(
+            Notification.user_id == current_user.id,
+            Notification.id > last_read_notification_id(current_user),
+        ).order_by(Notification.id).limit(limit)
+    )).all()
     
     # Mark notifications as read
-    for notification in notifications:
-        notification.is_read = True
+    if notifications:
+        await acknowledge_notifications(db, current_user, notifications[-1].id)
+        await db.commit()
     
-    db.commit()
+    return [notification.message for notification in notifications]
+
+@router.get("/notifications/feed", response_model=NotificationFeedOut)
+async def get_notification_feed(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before_id: Optional[int] = Query(None, description="next_before_id of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Newest first; reading the feed does not mark anything as read
+    query = select(
+        Notification.id,
+        Notification.task_event_id,
+        Notification.message,
+        Notification.created_at,
+        (Notification.id <= last_read_notification_id(current_user)).label("is_read"),
+    ).where(Notification.user_id == current_user.id)
+    if before_id is not None:
+        query = query.where(Notification.id < before_id)
+    rows = (await db.execute(query.order_by(Notification.id.desc()).limit(limit + 1))).all()
+
+    page = rows[:limit]
+    return NotificationFeedOut(
+        notifications=[NotificationOut.model_validate(row) for row in page],
+        next_before_id=page[-1].id if len(rows) > limit else None
+    )
+
+@router.post("/notifications/ack", status_code=status.HTTP_204_NO_CONTENT)
+async def acknowledge_notifications_up_to(
+    ack: NotificationAck,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    await acknowledge_notifications(db, current_user, ack.up_to_id)
+    await db.commit()
     
-    return [notification.message for notification in notifications]
\ No newline at end of file
+    return None
+
+@router.get("/notifications/unread_count", response_model=UnreadCountOut)
+async def get_unread_notification_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Counts the (user_id, id) index range above the watermark
+    unread_count = (await db.execute(
+        select(func.count()).select_from(Notification).where(
+            Notification.user_id == current_user.id,
+            Notification.id > last_read_notification_id(current_user),
+        )
+    )).scalar_one()
+    return UnreadCountOut(unread_count=unread_count)
+
+@router.get("/notifications/stream", response_class=StreamingResponse)
+async def stream_notifications(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # The stream stays open long after authentication; give back the
+    # database connection now instead of holding it per client
+    user_id = current_user.id
+    await db.close()
+
+    return StreamingResponse(
+        notification_events(notification_broker, user_id, NOTIFICATION_STREAM_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
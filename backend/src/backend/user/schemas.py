@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel, Field, ConfigDict
 
 class UserOut(BaseModel):
@@ -6,4 +9,24 @@ class UserOut(BaseModel):
 
     model_config = ConfigDict(
         from_attributes=True,
-    )
\ No newline at end of file
+    )
+class NotificationOut(BaseModel):
+    id: int
+    task_event_id: int
+    message: str
+    created_at: datetime
+    is_read: bool
+
+    model_config = ConfigDict(
+        from_attributes=True,
+    )
+
+class NotificationFeedOut(BaseModel):
+    notifications: List[NotificationOut]
+    next_before_id: Optional[int] = None
+
+class NotificationAck(BaseModel):
+    up_to_id: int
+
+class UnreadCountOut(BaseModel):
+    unread_count: int
@@ -0,0 +1,182 @@
+from bisect import bisect_right, insort
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..database import SessionLocal
+from ..models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Full rebuilds drop soft-deleted users and pick up rows the id-based catch-up
+# can miss (ids committed out of order by concurrent signups)
+USER_SEARCH_REBUILD_SECONDS = float(os.getenv("USER_SEARCH_REBUILD_SECONDS", "300"))
+
+NGRAM_SIZE = 3
+# Rows read between yields to the event loop while the index is built
+BUILD_BATCH_SIZE = 10000
+
+
+def escape_like(text: str) -> str:
+    """`text` as a literal in a LIKE pattern with ESCAPE '\\'."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def username_prefix(prefix: str):
+    # A constant prefix is a range on ix_users_username with any collation
+    return User.username.like(escape_like(prefix) + "%", escape="\\")
+
+
+def ngrams(text: str) -> set:
+    """Substrings of `text` up to NGRAM_SIZE long, so that short keywords have postings too."""
+    return {text[i:i + size] for size in range(1, NGRAM_SIZE + 1) for i in range(len(text) - size + 1)}
+
+
+def keyword_ngrams(keyword: str) -> set:
+    """The longest n-grams of `keyword`; every username containing it is in all of their postings."""
+    size = min(len(keyword), NGRAM_SIZE)
+    return {keyword[i:i + size] for i in range(len(keyword) - size + 1)}
+
+
+def _build(rows: list) -> tuple:
+    """Username -> id, and n-gram -> sorted usernames containing it."""
+    rows.sort(key=lambda row: row[1])
+    ids = {}
+    postings = {}
+    for user_id, username in rows:
+        ids[username] = user_id
+        for gram in ngrams(username):
+            postings.setdefault(gram, []).append(username)
+    return ids, postings, max((row[0] for row in rows), default=0)
+
+
+class UserSearchIndex:
+    """Per-process n-gram index of usernames for substring search.
+
+    Usernames are posted under their unigrams, bigrams and trigrams, so a
+    keyword of any length reads one posting list.
+
+    Built in the background when the app starts and rebuilt every
+    `rebuild_interval` seconds; searches keep using the previous version
+    while a rebuild runs, and requests only add the users created since.
+    Candidates still have to be checked against the database, which is the
+    source of truth for soft deletes.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, rebuild_interval: float):
+        self.session_factory = session_factory
+        self.rebuild_interval = rebuild_interval
+        self.ready = False
+        self._ids: dict[str, int] = {}
+        # Sorted, so a search reads its matches in order and stops at the page size
+        self._postings: dict[str, list] = {}
+        self._max_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, user_id: int, username: str):
+        self._max_id = max(self._max_id, user_id)
+        if username in self._ids:
+            return
+        self._ids[username] = user_id
+        for gram in ngrams(username):
+            insort(self._postings.setdefault(gram, []), username)
+
+    def clear(self):
+        """Empty the index, as for an empty users table."""
+        self._ids = {}
+        self._postings = {}
+        self._max_id = 0
+        self.ready = True
+
+    async def rebuild(self, db: AsyncSession):
+        rows = []
+        result = await db.stream(select(User.id, User.username).where(User.deleted_at.is_(None)))
+        async for partition in result.partitions(BUILD_BATCH_SIZE):
+            rows.extend(tuple(row) for row in partition)
+        ids, postings, max_id = await asyncio.to_thread(_build, rows)
+        # Users added to the old version since the rows were read are past
+        # max_id, so the next catch-up adds them again
+        self._ids, self._postings, self._max_id = ids, postings, max_id
+        self.ready = True
+
+    async def catch_up(self, db: AsyncSession):
+        """Add the users created by other workers since the last build or catch-up."""
+        rows = (await db.execute(
+            select(User.id, User.username).where(User.id > self._max_id)
+        )).all()
+        for row in rows:
+            self.add(row.id, row.username)
+
+    def search(self, keyword: str, after: Optional[str], limit: int) -> list:
+        """Up to `limit` (username, id) pairs of usernames containing `keyword`, ordered by username."""
+        # Every match is in the shortest posting list of the keyword's n-grams
+        postings = min((self._postings.get(gram, []) for gram in keyword_ngrams(keyword)), key=len)
+        matches = []
+        for i in range(bisect_right(postings, after) if after is not None else 0, len(postings)):
+            username = postings[i]
+            if keyword in username:
+                matches.append((username, self._ids[username]))
+                if len(matches) == limit:
+                    break
+        return matches
+
+    async def run(self):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    await self.rebuild(db)
+            except Exception:
+                logger.exception("Building the user search index failed, retrying in %s seconds", self.rebuild_interval)
+            await asyncio.sleep(self.rebuild_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+user_search_index = UserSearchIndex(SessionLocal, USER_SEARCH_REBUILD_SECONDS)
+
+
+async def search_users_by_substring(db: AsyncSession, keyword: str, after: Optional[str], limit: int) -> list:
+    if not user_search_index.ready:
+        # Until the first build finishes after startup, the table is scanned
+        query = select(User.id, User.username).where(
+            User.deleted_at.is_(None), User.username.like("%" + escape_like(keyword) + "%", escape="\\")
+        )
+        if after is not None:
+            query = query.where(User.username > after)
+        return (await db.execute(query.order_by(User.username).limit(limit))).all()
+
+    await user_search_index.catch_up(db)
+    users = []
+    while len(users) < limit:
+        wanted = limit - len(users)
+        candidates = user_search_index.search(keyword, after, wanted)
+        if not candidates:
+            break
+        rows = (await db.execute(
+            select(User.id, User.username).where(
+                User.id.in_([user_id for _, user_id in candidates]), User.deleted_at.is_(None)
+            )
+        )).all()
+        live_users = {row.id: row for row in rows}
+        users.extend(live_users[user_id] for _, user_id in candidates if user_id in live_users)
+        if len(candidates) < wanted:
+            break
+        # Some candidates were soft-deleted; read on past them
+        after = candidates[-1][0]
+    return users
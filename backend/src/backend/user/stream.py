@@ -0,0 +1,36 @@
+from typing import AsyncIterator
+import asyncio
+import json
+import os
+
+from ..broker import Broker
+
+# Comment line sent when the stream is idle, so proxies keep the connection
+# open and dead clients are noticed
+NOTIFICATION_STREAM_KEEPALIVE_SECONDS = float(os.getenv("NOTIFICATION_STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def notification_events(broker: Broker, user_id: int, keepalive: float) -> AsyncIterator[str]:
+    """Server-sent events for the notifications of `user_id`.
+
+    A `lagged` event means notifications were dropped because the client
+    read too slowly; the client should catch up with the notification feed.
+    """
+    subscription = broker.subscribe(user_id)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if subscription.lagged:
+                subscription.lagged = False
+                yield format_event("lagged", {})
+            yield format_event("notification", message)
+    finally:
+        broker.unsubscribe(subscription)
@@ -1,35 +1,83 @@
 # tests/conftest.py
+from contextlib import contextmanager
+import asyncio
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
 from src.backend.models import Base
-from src.backend.database import get_db
+from src.backend.auth.cache import principal_cache
+from src.backend.database import get_db, use_case_sensitive_like
+from src.backend.user.search import user_search_index
 from src.backend.main import app
+from src.backend.task.acl import task_acl_cache
+from src.backend.task.outbox import NotificationDispatcher
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
+# Sync engine is only used to create and drop the schema
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+use_case_sensitive_like(engine)
+# TestClient runs each request on its own event loop, so connections must not be pooled
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+use_case_sensitive_like(async_engine)
+TestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @pytest.fixture(scope="function", autouse=True)
 def setup_database():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    principal_cache.clear()
+    task_acl_cache.clear()
+    user_search_index.clear()
     app.dependency_overrides[get_db] = override_get_db
     yield
     Base.metadata.drop_all(bind=engine)
 
 client = TestClient(app)
 
+# The app dispatches the notification outbox in the background; tests drain it explicitly
+dispatcher = NotificationDispatcher(TestingSessionLocal, batch_size=100, interval=1)
+
+def dispatch_notifications() -> int:
+    """Create the notifications of all task events written so far."""
+    return asyncio.run(dispatcher.dispatch_pending())
+
+@contextmanager
+def capture_statements():
+    """Collect the SQL statements executed inside the block."""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture
+def query_budget():
+    """Fail when the requests inside the block execute more than `max_statements` statements.
+
+        with query_budget(2):
+            client.get("/tasks", headers=headers)
+    """
+    @contextmanager
+    def budget(max_statements: int):
+        with capture_statements() as statements:
+            yield statements
+        assert len(statements) <= max_statements, (
+            f"{len(statements)} statements executed, budget is {max_statements}:\n" + "\n".join(statements)
+        )
+    return budget
+
 @pytest.fixture
 def user1():
     # Create a test user
@@ -1,5 +1,14 @@
 from fastapi.testclient import TestClient
+from datetime import datetime, timezone
+from passlib.context import CryptContext
+from sqlalchemy.orm import Session
+
+from src.backend.auth.cache import principal_cache
+from src.backend.auth.hashing import password_hasher
+from src.backend.auth.utils import BCRYPT_ROUNDS
 from src.backend.main import app
+from src.backend.models import User
+from .conftest import engine, capture_statements
 
 client = TestClient(app)
 
@@ -24,3 +33,73 @@ def test_signup_and_login():
     assert "access_token" in json_data
     assert "token_type" in json_data
     assert json_data["token_type"] == "bearer"
+
+def test_current_user_is_cached(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+
+    # First request loads the user from the database
+    with capture_statements() as cold_statements:
+        response = client.get("/users", headers=headers)
+    assert response.status_code == 200
+
+    # Repeat requests inside the TTL authenticate without touching the users table
+    hits = principal_cache.hits
+    with capture_statements() as warm_statements:
+        response = client.get("/users", headers=headers)
+    assert response.status_code == 200
+    assert principal_cache.hits == hits + 1
+    assert len(warm_statements) == len(cold_statements) - 1
+
+    # The cached principal can be used as a relationship target
+    response = client.post("/tasks", json={"title": "Cached", "description": "owner from cache"}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()["owner"] == {"id": user1[0], "username": "taskuser1"}
+
+def test_cached_user_invalidated_on_soft_delete(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    response = client.get("/users", headers=headers)
+    assert response.status_code == 200
+
+    with Session(engine) as db:
+        user = db.get(User, user1[0])
+        user.deleted_at = datetime.now(timezone.utc)
+        db.commit()
+
+    response = client.get("/users", headers=headers)
+    assert response.status_code == 401
+
+def test_login_rehashes_outdated_hash():
+    # Store a hash made with a lower bcrypt cost than the configured one
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    with Session(engine) as db:
+        db.add(User(username="legacyuser", hashed_password=old_context.hash("securepassword123")))
+        db.commit()
+
+    response = client.post("/login", data={"username": "legacyuser", "password": "securepassword123"})
+    assert response.status_code == 200
+
+    with Session(engine) as db:
+        user = db.query(User).filter(User.username == "legacyuser").one()
+        assert user.hashed_password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+
+    # The new hash still verifies
+    response = client.post("/login", data={"username": "legacyuser", "password": "securepassword123"})
+    assert response.status_code == 200
+
+def test_login_rejected_when_hashing_pool_saturated(user1, monkeypatch):
+    monkeypatch.setattr(password_hasher, "in_flight", password_hasher.max_workers + password_hasher.max_queue)
+
+    response = client.post("/login", data={"username": "taskuser1", "password": "securepassword123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_auth_query_budgets(query_budget):
+    # Duplicate check and insert
+    with query_budget(2):
+        response = client.post("/signup", json={"username": "budgetuser", "password": "securepassword123"})
+    assert response.status_code == 200
+
+    # User lookup only; the hash is current so there is no rehash update
+    with query_budget(1):
+        response = client.post("/login", data={"username": "budgetuser", "password": "securepassword123"})
+    assert response.status_code == 200
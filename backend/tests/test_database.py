@@ -0,0 +1,110 @@
+import os
+import shutil
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.backend import main, replica
+from src.backend.auth import dependencies
+from src.backend.database import READ_REPLICA, engine_options, get_replica_db, to_async_url
+from src.backend.slow_queries import parameter_shape, slow_query_log
+
+client = TestClient(main.app)
+
+def test_to_async_url():
+    # Sync drivers from DATABASE_URL are swapped for their async counterparts
+    assert to_async_url("mysql+pymysql://user:pass@db:3306/taskdb") == "mysql+aiomysql://user:pass@db:3306/taskdb"
+    assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+    # Drivers that are already async are left untouched
+    assert to_async_url("mysql+asyncmy://user:pass@db/taskdb") == "mysql+asyncmy://user:pass@db/taskdb"
+
+def test_engine_options(monkeypatch):
+    options = engine_options("mysql+aiomysql://user:pass@db/taskdb")
+    assert options["pool_size"] == 5 and options["pool_pre_ping"] is True
+
+    # In-memory SQLite has no sized pool
+    assert "pool_size" not in engine_options("sqlite+aiosqlite://")
+
+def test_query_stats_headers(user1, monkeypatch):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+
+    # Off by default
+    response = client.get("/users", headers=headers)
+    assert "X-DB-Query-Count" not in response.headers
+
+    monkeypatch.setattr(main, "QUERY_STATS_HEADERS", True)
+    response = client.get("/users", headers=headers)
+    assert response.headers["X-DB-Query-Count"] == "1"
+    assert float(response.headers["X-DB-Query-Time-Ms"]) >= 0
+
+def test_parameter_shape():
+    assert parameter_shape((1, 2, 3, "a", None)) == ["int x 3", "str", "None"]
+    assert parameter_shape({"id": 1, "name": "x"}) == {"id": "int", "name": "str"}
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == {"rows": 2, "row": ["int", "str"]}
+
+def test_slow_query_log(user1, user2, monkeypatch):
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    monkeypatch.setattr(dependencies, "ADMIN_USERNAMES", frozenset({"taskuser1"}))
+    assert client.get("/admin/slow_queries", headers=headers2).status_code == 403
+
+    # Record every statement
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    slow_query_log.enable()
+    try:
+        client.get("/tasks", headers=headers2)
+    finally:
+        slow_query_log.disable()
+
+    response = client.get("/admin/slow_queries", headers=headers1)
+    assert response.status_code == 200
+    recent = response.json()["recent"]
+    slow_query_log.clear()
+    query = next(entry for entry in recent if entry["route"] == "GET /tasks")
+    assert query["user_id"] == user2[0]
+    assert all(shape != 1 for shape in query["parameters"]), "parameter values are not recorded"
+    assert any(frame.startswith("task/routes.py") for frame in query["stack"])
+
+def test_read_replica(user1, monkeypatch):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+
+    # A copy of the primary taken before the write stands in for a lagging replica
+    shutil.copyfile("test.db", "test_replica.db")
+    replica_url = "sqlite:///./test_replica.db"
+    replica_engine = create_async_engine(to_async_url(replica_url), poolclass=NullPool)
+    ReplicaSession = async_sessionmaker(bind=replica_engine, expire_on_commit=False, info={READ_REPLICA: True})
+
+    async def override_get_replica_db():
+        async with ReplicaSession() as db:
+            yield db
+
+    monkeypatch.setitem(main.app.dependency_overrides, get_replica_db, override_get_replica_db)
+    monkeypatch.setattr(replica, "READ_REPLICA_ENABLED", True)
+    try:
+        # The writer reads its own task from the primary
+        task_data = {"title": "Replicated", "description": "Written to the primary"}
+        response = client.post("/tasks", json=task_data, headers=headers)
+        assert replica.STICKY_COOKIE in response.cookies
+        task_id = response.json()["id"]
+        assert client.get(f"/tasks/{task_id}", headers=headers).status_code == 200
+
+        # A write handled by another worker still reaches the primary through the cookie
+        replica.recent_writers.clear()
+        assert client.get(f"/tasks/{task_id}", headers=headers).status_code == 200
+
+        # After the window, reads go to the replica, which has not caught up
+        client.cookies.clear()
+        assert client.get(f"/tasks/{task_id}", headers=headers).status_code == 404
+        assert client.get("/tasks", headers=headers).json()["owned_tasks"] == []
+        client.post("/signup", json={"username": "taskuser3", "password": "securepassword123"})
+        client.cookies.set(replica.STICKY_COOKIE, f"{time.time() - 1:.3f}")
+        assert [user["username"] for user in client.get("/users/", headers=headers).json()] == ["taskuser1"]
+        client.cookies.set(replica.STICKY_COOKIE, f"{time.time() + 60:.3f}")
+        assert len(client.get("/users/", headers=headers).json()) == 2
+    finally:
+        client.cookies.clear()
+        replica.recent_writers.clear()
+        os.remove("test_replica.db")
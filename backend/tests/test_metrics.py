@@ -0,0 +1,61 @@
+import json
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from src.backend import main, metrics
+from src.backend.metrics import registry
+
+client = TestClient(main.app)
+
+def sample(text: str, line_prefix: str, default=None) -> float:
+    """Value of the first exported sample starting with `line_prefix`."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    assert default is not None, f"No sample {line_prefix} in:\n{text}"
+    return default
+
+def test_metrics(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    before = client.get("/metrics").text
+    client.get("/tasks/12345", headers=headers)
+    client.get("/tasks/12345", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    # Labelled by route template and status code, with the statements they ran
+    route = 'method="GET",route="/tasks/{task_id}"'
+    count = f"http_request_duration_seconds_count{{{route}}}"
+    assert sample(text, count) == sample(before, count, default=0) + 2
+    assert sample(text, f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == sample(text, count)
+    assert sample(text, f'http_requests_total{{{route},status="404"}}') >= 2
+    assert sample(text, f"db_queries_total{{{route}}}") >= 2
+
+    # Values read when exported
+    assert "# TYPE password_hash_queue_depth gauge" in text
+    assert 'task_acl_cache_lookups_total{result="miss"}' in text
+
+def test_metrics_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    requests = registry.metrics["http_requests_total"]
+    queue_depth = registry.metrics["password_hash_queue_depth"]
+    labels = ("GET", "/workers", "200")
+    monkeypatch.setitem(requests.values, labels, 2)
+
+    # A worker that exited: its counters stay in the totals, its gauges do not
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    exited = {
+        "http_requests_total": {**requests.describe(), "samples": [[list(labels), 3]]},
+        "password_hash_queue_depth": {**queue_depth.describe(), "samples": [[[], 7]]},
+    }
+    (tmp_path / f"metrics-{process.pid}.json").write_text(json.dumps(exited))
+
+    text = client.get("/metrics").text
+    assert sample(text, 'http_requests_total{method="GET",route="/workers",status="200"}') == 5
+    assert sample(text, "password_hash_queue_depth") == 0
@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.backend.auth.utils import create_access_token
+from src.backend.consts import TaskEventType, TaskStatus
+from src.backend.main import app
+from src.backend.task.changes import encode_changes_cursor
+from src.backend.models import Base, User, Task, TaskAssignee, TaskChange, TaskEvent, Notification, NotificationOutbox
+from .conftest import engine, async_engine, dispatch_notifications
+
+client = TestClient(app)
+
+# Every statement a route runs is replayed with EXPLAIN QUERY PLAN; a
+# `SCAN <table>` step means SQLite reads the whole table (or a whole index)
+# instead of an index range.
+
+N_USERS = 20
+N_TASKS = 200
+
+@pytest.fixture
+def seeded():
+    """Users 1..N_USERS, each owning tasks assigned to the next two users, with events, notifications and changes."""
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        db.add_all([
+            User(id=i, username=f"planuser{i}", hashed_password="x", last_read_notification_id=i * 10)
+            for i in range(1, N_USERS + 1)
+        ])
+        for task_id in range(1, N_TASKS + 1):
+            owner_id = task_id % N_USERS + 1
+            task = Task(
+                id=task_id,
+                title=f"Task {task_id}",
+                description="seeded",
+                due_date=now + timedelta(days=task_id % 30) if task_id % 3 else None,
+                status=list(TaskStatus)[task_id % 3],
+                owner_id=owner_id,
+                updated_at=now - timedelta(minutes=task_id),
+            )
+            db.add(task)
+            for offset in (1, 2):
+                assignee_id = (owner_id + offset - 1) % N_USERS + 1
+                db.add(TaskAssignee(
+                    task_id=task_id, user_id=assignee_id, task_updated_at=task.updated_at, task_due_date=task.due_date
+                ))
+                db.add(TaskChange(user_id=assignee_id, task_id=task_id, created_at=now - timedelta(minutes=1)))
+                event = TaskEvent(
+                    task_id=task_id,
+                    actor_id=owner_id,
+                    event_type=TaskEventType.TASK_ASSIGNED,
+                    payload={"assignee_id": assignee_id},
+                    message="assigned",
+                )
+                db.add(event)
+                db.flush()
+                db.add(Notification(user_id=assignee_id, task_event_id=event.id, message="assigned"))
+        db.commit()
+
+def headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(f'planuser{user_id}')}"}
+
+@contextmanager
+def capture_queries():
+    queries = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            queries.append((statement, parameters))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+def full_table_scans(statement: str, parameters) -> list:
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        # Scans of derived tables (SCAN anon_1) are fine; aliases look like users_1
+        if words[0] == "SCAN" and re.sub(r"_\d+$", "", words[1]) in Base.metadata.tables:
+            scans.append(detail)
+    return scans
+
+def subquery_sorts(statement: str, parameters) -> list:
+    """Sorts inside subqueries; the outermost ORDER BY of a statement is not included."""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in plan if row[-1] == "USE TEMP B-TREE FOR ORDER BY" and row[1] != 0]
+
+def assert_no_full_table_scans(send, allowed=()):
+    with capture_queries() as queries:
+        response = send()
+    assert response.status_code < 400, response.text
+    assert queries
+    for statement, parameters in queries:
+        if statement.lstrip().upper().startswith("INSERT"):
+            continue
+        scans = [scan for scan in full_table_scans(statement, parameters) if scan not in allowed]
+        assert scans == [], statement
+
+# Owner of task 1 is user 2, its assignees are users 3 and 4
+TASK_ROUTES = {
+    "list tasks": lambda: client.get("/tasks", headers=headers(3)),
+    "list tasks filtered": lambda: client.get("/tasks", params={
+        "status": "PENDING", "due_from": datetime.now(timezone.utc).isoformat(), "sort": "due_date",
+    }, headers=headers(3)),
+    "list assigned tasks": lambda: client.get("/tasks", params={"role": "assigned", "limit": 5}, headers=headers(3)),
+    "list tasks next page": lambda: client.get("/tasks", params={
+        "limit": 2, "cursor": client.get("/tasks", params={"limit": 2}, headers=headers(3)).json()["next_cursor"],
+    }, headers=headers(3)),
+    "task changes": lambda: client.get("/tasks/changes", params={
+        "since": encode_changes_cursor((0, datetime.now(timezone.utc))),
+    }, headers=headers(3)),
+    "task changes start": lambda: client.get("/tasks/changes", headers=headers(3)),
+    "export task events": lambda: client.get("/tasks/events/export", params={"after_id": 10}, headers=headers(3)),
+    "export events of task": lambda: client.get("/tasks/1/events/export", params={
+        "created_from": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
+    }, headers=headers(3)),
+    "get task as owner": lambda: client.get("/tasks/1", headers=headers(2)),
+    "get task as assignee": lambda: client.get("/tasks/1", headers=headers(3)),
+    "get unchanged task": lambda: client.get("/tasks/1", headers={**headers(3), "If-None-Match": '"1.1"'}),
+    "list unchanged tasks": lambda: client.get("/tasks", headers={
+        **headers(3), "If-None-Match": client.get("/tasks", headers=headers(3)).headers["ETag"],
+    }),
+    "create task": lambda: client.post("/tasks", json={"title": "New", "description": "new"}, headers=headers(2)),
+    "import tasks": lambda: client.post("/tasks:import", content=(
+        "title,description,assignees\nImported,csv,planuser3;planuser4\n"
+    ).encode(), headers={**headers(2), "Content-Type": "text/csv"}),
+    "update task": lambda: client.put("/tasks/1", json={"title": "Updated", "status": "COMPLETED"}, headers=headers(2)),
+    "update task status": lambda: client.patch("/tasks/1/status", json={"status": "IN_PROGRESS"}, headers=headers(3)),
+    "update task statuses": lambda: client.patch("/tasks/status:batch", json={"items": [
+        {"task_id": task_id, "status": "IN_PROGRESS"} for task_id in (1, 2, 21)
+    ]}, headers=headers(3)),
+    "assign users": lambda: client.post("/tasks/1/assignees", json={"user_ids": [5, 6]}, headers=headers(2)),
+    "remove assignee": lambda: client.delete("/tasks/1/assignees/3", headers=headers(2)),
+    "delete task": lambda: client.delete("/tasks/1", headers=headers(2)),
+}
+
+@pytest.mark.parametrize("send", TASK_ROUTES.values(), ids=TASK_ROUTES.keys())
+def test_task_route_plans(seeded, send):
+    assert_no_full_table_scans(send)
+
+def tasks_page(role: str, user_id: int, sort: str, page: int, limit: int = 4):
+    """Page number `page` of the tasks user `user_id` has in `role`."""
+    params = {"role": role, "sort": sort, "limit": limit}
+    for _ in range(page - 1):
+        params["cursor"] = client.get("/tasks", params=params, headers=headers(user_id)).json()["next_cursor"]
+    return client.get("/tasks", params=params, headers=headers(user_id))
+
+# User 2 owns 10 tasks, the last 3 by due date without one; user 3 is
+# assigned to 20 tasks, the last 6 by due date without one
+TASK_PAGES = {
+    "owned by update": lambda: tasks_page("owned", 2, "updated_at", 1),
+    "owned by update next page": lambda: tasks_page("owned", 2, "updated_at", 2),
+    "owned by due date": lambda: tasks_page("owned", 2, "due_date", 1),
+    "owned by due date next page": lambda: tasks_page("owned", 2, "due_date", 2),
+    "owned by due date without due dates": lambda: tasks_page("owned", 2, "due_date", 3),
+    "list assigned tasks": TASK_ROUTES["list assigned tasks"],
+    "assigned by update next page": lambda: tasks_page("assigned", 3, "updated_at", 2),
+    "assigned by due date": lambda: tasks_page("assigned", 3, "due_date", 1),
+    "assigned by due date next page": lambda: tasks_page("assigned", 3, "due_date", 2),
+    "assigned by due date without due dates": lambda: tasks_page("assigned", 3, "due_date", 5),
+}
+
+@pytest.mark.parametrize("send", TASK_PAGES.values(), ids=TASK_PAGES.keys())
+def test_task_pages_are_read_in_index_order(seeded, send):
+    # Keyset pages of owned and assigned tasks are read along an index,
+    # however deep; only the final ORDER BY of the assembled page, at most a
+    # few pages of rows, sorts
+    with capture_queries() as queries:
+        response = send()
+    assert response.status_code == 200
+    for statement, parameters in queries:
+        assert subquery_sorts(statement, parameters) == [], statement
+
+USER_ROUTES = {
+    "list users": lambda: client.get("/users", params={"keyword": "planuser1"}, headers=headers(1)),
+    "list users by prefix": lambda: client.get("/users", params={"keyword": "planuser1", "match": "prefix"}, headers=headers(1)),
+    "list users next page": lambda: client.get("/users", params={"limit": 5, "cursor": "planuser5"}, headers=headers(1)),
+    "notifications": lambda: client.get("/users/notifications", headers=headers(3)),
+    "notification feed": lambda: client.get("/users/notifications/feed", params={"limit": 5, "before_id": 300}, headers=headers(3)),
+    "acknowledge notifications": lambda: client.post("/users/notifications/ack", json={"up_to_id": 350}, headers=headers(3)),
+    "unread notification count": lambda: client.get("/users/notifications/unread_count", headers=headers(3)),
+}
+
+@pytest.mark.parametrize("send", USER_ROUTES.values(), ids=USER_ROUTES.keys())
+def test_user_route_plans(seeded, send):
+    assert_no_full_table_scans(send)
+
+def test_outbox_dispatch_plan(seeded):
+    with Session(engine) as db:
+        db.add_all([NotificationOutbox(task_event_id=task_event_id) for task_event_id in range(1, 51)])
+        db.commit()
+
+    class Dispatched:
+        status_code = 200
+        text = ""
+
+    def dispatch():
+        assert dispatch_notifications() == 50
+        return Dispatched
+
+    # Reading the head of the outbox in id order is the point of the queue;
+    # dispatched rows are deleted, so the table stays small
+    assert_no_full_table_scans(dispatch, allowed=("SCAN notification_outbox",))
@@ -1,7 +1,21 @@
 from fastapi.testclient import TestClient
+import asyncio
+import json
 import pytest
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.backend.auth import dependencies
 from src.backend.main import app
+from src.backend.models import User, Task, TaskAssignee, TaskChange, TaskEvent, Notification, NotificationOutbox
+from src.backend.task.acl import task_acl_cache
+from src.backend.task.changes import encode_changes_cursor
+from src.backend.task.outbox import insert_new_notifications
+from src.backend.task.permission import load_task_access
+from src.backend.task.schemas import TasksGetOut
+from .conftest import TestingSessionLocal, engine, async_engine, capture_statements, dispatch_notifications
 
 client = TestClient(app)
 
@@ -224,4 +238,812 @@ def test_assignee_can_update_task_status(user1, user2, create_task):
     assert response.status_code == 200
     data = response.json()
     assert data["id"] == task_id
-    assert data["status"] == "IN_PROGRESS"
\ No newline at end of file
+    assert data["status"] == "IN_PROGRESS"
+
+def test_task_list_matches_response_model(user1, user2, create_task):
+    task_id = create_task
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1)
+    client.post("/tasks", json={"title": "No due date", "description": "plain"}, headers=headers1)
+
+    # The list is built from columns without models; it serializes like the models do
+    for headers in (headers1, {"Authorization": f"Bearer {user2[1]}"}):
+        data = client.get("/tasks", headers=headers).json()
+        assert TasksGetOut.model_validate(data).model_dump(mode="json") == data
+    detail = client.get(f"/tasks/{task_id}", headers=headers1).json()
+    listed = {task["id"]: task for task in client.get("/tasks", headers=headers1).json()["owned_tasks"]}
+    assert listed[task_id] == {key: value for key, value in detail.items() if key != "assignees"}
+
+def test_get_tasks_paginated(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+
+    # user1 owns three tasks; user2 owns two and assigns user1 to one of them
+    created_ids = []
+    for i in range(3):
+        response = client.post("/tasks", json={"title": f"Owned {i}", "description": "owned"}, headers=headers_user1)
+        created_ids.append(response.json()["id"])
+    for i in range(2):
+        response = client.post("/tasks", json={"title": f"Other {i}", "description": "other"}, headers=headers_user2)
+        created_ids.append(response.json()["id"])
+    client.post(f"/tasks/{created_ids[-1]}/assignees", json={"user_ids": [user1[0]]}, headers=headers_user2)
+
+    # Walk all pages two tasks at a time
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks", params=params, headers=headers_user1)
+        assert response.status_code == 200
+        data = response.json()
+        pages.append({task["id"] for task in data["owned_tasks"] + data["assigned_tasks"]})
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    # Most recently updated first, every visible task exactly once
+    assert pages == [{created_ids[4], created_ids[2]}, {created_ids[1], created_ids[0]}]
+
+def test_get_tasks_filters(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+    now = datetime.now(timezone.utc)
+
+    soon = client.post("/tasks", json={
+        "title": "Soon", "description": "due soon", "due_date": (now + timedelta(days=1)).isoformat()
+    }, headers=headers_user1).json()["id"]
+    later = client.post("/tasks", json={
+        "title": "Later", "description": "due later", "due_date": (now + timedelta(days=10)).isoformat()
+    }, headers=headers_user1).json()["id"]
+    undated = client.post("/tasks", json={"title": "Undated", "description": "no due date"}, headers=headers_user1).json()["id"]
+    client.patch(f"/tasks/{later}/status", json={"status": "COMPLETED"}, headers=headers_user1)
+
+    assigned = client.post("/tasks", json={"title": "Assigned", "description": "assigned"}, headers=headers_user2).json()["id"]
+    client.post(f"/tasks/{assigned}/assignees", json={"user_ids": [user1[0]]}, headers=headers_user2)
+
+    def task_ids(params):
+        response = client.get("/tasks", params=params, headers=headers_user1)
+        assert response.status_code == 200
+        data = response.json()
+        return [task["id"] for task in data["owned_tasks"]], [task["id"] for task in data["assigned_tasks"]]
+
+    assert task_ids({"status": "COMPLETED"}) == ([later], [])
+    assert task_ids({"due_to": (now + timedelta(days=2)).isoformat()}) == ([soon], [])
+    assert task_ids({"due_from": (now + timedelta(days=2)).isoformat()}) == ([later], [])
+    assert task_ids({"role": "assigned"}) == ([], [assigned])
+    assert task_ids({"role": "owned", "sort": "due_date"}) == ([soon, later, undated], [])
+
+    # Tasks without a due date come last and are reachable through the cursor
+    response = client.get("/tasks", params={"role": "owned", "sort": "due_date", "limit": 2}, headers=headers_user1)
+    cursor = response.json()["next_cursor"]
+    assert task_ids({"role": "owned", "sort": "due_date", "cursor": cursor}) == ([undated], [])
+
+def test_assigned_tasks_follow_task_writes(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+    now = datetime.now(timezone.utc)
+    task_ids = []
+    for i in range(3):
+        task_id = client.post("/tasks", json={
+            "title": f"Assigned {i}", "description": "assigned", "due_date": (now + timedelta(days=i + 1)).isoformat()
+        }, headers=headers_user2).json()["id"]
+        client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user1[0]]}, headers=headers_user2)
+        task_ids.append(task_id)
+
+    def assigned(sort):
+        response = client.get("/tasks", params={"role": "assigned", "sort": sort}, headers=headers_user1)
+        return [task["id"] for task in response.json()["assigned_tasks"]]
+
+    assert assigned("updated_at") == task_ids[::-1]
+    assert assigned("due_date") == task_ids
+
+    # Assigned pages are read by the sort keys copied onto the assignments
+    client.put(f"/tasks/{task_ids[0]}", json={"due_date": (now + timedelta(days=5)).isoformat()}, headers=headers_user2)
+    assert assigned("updated_at") == [task_ids[0], task_ids[2], task_ids[1]]
+    assert assigned("due_date") == [task_ids[1], task_ids[2], task_ids[0]]
+    client.patch(f"/tasks/{task_ids[1]}/status", json={"status": "COMPLETED"}, headers=headers_user1)
+    assert assigned("updated_at") == [task_ids[1], task_ids[0], task_ids[2]]
+
+def test_get_tasks_role_selects_one_list(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    task_id = client.post("/tasks", json={"title": "Own", "description": "own"}, headers=headers).json()["id"]
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user1[0]]}, headers=headers)
+
+    def lists(params):
+        data = client.get("/tasks", params=params, headers=headers).json()
+        return [task["id"] for task in data["owned_tasks"]], [task["id"] for task in data["assigned_tasks"]]
+
+    assert lists({}) == ([task_id], [task_id])
+    assert lists({"role": "owned"}) == ([task_id], [])
+    assert lists({"role": "assigned"}) == ([], [task_id])
+
+def test_get_tasks_invalid_cursor(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    response = client.get("/tasks", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+    # Cursors are bound to the sort order they were issued for
+    for i in range(2):
+        client.post("/tasks", json={"title": f"Task {i}", "description": "task"}, headers=headers)
+    cursor = client.get("/tasks", params={"limit": 1}, headers=headers).json()["next_cursor"]
+    response = client.get("/tasks", params={"cursor": cursor, "sort": "due_date"}, headers=headers)
+    assert response.status_code == 400
+
+def test_get_tasks_query_count_is_constant(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+
+    def create_tasks(n):
+        for i in range(n):
+            client.post("/tasks", json={"title": f"Owned {i}", "description": "owned"}, headers=headers_user1)
+            task_id = client.post("/tasks", json={"title": f"Assigned {i}", "description": "assigned"}, headers=headers_user2).json()["id"]
+            client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user1[0]]}, headers=headers_user2)
+
+    def get_tasks():
+        response = client.get("/tasks", headers=headers_user1)
+        assert response.status_code == 200
+        return response.json()
+
+    create_tasks(1)
+    get_tasks()  # warm the principal cache
+    with capture_statements() as few_statements:
+        data = get_tasks()
+    assert len(data["owned_tasks"]) == 1 and len(data["assigned_tasks"]) == 1
+
+    create_tasks(10)
+    with capture_statements() as many_statements:
+        data = get_tasks()
+    assert len(data["owned_tasks"]) == 11 and len(data["assigned_tasks"]) == 11
+    assert data["assigned_tasks"][0]["owner"]["username"] == "taskuser2"
+
+    # The ETag version, then both lists and their owners from a single statement
+    assert len(many_statements) == len(few_statements) == 2
+
+def test_task_query_budgets(user1, user2, query_budget):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.get("/users", headers=headers)  # warm the principal cache
+
+    # Insert and change log
+    with query_budget(2):
+        response = client.post("/tasks", json={"title": "Budget", "description": "budget"}, headers=headers)
+    assert response.status_code == 201
+    task_id = response.json()["id"]
+
+    # Latest change of the user, then the page
+    with query_budget(2):
+        response = client.get("/tasks", headers=headers)
+    assert response.status_code == 200
+
+    # Task with owner and assignees in one statement
+    with query_budget(1):
+        response = client.get(f"/tasks/{task_id}", headers=headers)
+    assert response.status_code == 200
+
+    # Task with assignees, users, insert, change log, sort keys of the assignments, event insert, outbox insert,
+    # task version
+    with query_budget(8):
+        response = client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+    assert response.status_code == 200
+
+    # An assignee's role comes with the task as well
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    client.get("/users", headers=headers2)  # warm the principal cache
+    with query_budget(1):
+        response = client.get(f"/tasks/{task_id}", headers=headers2)
+    assert response.status_code == 200
+    with query_budget(6):
+        response = client.patch(f"/tasks/{task_id}/status", json={"status": "PENDING"}, headers=headers2)
+    assert response.status_code == 200
+
+    # Task, change log, sort keys of the assignments, event insert, outbox insert, update;
+    # notifications are created later
+    with query_budget(6):
+        response = client.put(f"/tasks/{task_id}", json={"title": "Budget 2", "status": "IN_PROGRESS"}, headers=headers)
+    assert response.status_code == 200
+
+    with query_budget(6):
+        response = client.patch(f"/tasks/{task_id}/status", json={"status": "COMPLETED"}, headers=headers)
+    assert response.status_code == 200
+
+    # Task, assignment, change log, sort keys of the assignments, assignment update, task version
+    with query_budget(6):
+        response = client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers)
+    assert response.status_code == 204
+
+    with query_budget(4):
+        response = client.delete(f"/tasks/{task_id}", headers=headers)
+    assert response.status_code == 204
+
+def test_task_acl_cache(user1, user2, create_task, monkeypatch):
+    task_id = create_task
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1)
+
+    def change_status(task_status):
+        return client.patch(f"/tasks/{task_id}/status", json={"status": task_status}, headers=headers2)
+
+    # Loading the task caches its participants; the next check reads the task by primary key only
+    assert client.get(f"/tasks/{task_id}", headers=headers2).status_code == 200
+    hits = task_acl_cache.hits
+    with capture_statements() as statements:
+        assert change_status("IN_PROGRESS").status_code == 200
+    assert task_acl_cache.hits == hits + 1
+    assert "task_assignees" not in statements[0]
+
+    # Polling with an ETag fills the cache too
+    task_acl_cache.clear()
+    etag = client.get(f"/tasks/{task_id}", headers=headers2).headers["ETag"]
+    task_acl_cache.clear()
+    for _ in range(3):
+        response = client.get(f"/tasks/{task_id}", headers={**headers2, "If-None-Match": etag})
+        assert response.status_code == 304
+    assert task_acl_cache.stats()["hits"] >= 2
+
+    # Assigning, removing and deleting take effect at once
+    client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers1)
+    assert change_status("COMPLETED").status_code == 403
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1)
+    assert change_status("COMPLETED").status_code == 200
+    client.delete(f"/tasks/{task_id}", headers=headers1)
+    assert change_status("PENDING").status_code == 404
+
+    monkeypatch.setattr(dependencies, "ADMIN_USERNAMES", frozenset({"taskuser1"}))
+    assert client.get("/metrics/task_acl_cache", headers=headers2).status_code == 403
+    stats = client.get("/metrics/task_acl_cache", headers=headers1).json()
+    assert stats["enabled"] and 0 < stats["hit_rate"] <= 1
+
+    monkeypatch.setattr(task_acl_cache, "enabled", False)
+    hits = task_acl_cache.hits
+    other_id = client.post("/tasks", json={"title": "Other", "description": "other"}, headers=headers1).json()["id"]
+    for _ in range(2):
+        assert client.get(f"/tasks/{other_id}", headers=headers1).status_code == 200
+        assert client.get(f"/tasks/{other_id}", headers=headers2).status_code == 403
+    assert task_acl_cache.hits == hits
+
+def test_task_acl_cache_hit_answers_like_a_miss(user1, user2, create_task):
+    task_id = create_task
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+
+    def change_status():
+        return client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers2)
+
+    # A non-participant is refused whether or not the participants are cached
+    assert change_status().status_code == 403
+    assert task_acl_cache.get(task_id) is not None
+    assert change_status().status_code == 403
+
+    # Deleted by another worker, whose invalidation has not arrived: still a 404, as without the entry
+    with Session(engine) as db:
+        db.execute(update(Task).where(Task.id == task_id).values(deleted_at=datetime.now(timezone.utc)))
+        db.commit()
+    assert task_acl_cache.get(task_id) is not None
+    assert change_status().status_code == 404
+    task_acl_cache.clear()
+    assert change_status().status_code == 404
+
+def test_task_acl_read_in_a_transaction_older_than_an_invalidation_is_not_cached(user1, create_task):
+    task_id = create_task
+
+    async def load(invalidate_after_first_statement: bool):
+        async with TestingSessionLocal() as db:
+            # The transaction's snapshot is taken by its first statement
+            user = await db.get(User, user1[0])
+            if invalidate_after_first_statement:
+                task_acl_cache.discard([task_id])
+            await load_task_access(task_id, user, db)
+
+    asyncio.run(load(True))
+    assert task_acl_cache.get(task_id) is None
+    asyncio.run(load(False))
+    assert task_acl_cache.get(task_id) is not None
+
+def test_live_assignment_is_unique(user1, user2, create_task):
+    task_id = create_task
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+
+    # The database rejects a second live assignment of the same user
+    with Session(engine) as db:
+        db.add(TaskAssignee(task_id=task_id, user_id=user2[0], task_updated_at=datetime.now(timezone.utc)))
+        with pytest.raises(IntegrityError):
+            db.commit()
+
+    # Soft-deleted assignments do not count
+    response = client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers)
+    assert response.status_code == 204
+    response = client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+    assert response.status_code == 200
+    assert [assignee["id"] for assignee in response.json()["assignees"]] == [user2[0]]
+
+def test_status_change_is_one_transaction(user1, create_task):
+    task_id = create_task
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    with Session(engine) as db:
+        assignees = [User(username=f"fanout{i}", hashed_password="x") for i in range(10)]
+        db.add_all(assignees)
+        db.flush()
+        db.add_all([
+            TaskAssignee(task_id=task_id, user_id=user.id, task_updated_at=datetime.now(timezone.utc))
+            for user in assignees
+        ])
+        db.commit()
+        assignee_ids = {user.id for user in assignees}
+
+    commits = []
+    def on_commit(conn):
+        commits.append(conn)
+    event.listen(async_engine.sync_engine, "commit", on_commit)
+    try:
+        # Task, change log, sort keys of the assignments, event insert, outbox insert, update
+        with capture_statements() as statements:
+            response = client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers)
+        assert response.status_code == 200
+        assert len(statements) == 6
+        assert len(commits) == 1
+
+        # Outbox batch, participants, one notification insert for all of them, outbox delete
+        with capture_statements() as statements:
+            assert dispatch_notifications() == 1
+        assert len(statements) == 4
+        assert len(commits) == 2
+    finally:
+        event.remove(async_engine.sync_engine, "commit", on_commit)
+
+    with Session(engine) as db:
+        notifications = db.execute(select(Notification)).scalars().all()
+    assert {notification.user_id for notification in notifications} == assignee_ids
+    assert len({notification.message for notification in notifications}) == 1
+
+def test_assign_users_creates_one_event(user1, user2, create_task):
+    task_id = create_task
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+    with Session(engine) as db:
+        users = [User(username=f"batch{i}", hashed_password="x") for i in range(5)]
+        db.add_all(users)
+        db.commit()
+        user_ids = [user.id for user in users]
+
+    with capture_statements() as statements:
+        response = client.post(f"/tasks/{task_id}/assignees", json={"user_ids": user_ids + [user2[0]]}, headers=headers)
+    assert response.status_code == 200
+    assert sorted(assignee["id"] for assignee in response.json()["assignees"]) == sorted(user_ids + [user2[0]])
+    assert len(statements) == 8
+
+    dispatch_notifications()
+    with Session(engine) as db:
+        events = db.execute(select(TaskEvent).order_by(TaskEvent.id)).scalars().all()
+        assert sorted(events[-1].payload["assignee_ids"]) == user_ids
+        assert events[-1].message.endswith("and 2 others by taskuser1.")
+        notifications = db.execute(select(Notification).where(Notification.task_event_id == events[-1].id)).scalars().all()
+    # One notification per participant other than the actor
+    assert sorted(notification.user_id for notification in notifications) == sorted(user_ids + [user2[0]])
+
+def test_outbox_dispatch_is_idempotent(user1, user2, create_task, monkeypatch):
+    task_id = create_task
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+    client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers)
+
+    with Session(engine) as db:
+        assert db.execute(select(Notification)).scalars().all() == []
+        assert len(db.execute(select(NotificationOutbox)).scalars().all()) == 2
+
+    assert dispatch_notifications() == 2
+    with Session(engine) as db:
+        notifications = db.execute(select(Notification.user_id, Notification.task_event_id)).all()
+        assert db.execute(select(NotificationOutbox)).scalars().all() == []
+        # Replaying the events, as after a crash between commit and cleanup, creates no duplicates
+        db.add_all([NotificationOutbox(task_event_id=task_event_id) for _, task_event_id in notifications])
+        db.commit()
+    assert dispatch_notifications() == 2
+    with Session(engine) as db:
+        assert sorted(db.execute(select(Notification.user_id, Notification.task_event_id)).all()) == sorted(notifications)
+    assert [user_id for user_id, _ in notifications] == [user2[0], user2[0]]
+
+    monkeypatch.setattr(dependencies, "ADMIN_USERNAMES", frozenset({"taskuser1"}))
+    assert client.get("/metrics/outbox").status_code == 401
+    assert client.get("/metrics/outbox", headers={"Authorization": f"Bearer {user2[1]}"}).status_code == 403
+    response = client.get("/metrics/outbox", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["pending_events"] == 0
+
+def test_outbox_insert_only_skips_existing_notifications(user1, user2, create_task):
+    rows = [{"user_id": user2[0], "task_event_id": 1, "message": "assigned"}]
+    statement = insert_new_notifications("mysql", rows).compile(dialect=mysql.dialect())
+    assert "IGNORE" not in str(statement)
+    assert str(statement).endswith("ON DUPLICATE KEY UPDATE id = notifications.id")
+
+    client.post(f"/tasks/{create_task}/assignees", json={"user_ids": [user2[0]]}, headers={"Authorization": f"Bearer {user1[1]}"})
+    dispatch_notifications()
+    with Session(engine) as db:
+        task_event_id, message = db.execute(select(Notification.task_event_id, Notification.message)).one()
+
+    async def insert(rows):
+        async with TestingSessionLocal() as db:
+            await db.execute(insert_new_notifications("sqlite", rows))
+            await db.commit()
+
+    # A notification already created is skipped, other errors still fail
+    asyncio.run(insert([{"user_id": user2[0], "task_event_id": task_event_id, "message": "again"}]))
+    with pytest.raises(IntegrityError):
+        asyncio.run(insert([{"user_id": user1[0], "task_event_id": task_event_id, "message": None}]))
+    with Session(engine) as db:
+        assert db.execute(select(Notification.user_id, Notification.message)).all() == [(user2[0], message)]
+
+def test_create_tasks_batch(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.get("/users", headers=headers)  # warm the principal cache
+    items = [{"title": f"Batch {i}", "description": "batch"} for i in range(20)]
+
+    # One multi-row insert, whatever the batch size, and the change log
+    with capture_statements() as statements:
+        response = client.post("/tasks:batch", json={"items": items}, headers=headers)
+    assert response.status_code == 201
+    assert len(statements) == 2
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [201] * 20
+    assert [result["task"]["title"] for result in results] == [item["title"] for item in items]
+
+    # The returned ids belong to the created tasks
+    for result in results[:3] + results[-3:]:
+        response = client.get(f"/tasks/{result['task']['id']}", headers=headers)
+        assert response.json()["title"] == result["task"]["title"]
+
+    response = client.post("/tasks:batch", json={"items": []}, headers=headers)
+    assert response.status_code == 422
+
+def test_update_task_statuses_batch(user1, user2):
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    client.get("/users", headers=headers1)  # warm the principal cache
+    items = [{"title": f"Batch {i}", "description": "batch"} for i in range(4)]
+    owned_ids = [result["task"]["id"] for result in client.post("/tasks:batch", json={"items": items}, headers=headers1).json()["results"]]
+    other_id = client.post("/tasks", json={"title": "Other", "description": "other"}, headers=headers2).json()["id"]
+    assigned_id = client.post("/tasks", json={"title": "Assigned", "description": "assigned"}, headers=headers2).json()["id"]
+    client.post(f"/tasks/{assigned_id}/assignees", json={"user_ids": [user1[0]]}, headers=headers2)
+    client.delete(f"/tasks/{owned_ids[3]}", headers=headers1)
+
+    batch = [
+        {"task_id": owned_ids[0], "status": "IN_PROGRESS"},
+        {"task_id": owned_ids[1], "status": "COMPLETED"},
+        {"task_id": owned_ids[2], "status": "PENDING"},  # unchanged
+        {"task_id": assigned_id, "status": "COMPLETED"},
+        {"task_id": other_id, "status": "COMPLETED"},
+        {"task_id": owned_ids[3], "status": "COMPLETED"},  # deleted
+        {"task_id": owned_ids[0], "status": "COMPLETED"},
+    ]
+    # Tasks with permissions, one update per target status, change log, sort keys of the assignments, event insert, outbox insert
+    with capture_statements() as statements:
+        response = client.patch("/tasks/status:batch", json={"items": batch}, headers=headers1)
+    assert response.status_code == 200
+    assert len(statements) == 7
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 200, 200, 200, 403, 404, 409]
+    assert [result["task"]["status"] for result in results[:4]] == ["IN_PROGRESS", "COMPLETED", "PENDING", "COMPLETED"]
+
+    response = client.get(f"/tasks/{assigned_id}", headers=headers2)
+    assert response.json()["status"] == "COMPLETED"
+    response = client.get(f"/tasks/{other_id}", headers=headers2)
+    assert response.json()["status"] == "PENDING"
+
+    # One event per changed task (plus the assignment), with the same notifications as the single-task endpoint
+    assert dispatch_notifications() == 4
+    with Session(engine) as db:
+        events = db.execute(
+            select(TaskEvent).where(TaskEvent.event_type == "TASK_STATUS_UPDATED").order_by(TaskEvent.id)
+        ).scalars().all()
+        notifications = db.execute(select(Notification)).scalars().all()
+    assert [event.task_id for event in events] == [owned_ids[0], owned_ids[1], assigned_id]
+    assert events[2].payload == {"old_status": "PENDING", "new_status": "COMPLETED"}
+    assert events[2].message == "Task 'Assigned' status changed from PENDING to COMPLETED by taskuser1."
+    assert [(notification.user_id, notification.task_event_id) for notification in notifications
+            if notification.task_event_id == events[2].id] == [(user2[0], events[2].id)]
+
+def test_task_detail_etag(user1, user2, create_task):
+    task_id = create_task
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    response = client.get(f"/tasks/{task_id}", headers=headers)
+    etag = response.headers["ETag"]
+
+    # An unchanged task is answered with one lookup
+    with capture_statements() as statements:
+        response = client.get(f"/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    # Assigning and removing users changes the version, and so does any other change
+    etags = [etag]
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers)
+    etags.append(client.get(f"/tasks/{task_id}", headers=headers).headers["ETag"])
+    client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers)
+    etags.append(client.get(f"/tasks/{task_id}", headers=headers).headers["ETag"])
+    client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers)
+    etags.append(client.get(f"/tasks/{task_id}", headers=headers).headers["ETag"])
+    client.patch("/tasks/status:batch", json={"items": [{"task_id": task_id, "status": "COMPLETED"}]}, headers=headers)
+    etags.append(client.get(f"/tasks/{task_id}", headers=headers).headers["ETag"])
+    assert len(set(etags)) == 5
+
+    response = client.get(f"/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "COMPLETED"
+
+    # The ETag is no way around the permission check
+    response = client.get(f"/tasks/{task_id}", headers={"Authorization": f"Bearer {user2[1]}", "If-None-Match": etags[-1]})
+    assert response.status_code == 403
+    client.delete(f"/tasks/{task_id}", headers=headers)
+    response = client.get(f"/tasks/{task_id}", headers={**headers, "If-None-Match": etags[-1]})
+    assert response.status_code == 404
+
+def test_task_list_etag(user1, user2, create_task):
+    task_id = create_task
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    etag = client.get("/tasks", headers=headers2).headers["ETag"]
+
+    with capture_statements() as statements:
+        response = client.get("/tasks", headers={**headers2, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(statements) == 1
+
+    # Each set of query parameters has its own ETag
+    response = client.get("/tasks", params={"role": "assigned"}, headers={**headers2, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # Changes to tasks of other users leave the list alone
+    client.post("/tasks", json={"title": "Other", "description": "other"}, headers=headers1)
+    assert client.get("/tasks", headers={**headers2, "If-None-Match": etag}).status_code == 304
+
+    # Being assigned, changes to an assigned task and being removed all change the list
+    for change in [
+        lambda: client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1),
+        lambda: client.put(f"/tasks/{task_id}", json={"title": "Renamed"}, headers=headers1),
+        lambda: client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers1),
+    ]:
+        change()
+        response = client.get("/tasks", headers={**headers2, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        etag = response.headers["ETag"]
+    assert response.json()["assigned_tasks"] == []
+
+def test_task_changes(user1, user2, monkeypatch):
+    monkeypatch.setattr("src.backend.task.changes.TASK_CHANGES_SETTLE_SECONDS", 0)
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+
+    def changes(headers, cursor, **params):
+        response = client.get("/tasks/changes", params={"since": cursor, **params}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    # Sync starts from an empty cursor, before the full GET /tasks
+    cursor = client.get("/tasks/changes", headers=headers2).json()["next_cursor"]
+    data = changes(headers2, cursor)
+    assert data["tasks"] == [] and data["removed_task_ids"] == [] and data["next_cursor"] == cursor
+
+    task_id = client.post("/tasks", json={"title": "Synced", "description": "sync"}, headers=headers1).json()["id"]
+    other_id = client.post("/tasks", json={"title": "Private", "description": "sync"}, headers=headers1).json()["id"]
+    # Tasks of other users are not changes of user2
+    assert changes(headers2, cursor)["tasks"] == []
+
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1)
+    client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers2)
+    # A read of the new changes is one range of the change log plus the tasks
+    with capture_statements() as statements:
+        data = changes(headers2, cursor)
+    assert len(statements) == 2
+    assert [(task["id"], task["status"]) for task in data["tasks"]] == [(task_id, "IN_PROGRESS")]
+    cursor = data["next_cursor"]
+    assert changes(headers2, cursor)["tasks"] == []
+
+    # Removal from a task and deletion both show up as removed tasks
+    client.delete(f"/tasks/{task_id}/assignees/{user2[0]}", headers=headers1)
+    data = changes(headers2, cursor)
+    assert data["tasks"] == [] and data["removed_task_ids"] == [task_id]
+    client.delete(f"/tasks/{other_id}", headers=headers1)
+
+    # The owner pages through everything since the start
+    seen = []
+    data = changes(headers1, encode_changes_cursor((0, datetime.now(timezone.utc))), limit=2)
+    while True:
+        seen += [task["id"] for task in data["tasks"]] + data["removed_task_ids"]
+        if not data["has_more"]:
+            break
+        data = changes(headers1, data["next_cursor"], limit=2)
+    assert set(seen) == {task_id, other_id}
+    assert other_id in data["removed_task_ids"]
+
+    response = client.get("/tasks/changes", params={"since": "not-a-cursor"}, headers=headers1)
+    assert response.status_code == 400
+    expired = encode_changes_cursor((1, datetime.now(timezone.utc) - timedelta(days=365)))
+    response = client.get("/tasks/changes", params={"since": expired}, headers=headers1)
+    assert response.status_code == 410
+
+def test_task_changes_cursor_waits_for_settled_changes(user1, monkeypatch):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    cursor = client.get("/tasks/changes", headers=headers).json()["next_cursor"]
+    task_id = client.post("/tasks", json={"title": "Fresh", "description": "sync"}, headers=headers).json()["id"]
+
+    # A fresh change is held back until it has settled, as a transaction
+    # holding a lower id may still commit
+    data = client.get("/tasks/changes", params={"since": cursor}, headers=headers).json()
+    assert data["tasks"] == [] and data["next_cursor"] == cursor
+    monkeypatch.setattr("src.backend.task.changes.TASK_CHANGES_SETTLE_SECONDS", 0)
+    data = client.get("/tasks/changes", params={"since": cursor}, headers=headers).json()
+    assert [task["id"] for task in data["tasks"]] == [task_id]
+    assert data["next_cursor"] != cursor
+
+def test_task_changes_late_commit_behind_a_full_page(user1, monkeypatch):
+    monkeypatch.setattr("src.backend.task.changes.TASK_CHANGES_SETTLE_SECONDS", 60)
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    task_ids = [
+        client.post("/tasks", json={"title": f"Task {i}", "description": "sync"}, headers=headers).json()["id"]
+        for i in range(5)
+    ]
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        # Two settled changes, then two fresh ones
+        db.add_all([
+            TaskChange(id=100 + i, user_id=user1[0], task_id=task_ids[i], created_at=created_at)
+            for i, created_at in ((0, now - timedelta(minutes=5)), (1, now - timedelta(minutes=5)), (3, now), (4, now))
+        ])
+        db.commit()
+
+    def changes(cursor):
+        return client.get("/tasks/changes", params={"since": cursor, "limit": 1}, headers=headers).json()
+
+    data = changes(encode_changes_cursor((99, now - timedelta(minutes=10))))
+    assert [task["id"] for task in data["tasks"]] == [task_ids[0]] and data["has_more"]
+    data = changes(data["next_cursor"])
+    assert [task["id"] for task in data["tasks"]] == [task_ids[1]] and not data["has_more"]
+
+    # A lower id than the fresh changes commits late; the cursor did not pass it
+    with Session(engine) as db:
+        db.add(TaskChange(id=102, user_id=user1[0], task_id=task_ids[2], created_at=now))
+        db.commit()
+    monkeypatch.setattr("src.backend.task.changes.TASK_CHANGES_SETTLE_SECONDS", 0)
+    seen = []
+    cursor = data["next_cursor"]
+    while True:
+        data = changes(cursor)
+        seen += [task["id"] for task in data["tasks"]]
+        cursor = data["next_cursor"]
+        if not data["has_more"]:
+            break
+    assert seen == task_ids[2:]
+
+def test_export_task_events(user1, user2, create_task):
+    task_id = create_task
+    headers1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers2 = {"Authorization": f"Bearer {user2[1]}"}
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers1)
+    for task_status in ["IN_PROGRESS", "COMPLETED", "PENDING"]:
+        client.patch(f"/tasks/{task_id}/status", json={"status": task_status}, headers=headers2)
+    other_id = client.post("/tasks", json={"title": "Other", "description": "other"}, headers=headers2).json()["id"]
+    client.patch(f"/tasks/{other_id}/status", json={"status": "COMPLETED"}, headers=headers2)
+
+    def export(url, headers, **params):
+        response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    events = export(f"/tasks/{task_id}/events/export", headers1)
+    assert [event["event_type"] for event in events] == ["TASK_ASSIGNED"] + ["TASK_STATUS_UPDATED"] * 3
+    assert events[1]["payload"] == {"old_status": "PENDING", "new_status": "IN_PROGRESS"}
+    assert events[1]["actor_id"] == user2[0]
+
+    # Everything the user takes part in, in id order; user1 does not see the other task
+    all_events = export("/tasks/events/export", headers2)
+    assert [event["id"] for event in all_events] == sorted(event["id"] for event in all_events)
+    assert {event["task_id"] for event in all_events} == {task_id, other_id}
+    assert export("/tasks/events/export", headers1) == events
+
+    # Resume after the last event read, and filter by time
+    assert export("/tasks/events/export", headers2, after_id=all_events[2]["id"]) == all_events[3:]
+    created_to = datetime.fromisoformat(all_events[1]["created_at"]) + timedelta(microseconds=1)
+    assert export("/tasks/events/export", headers2, created_to=created_to.isoformat()) == all_events[:2]
+    assert export("/tasks/events/export", headers2, created_from=created_to.isoformat()) == all_events[2:]
+
+    # gzip on request
+    response = client.get("/tasks/events/export", headers={**headers2, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line) for line in response.text.splitlines()] == all_events
+
+    response = client.get(f"/tasks/{other_id}/events/export", headers=headers1)
+    assert response.status_code == 403
+
+def test_import_tasks_csv(user1, user2, monkeypatch):
+    # Rows are written in chunks of two, so the file spans several transactions
+    monkeypatch.setattr("src.backend.task.importer.TASK_IMPORT_CHUNK_SIZE", 2)
+    headers = {"Authorization": f"Bearer {user1[1]}", "Content-Type": "text/csv"}
+    body = (
+        "title,description,due_date,status,assignees\n"
+        "First,plain,,,\n"
+        '"Second","multi\nline",2030-01-01T00:00:00+00:00,IN_PROGRESS,taskuser2\n'
+        "Third,bad status,,DONE,\n"
+        "Fourth,unknown assignee,,,taskuser2;nobody\n"
+        "Fifth,too,many,fields,here,extra\n"
+        'Sixth,"quote ""inside""",,COMPLETED,taskuser2; taskuser2\n'
+    )
+    response = client.post("/tasks:import", content=body.encode(), headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 3
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [5, 6, 7]
+    assert report["errors"][1]["detail"] == "Users nobody not found"
+
+    tasks = client.get("/tasks", headers=headers).json()["owned_tasks"]
+    by_title = {task["title"]: task for task in tasks}
+    assert set(by_title) == {"First", "Second", "Sixth"}
+    assert by_title["Second"]["description"] == "multi\nline"
+    assert by_title["Second"]["status"] == "IN_PROGRESS"
+    assert by_title["Sixth"]["description"] == 'quote "inside"'
+
+    assigned = client.get("/tasks", headers={"Authorization": f"Bearer {user2[1]}"}).json()["assigned_tasks"]
+    assert {task["title"] for task in assigned} == {"Second", "Sixth"}
+    detail = client.get(f"/tasks/{by_title['Sixth']['id']}", headers=headers).json()
+    assert [user["id"] for user in detail["assignees"]] == [user2[0]]
+
+def test_import_tasks_ndjson(user1, user2):
+    headers = {"Authorization": f"Bearer {user1[1]}", "Content-Type": "application/x-ndjson"}
+    client.get("/users", headers=headers)  # warm the principal cache
+    lines = [json.dumps({"title": f"Imported {i}", "description": "ndjson", "assignees": ["taskuser2"]}) for i in range(50)]
+    lines += ["not json", "[1]", json.dumps({"title": "No description"}), ""]
+
+    # Statements per chunk do not grow with its rows: the assignee lookup,
+    # the task and assignee inserts and the change log
+    with capture_statements() as statements:
+        response = client.post("/tasks:import", content="\n".join(lines).encode(), headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 4
+    report = response.json()
+    assert report["imported"] == 50
+    assert [(error["line"], error["detail"]) for error in report["errors"]] == [
+        (51, "Invalid JSON"),
+        (52, "Expected a JSON object"),
+        (53, "description: Field required"),
+    ]
+    assigned = client.get("/tasks", params={"limit": 100}, headers={"Authorization": f"Bearer {user2[1]}"}).json()
+    assert len(assigned["assigned_tasks"]) == 50
+
+    response = client.post("/tasks:import", json=[], headers={"Authorization": f"Bearer {user1[1]}"})
+    assert response.status_code == 415
+
+def test_import_tasks_usernames_differing_in_case(user1):
+    with Session(engine) as db:
+        users = [User(username=name, hashed_password="x") for name in ("CaseUser", "caseuser")]
+        db.add_all(users)
+        db.commit()
+        ids = {user.username: user.id for user in users}
+    headers = {"Authorization": f"Bearer {user1[1]}", "Content-Type": "application/x-ndjson"}
+    lines = [
+        json.dumps({"title": "Upper", "description": "case", "assignees": ["CaseUser"]}),
+        json.dumps({"title": "Lower", "description": "case", "assignees": ["caseuser"]}),
+        json.dumps({"title": "Both", "description": "case", "assignees": ["caseuser", "CaseUser"]}),
+        json.dumps({"title": "Neither", "description": "case", "assignees": ["CASEUSER"]}),
+    ]
+    response = client.post("/tasks:import", content="\n".join(lines).encode(), headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 3
+    # SQLite compares usernames exactly
+    assert [(error["line"], error["detail"]) for error in report["errors"]] == [(4, "Users CASEUSER not found")]
+
+    tasks = client.get("/tasks", headers={"Authorization": f"Bearer {user1[1]}"}).json()["owned_tasks"]
+    assignees = {
+        task["title"]: sorted(user["id"] for user in client.get(f"/tasks/{task['id']}", headers=headers).json()["assignees"])
+        for task in tasks
+    }
+    assert assignees == {
+        "Upper": [ids["CaseUser"]],
+        "Lower": [ids["caseuser"]],
+        "Both": sorted(ids.values()),
+    }
@@ -1,7 +1,17 @@
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta, timezone
+import asyncio
+import json
 
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from src.backend.broker import Broker, notification_broker
 from src.backend.main import app
+from src.backend.models import User
+from src.backend.user.search import user_search_index
+from src.backend.user.stream import notification_events
+from .conftest import TestingSessionLocal, engine, dispatcher, dispatch_notifications
 
 client = TestClient(app)
 
@@ -61,6 +71,7 @@ def test_get_notifications(user1, user2):
     
     response = client.patch(f"/tasks/{task_id}/status", json=update_data, headers=headers_user1)
     assert response.status_code == 200
+    dispatch_notifications()
     
     # Get notifications as user2
     headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
@@ -95,3 +106,207 @@ def test_get_notifications(user1, user2):
     # Should be empty now as all notifications were marked as read
     assert isinstance(notifications, list)
     assert len(notifications) == 0, "Notifications were not marked as read"
+
+def test_user_query_budgets(user1, user2, query_budget):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+
+    # The first request of a user also loads them for the principal cache
+    with query_budget(2):
+        response = client.get("/users", headers=headers_user1)
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = client.get("/users", headers=headers_user1)
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = client.get("/users", params={"keyword": "task", "match": "prefix"}, headers=headers_user1)
+    assert len(response.json()) == 2
+
+    # Substring search catches up the in-process index, then checks its hits
+    client.get("/users", params={"keyword": "task"}, headers=headers_user1)
+    with query_budget(2):
+        response = client.get("/users", params={"keyword": "task"}, headers=headers_user1)
+    assert len(response.json()) == 2
+
+    task_id = client.post("/tasks", json={"title": "Budget", "description": "budget"}, headers=headers_user1).json()["id"]
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers_user1)
+    client.patch(f"/tasks/{task_id}/status", json={"status": "IN_PROGRESS"}, headers=headers_user1)
+    client.get("/users", headers=headers_user2)
+    dispatch_notifications()
+
+    # Unread notifications, then one watermark update
+    with query_budget(2):
+        response = client.get("/users/notifications", headers=headers_user2)
+    assert len(response.json()) == 2
+
+    with query_budget(1):
+        client.get("/users/notifications/feed", headers=headers_user2)
+    with query_budget(1):
+        client.post("/users/notifications/ack", json={"up_to_id": 1}, headers=headers_user2)
+    with query_budget(1):
+        client.get("/users/notifications/unread_count", headers=headers_user2)
+
+def test_search_users(user1, user2):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    for name in ("alice", "alicia", "bob", "malice"):
+        client.post("/signup", json={"username": name, "password": "securepassword123"})
+
+    response = client.get("/users", params={"keyword": "ali", "match": "prefix"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alicia"]
+
+    response = client.get("/users", params={"keyword": "ali"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alicia", "malice"]
+
+    # Pages are ordered by username and chained through X-Next-Cursor
+    response = client.get("/users", params={"limit": 4}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alicia", "bob", "malice"]
+    response = client.get("/users", params={"limit": 4, "cursor": response.headers["x-next-cursor"]}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["taskuser1", "taskuser2"]
+    assert "x-next-cursor" not in response.headers
+
+    response = client.get("/users", params={"keyword": "user", "limit": 1}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["taskuser1"]
+    response = client.get("/users", params={"keyword": "user", "limit": 1, "cursor": response.headers["x-next-cursor"]}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["taskuser2"]
+
+    # Users written by another process are picked up, soft-deleted users are dropped
+    with Session(engine) as db:
+        db.add(User(username="alison", hashed_password="x"))
+        db.execute(update(User).where(User.username == "alicia").values(deleted_at=datetime.now(timezone.utc)))
+        db.commit()
+    for match in ("prefix", "substring"):
+        response = client.get("/users", params={"keyword": "ali", "match": match}, headers=headers)
+        assert "alicia" not in [user["username"] for user in response.json()]
+        assert "alison" in [user["username"] for user in response.json()]
+
+    # Pages skip soft-deleted candidates without coming up short
+    response = client.get("/users", params={"keyword": "ali", "limit": 2}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alison"]
+
+    # Keywords shorter than a trigram still match anywhere in the username
+    response = client.get("/users", params={"keyword": "al"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alison", "malice"]
+    response = client.get("/users", params={"keyword": "2"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["taskuser2"]
+    response = client.get("/users", params={"keyword": "al", "match": "prefix"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["alice", "alison"]
+
+def test_search_users_like_wildcards(user1):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    for name in ("liz", "lizzie", "lia", "li_z", "li%z"):
+        client.post("/signup", json={"username": name, "password": "securepassword123"})
+
+    # A keyword ending in "z" stays a prefix match, and LIKE wildcards are literals
+    response = client.get("/users", params={"keyword": "liz", "match": "prefix"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["liz", "lizzie"]
+    response = client.get("/users", params={"keyword": "li_", "match": "prefix"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["li_z"]
+    response = client.get("/users", params={"keyword": "i%z"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["li%z"]
+
+def test_search_users_before_index_is_built(user1, monkeypatch):
+    headers = {"Authorization": f"Bearer {user1[1]}"}
+    client.post("/signup", json={"username": "malice", "password": "securepassword123"})
+    monkeypatch.setattr(user_search_index, "ready", False)
+
+    # Scans the table until the background build finishes
+    response = client.get("/users", params={"keyword": "lic"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["malice"]
+
+    async def rebuild():
+        async with TestingSessionLocal() as db:
+            await user_search_index.rebuild(db)
+
+    asyncio.run(rebuild())
+    assert user_search_index.ready
+    response = client.get("/users", params={"keyword": "user1"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["taskuser1"]
+
+def test_notification_feed(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    headers_user2 = {"Authorization": f"Bearer {user2[1]}"}
+    task_id = client.post("/tasks", json={"title": "Feed", "description": "feed"}, headers=headers_user1).json()["id"]
+    client.post(f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers_user1)
+    for status in ("IN_PROGRESS", "COMPLETED", "PENDING", "IN_PROGRESS"):
+        client.patch(f"/tasks/{task_id}/status", json={"status": status}, headers=headers_user1)
+    dispatch_notifications()
+
+    response = client.get("/users/notifications/unread_count", headers=headers_user2)
+    assert response.json() == {"unread_count": 5}
+
+    # Newest first, chained through next_before_id
+    response = client.get("/users/notifications/feed", params={"limit": 3}, headers=headers_user2)
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page["notifications"]) == 3
+    assert first_page["notifications"][0]["message"].endswith("from PENDING to IN_PROGRESS by taskuser1.")
+    response = client.get("/users/notifications/feed", params={"limit": 3, "before_id": first_page["next_before_id"]}, headers=headers_user2)
+    second_page = response.json()
+    assert second_page["next_before_id"] is None
+    ids = [notification["id"] for notification in first_page["notifications"] + second_page["notifications"]]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 5
+    assert "assigned to" in second_page["notifications"][-1]["message"]
+
+    # Reading the feed does not acknowledge anything
+    assert not any(notification["is_read"] for notification in first_page["notifications"])
+    response = client.post("/users/notifications/ack", json={"up_to_id": ids[2]}, headers=headers_user2)
+    assert response.status_code == 204
+    response = client.get("/users/notifications/unread_count", headers=headers_user2)
+    assert response.json() == {"unread_count": 2}
+    response = client.get("/users/notifications/feed", headers=headers_user2)
+    assert [notification["is_read"] for notification in response.json()["notifications"]] == [False, False, True, True, True]
+
+    # The watermark never moves backwards, and ids of other users' notifications do not count
+    client.post("/users/notifications/ack", json={"up_to_id": ids[4]}, headers=headers_user2)
+    response = client.get("/users/notifications/unread_count", headers=headers_user2)
+    assert response.json() == {"unread_count": 2}
+    client.post("/users/notifications/ack", json={"up_to_id": ids[0]}, headers=headers_user2)
+    response = client.get("/users/notifications", headers=headers_user2)
+    assert response.json() == []
+    response = client.get("/users/notifications/unread_count", headers=headers_user1)
+    assert response.json() == {"unread_count": 0}
+
+def test_notifications_are_pushed_when_dispatched(user1, user2):
+    headers_user1 = {"Authorization": f"Bearer {user1[1]}"}
+    task_id = client.post("/tasks", json={"title": "Push", "description": "push"}, headers=headers_user1).json()["id"]
+
+    async def receive():
+        subscription = notification_broker.subscribe(user2[0])
+        try:
+            # Requests run on the test client's own event loop and thread
+            await asyncio.to_thread(client.post, f"/tasks/{task_id}/assignees", json={"user_ids": [user2[0]]}, headers=headers_user1)
+            # Pushed by the outbox dispatcher, not by the request
+            assert subscription.queue.empty()
+            await dispatcher.dispatch_pending()
+            return await asyncio.wait_for(subscription.get(), timeout=5)
+        finally:
+            notification_broker.unsubscribe(subscription)
+
+    message = asyncio.run(receive())
+    assert message["task_id"] == task_id
+    assert message["event_type"] == "TASK_ASSIGNED"
+    assert message["message"].startswith("Task 'Push' has been assigned to taskuser2")
+    assert notification_broker.subscriber_count == 0
+
+def test_notification_events():
+    broker = Broker(queue_size=2)
+
+    async def read():
+        events = notification_events(broker, 1, keepalive=0.01)
+        received = [await anext(events)]  # nothing published yet
+        for i in range(4):
+            broker.publish([1, 2], {"n": i})
+        received += [await anext(events) for _ in range(3)]
+        assert broker.subscriber_count == 1
+        await events.aclose()
+        return received
+
+    keepalive, *events = asyncio.run(read())
+    assert keepalive == ": keepalive\n\n"
+    # The queue holds two messages; the client is told it missed the others
+    assert events[0] == "event: lagged\ndata: {}\n\n"
+    assert [json.loads(event.split("data: ")[1]) for event in events[1:]] == [{"n": 0}, {"n": 1}]
+    assert broker.dropped == 2
+    assert broker.subscriber_count == 0